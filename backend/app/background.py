@@ -0,0 +1,27 @@
+# app/background.py
+import asyncio
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_periodically(name: str, interval: float, job: Callable[[], object]) -> None:
+    while True:
+        try:
+            # jobs use blocking DB sessions, keep them off the event loop
+            await asyncio.to_thread(job)
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def start_periodic(name: str, interval: float, job: Callable[[], object]) -> asyncio.Task:
+    """Run job every interval seconds until the returned task is cancelled."""
+    return asyncio.create_task(_run_periodically(name, interval, job), name=name)
+
+
+async def stop_all(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,473 @@
+# app/cart_store.py
+"""
+Where cart lines live. Routers and checkout only talk to a CartStore:
+
+- SqlCartStore (default): the cart_items table, inside the request's
+  DB session, so cart writes commit together with the stock changes.
+- InMemoryCartStore: per-user hashes of lines in this process (tests,
+  single-node deployments), the same shape a key-value server would hold.
+  Requests see it through bind(db): a cart touched for change is held
+  until the session's transaction ends and put back if it rolls back, so
+  cart lines and the stock they hold still move together.
+
+Pick one with CART_BACKEND=sql|memory.
+"""
+import itertools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Mapping
+
+from fastapi import Depends
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session, contains_eager
+
+from . import models
+from .database import get_db
+
+CART_BACKEND = os.getenv("CART_BACKEND", "sql")
+# how long a request waits for a memory cart another transaction holds
+CART_LOCK_WAIT_SECONDS = float(os.getenv("CART_LOCK_WAIT_SECONDS", "10"))
+
+_BOUND_KEY = "memory_cart_stores"
+
+
+@dataclass
+class CartLine:
+    id: int
+    user_id: int
+    sneaker_id: int
+    size: int
+    quantity: int
+    expires_at: datetime | None = None
+    # set when the store fetched the sneaker along with the line
+    sneaker: models.Sneaker | None = field(default=None, repr=False, compare=False)
+
+
+class CartStore(ABC):
+    @abstractmethod
+    def lines(self, user_id: int, lock: bool = False, with_sneakers: bool = False) -> list[CartLine]:
+        """The user's cart ordered by line id. lock: rows are about to change."""
+
+    @abstractmethod
+    def get(self, user_id: int, line_id: int) -> CartLine | None:
+        """One line of the user's cart, locked for change."""
+
+    @abstractmethod
+    def find(self, user_id: int, sneaker_id: int, size: int) -> CartLine | None:
+        """The line holding sneaker_id/size, locked for change."""
+
+    @abstractmethod
+    def add(
+        self, user_id: int, sneaker_id: int, size: int, quantity: int, expires_at: datetime | None
+    ) -> CartLine:
+        """Add quantity, merging into the existing sneaker_id/size line."""
+
+    @abstractmethod
+    def set_quantities(
+        self, user_id: int, quantities: Mapping[int, int], expires_at: datetime | None
+    ) -> None:
+        """Set line_id -> quantity (and the new deadline); <= 0 removes the line."""
+
+    @abstractmethod
+    def clear(self, user_id: int) -> None:
+        """Drop every line of the user's cart."""
+
+    @abstractmethod
+    def pop_expired(self, now: datetime, limit: int) -> list[CartLine]:
+        """Remove and return up to limit lines whose reservation ended before now."""
+
+
+def _to_line(item: models.CartItem, sneaker: models.Sneaker | None = None) -> CartLine:
+    return CartLine(
+        id=item.id,
+        user_id=item.user_id,
+        sneaker_id=item.sneaker_id,
+        size=item.size,
+        quantity=item.quantity,
+        expires_at=item.expires_at,
+        sneaker=sneaker,
+    )
+
+
+class SqlCartStore(CartStore):
+    """cart_items rows, written through the caller's session (the caller commits)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        # strong refs to rows loaded this request (the identity map is weak)
+        self._items: dict[int, models.CartItem] = {}
+
+    def _track(self, item: models.CartItem | None) -> models.CartItem | None:
+        if item is not None:
+            self._items[item.id] = item
+        return item
+
+    def _owned(self, user_id: int):
+        return self.db.query(models.CartItem).filter(models.CartItem.user_id == user_id)
+
+    def lines(self, user_id: int, lock: bool = False, with_sneakers: bool = False) -> list[CartLine]:
+        query = self._owned(user_id).order_by(models.CartItem.id)
+        if with_sneakers:
+            # one round trip: lines joined to their sneakers (lines whose
+            # sneaker no longer exists drop out of the inner join)
+            query = query.join(models.CartItem.sneaker).options(
+                contains_eager(models.CartItem.sneaker).raiseload(models.Sneaker.availability)
+            )
+        if lock:
+            # only the cart rows, never the sneakers joined to them
+            query = query.with_for_update(of=models.CartItem)
+        return [
+            _to_line(self._track(item) if lock else item, item.sneaker if with_sneakers else None)
+            for item in query
+        ]
+
+    def get(self, user_id: int, line_id: int) -> CartLine | None:
+        item = (
+            self._owned(user_id)
+            .filter(models.CartItem.id == line_id)
+            # locked so the reservation sweeper can't release it under us
+            .with_for_update()
+            .first()
+        )
+        return _to_line(self._track(item)) if item else None
+
+    def find(self, user_id: int, sneaker_id: int, size: int) -> CartLine | None:
+        item = self._find_item(user_id, sneaker_id, size)
+        return _to_line(item) if item else None
+
+    def _find_item(self, user_id: int, sneaker_id: int, size: int) -> models.CartItem | None:
+        return self._track(
+            self._owned(user_id)
+            .filter(models.CartItem.sneaker_id == sneaker_id, models.CartItem.size == size)
+            .with_for_update()
+            .first()
+        )
+
+    def add(self, user_id, sneaker_id, size, quantity, expires_at) -> CartLine:
+        item = self._find_item(user_id, sneaker_id, size)
+        if item:
+            # SQL-side increment, safe against a concurrent add of the same item
+            item.quantity = models.CartItem.quantity + quantity
+            item.expires_at = expires_at
+            self.db.flush()
+            self.db.refresh(item, ["quantity"])
+        else:
+            item = models.CartItem(
+                user_id=user_id,
+                sneaker_id=sneaker_id,
+                size=size,
+                quantity=quantity,
+                expires_at=expires_at,
+            )
+            self.db.add(item)
+            self.db.flush()
+            self._track(item)
+        return _to_line(item)
+
+    def set_quantities(self, user_id, quantities, expires_at) -> None:
+        for line_id, quantity in quantities.items():
+            item = self._items.get(line_id) or self.db.get(models.CartItem, line_id)
+            if item is None or item.user_id != user_id:
+                continue
+            if quantity <= 0:
+                self.db.delete(item)
+            else:
+                item.quantity = quantity
+                item.expires_at = expires_at
+
+    def clear(self, user_id: int) -> None:
+        self._owned(user_id).delete(synchronize_session=False)
+
+    def pop_expired(self, now: datetime, limit: int) -> list[CartLine]:
+        item = models.CartItem
+        rows = self.db.execute(
+            select(item.id, item.user_id, item.sneaker_id, item.size, item.quantity, item.expires_at)
+            .where(item.expires_at <= now)
+            .order_by(item.expires_at)
+            .limit(limit)
+            # lines a request is touching right now are skipped, not waited on
+            .with_for_update(skip_locked=True)
+        ).all()
+        if rows:
+            self.db.execute(
+                delete(item)
+                .where(item.id.in_([row.id for row in rows]))
+                .execution_options(synchronize_session=False)
+            )
+        return [CartLine(**row._asdict()) for row in rows]
+
+
+class InMemoryCartStore(CartStore):
+    """
+    user_id -> {line_id: CartLine}; callers always get copies.
+
+    Called directly, writes apply at once and nothing is held (one caller
+    at a time). Requests and the sweeper go through bind(db) instead.
+    """
+
+    def __init__(self):
+        self._carts: dict[int, dict[int, CartLine]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Condition()
+        # user_id -> the bound view whose transaction holds that cart
+        self._owners: dict[int, BoundMemoryCartStore] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._carts.clear()
+            self._owners.clear()
+            self._lock.notify_all()
+
+    def bind(self, db: Session) -> "BoundMemoryCartStore":
+        """This store as seen from db's transactions (one view per session)."""
+        views = db.info.setdefault(_BOUND_KEY, {})
+        view = views.get(id(self))
+        if view is None:
+            view = views[id(self)] = BoundMemoryCartStore(self, db)
+        return view
+
+    # ---------- holding carts (lock taken) ----------
+
+    def _claim(self, user_id: int, txn: "BoundMemoryCartStore | None", wait: bool = True) -> bool:
+        if txn is None:
+            return True
+        deadline = time.monotonic() + CART_LOCK_WAIT_SECONDS
+        while self._owners.get(user_id, txn) is not txn:
+            remaining = deadline - time.monotonic()
+            if not wait:
+                return False
+            if remaining <= 0:
+                raise TimeoutError(f"Cart of user {user_id} is held by another transaction")
+            self._lock.wait(remaining)
+        self._owners[user_id] = txn
+        return True
+
+    def _save(self, user_id: int, txn: "BoundMemoryCartStore | None") -> None:
+        """Remember the cart as it was before txn's first change to it."""
+        if txn is not None and user_id not in txn.before:
+            txn.before[user_id] = {
+                line_id: replace(line) for line_id, line in self._carts.get(user_id, {}).items()
+            }
+
+    def _finish(self, txn: "BoundMemoryCartStore", committed: bool) -> None:
+        with self._lock:
+            if not committed:
+                for user_id, cart in txn.before.items():
+                    if cart:
+                        self._carts[user_id] = cart
+                    else:
+                        self._carts.pop(user_id, None)
+            txn.before.clear()
+            released = [user_id for user_id, owner in self._owners.items() if owner is txn]
+            for user_id in released:
+                del self._owners[user_id]
+            if released:
+                self._lock.notify_all()
+
+    # ---------- operations (txn None: unbound) ----------
+
+    def _lines(self, user_id: int, txn: "BoundMemoryCartStore | None", lock: bool) -> list[CartLine]:
+        with self._lock:
+            if lock:
+                self._claim(user_id, txn)
+            owner = self._owners.get(user_id)
+            if owner is not None and owner is not txn and user_id in owner.before:
+                # another transaction is changing this cart: read what it last committed
+                cart = owner.before[user_id]
+            else:
+                cart = self._carts.get(user_id, {})
+            return [replace(cart[line_id]) for line_id in sorted(cart)]
+
+    def _get(self, user_id: int, line_id: int, txn) -> CartLine | None:
+        with self._lock:
+            self._claim(user_id, txn)
+            line = self._carts.get(user_id, {}).get(line_id)
+            return replace(line) if line else None
+
+    def _find_locked(self, user_id: int, sneaker_id: int, size: int) -> CartLine | None:
+        for line in self._carts.get(user_id, {}).values():
+            if line.sneaker_id == sneaker_id and line.size == size:
+                return line
+        return None
+
+    def _find(self, user_id: int, sneaker_id: int, size: int, txn) -> CartLine | None:
+        with self._lock:
+            self._claim(user_id, txn)
+            line = self._find_locked(user_id, sneaker_id, size)
+            return replace(line) if line else None
+
+    def _add(self, user_id, sneaker_id, size, quantity, expires_at, txn) -> CartLine:
+        with self._lock:
+            self._claim(user_id, txn)
+            self._save(user_id, txn)
+            line = self._find_locked(user_id, sneaker_id, size)
+            if line:
+                line.quantity += quantity
+                line.expires_at = expires_at
+            else:
+                line = CartLine(
+                    id=next(self._ids),
+                    user_id=user_id,
+                    sneaker_id=sneaker_id,
+                    size=size,
+                    quantity=quantity,
+                    expires_at=expires_at,
+                )
+                self._carts.setdefault(user_id, {})[line.id] = line
+            return replace(line)
+
+    def _set_quantities(self, user_id, quantities, expires_at, txn) -> None:
+        with self._lock:
+            self._claim(user_id, txn)
+            self._save(user_id, txn)
+            cart = self._carts.get(user_id, {})
+            for line_id, quantity in quantities.items():
+                line = cart.get(line_id)
+                if line is None:
+                    continue
+                if quantity <= 0:
+                    del cart[line_id]
+                else:
+                    line.quantity = quantity
+                    line.expires_at = expires_at
+
+    def _clear(self, user_id: int, txn) -> None:
+        with self._lock:
+            self._claim(user_id, txn)
+            self._save(user_id, txn)
+            self._carts.pop(user_id, None)
+
+    def _pop_expired(self, now: datetime, limit: int, txn) -> list[CartLine]:
+        expired = []
+        with self._lock:
+            for user_id, cart in list(self._carts.items()):
+                due = [
+                    line_id for line_id, line in cart.items()
+                    if line.expires_at is not None and line.expires_at <= now
+                ][:limit - len(expired)]
+                # carts a request is touching right now are skipped, not waited on
+                if not due or not self._claim(user_id, txn, wait=False):
+                    continue
+                self._save(user_id, txn)
+                expired.extend(cart.pop(line_id) for line_id in due)
+                if len(expired) >= limit:
+                    break
+        return expired
+
+    def lines(self, user_id: int, lock: bool = False, with_sneakers: bool = False) -> list[CartLine]:
+        return self._lines(user_id, None, lock)
+
+    def get(self, user_id: int, line_id: int) -> CartLine | None:
+        return self._get(user_id, line_id, None)
+
+    def find(self, user_id: int, sneaker_id: int, size: int) -> CartLine | None:
+        return self._find(user_id, sneaker_id, size, None)
+
+    def add(self, user_id, sneaker_id, size, quantity, expires_at) -> CartLine:
+        return self._add(user_id, sneaker_id, size, quantity, expires_at, None)
+
+    def set_quantities(self, user_id, quantities, expires_at) -> None:
+        self._set_quantities(user_id, quantities, expires_at, None)
+
+    def clear(self, user_id: int) -> None:
+        self._clear(user_id, None)
+
+    def pop_expired(self, now: datetime, limit: int) -> list[CartLine]:
+        return self._pop_expired(now, limit, None)
+
+
+class BoundMemoryCartStore(CartStore):
+    """
+    An InMemoryCartStore seen from one session. A cart read for change or
+    written is held until the session's transaction ends: other requests
+    wait for it and the sweeper skips it, like SELECT ... FOR UPDATE. On
+    rollback (or close without commit) the held carts are put back as they
+    were. Savepoints are not tracked, only the outer transaction.
+    """
+
+    def __init__(self, store: InMemoryCartStore, db: Session):
+        self.store = store
+        self.db = db
+        # user_id -> the cart before this transaction first changed it
+        self.before: dict[int, dict[int, CartLine]] = {}
+
+    def _txn(self) -> "BoundMemoryCartStore":
+        # held carts are released when the transaction ends, so there must be one
+        if not self.db.in_transaction():
+            self.db.begin()
+        return self
+
+    def lines(self, user_id: int, lock: bool = False, with_sneakers: bool = False) -> list[CartLine]:
+        return self.store._lines(user_id, self._txn() if lock else self, lock)
+
+    def get(self, user_id: int, line_id: int) -> CartLine | None:
+        return self.store._get(user_id, line_id, self._txn())
+
+    def find(self, user_id: int, sneaker_id: int, size: int) -> CartLine | None:
+        return self.store._find(user_id, sneaker_id, size, self._txn())
+
+    def add(self, user_id, sneaker_id, size, quantity, expires_at) -> CartLine:
+        return self.store._add(user_id, sneaker_id, size, quantity, expires_at, self._txn())
+
+    def set_quantities(self, user_id, quantities, expires_at) -> None:
+        self.store._set_quantities(user_id, quantities, expires_at, self._txn())
+
+    def clear(self, user_id: int) -> None:
+        self.store._clear(user_id, self._txn())
+
+    def pop_expired(self, now: datetime, limit: int) -> list[CartLine]:
+        return self.store._pop_expired(now, limit, self._txn())
+
+
+@event.listens_for(Session, "after_commit")
+def _keep_cart_changes(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint was released, the outer transaction goes on
+    for view in session.info.get(_BOUND_KEY, {}).values():
+        view.store._finish(view, committed=True)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _undo_cart_changes(session: Session, transaction) -> None:
+    # after a commit this finds nothing left to undo
+    if transaction.parent is None:
+        for view in session.info.get(_BOUND_KEY, {}).values():
+            view.store._finish(view, committed=False)
+
+
+memory_cart_store = InMemoryCartStore()
+
+
+def with_sneakers(db: Session, lines: list[CartLine], options=()) -> list[CartLine]:
+    """
+    Lines with .sneaker set, loading in one query the sneakers the store
+    did not fetch itself. Lines whose sneaker no longer exists are dropped.
+    """
+    missing = {line.sneaker_id for line in lines if line.sneaker is None}
+    if missing:
+        sneakers = {
+            sneaker.id: sneaker
+            for sneaker in db.query(models.Sneaker)
+            .options(*options)
+            .filter(models.Sneaker.id.in_(missing))
+        }
+        lines = [
+            line if line.sneaker is not None
+            else replace(line, sneaker=sneakers.get(line.sneaker_id))
+            for line in lines
+        ]
+    return [line for line in lines if line.sneaker is not None]
+
+
+def cart_store_for(db: Session) -> CartStore:
+    if CART_BACKEND == "memory":
+        return memory_cart_store.bind(db)
+    return SqlCartStore(db)
+
+
+def get_cart_store(db: Session = Depends(get_db)) -> CartStore:
+    return cart_store_for(db)
@@ -0,0 +1,105 @@
+# app/catalog_cache.py
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable
+
+from fastapi import Request, Response
+
+from .cache import LRUCache
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class CatalogCache:
+    """
+    In-process cache of serialized catalog responses.
+
+    Entries are keyed by (catalog version, request path + query), so
+    bumping the version makes every older entry unreachable; they age out
+    through LRU eviction. The cache lives in one worker process: with
+    several workers, each one keeps (and invalidates) its own copy.
+    """
+
+    def __init__(self, maxsize: int):
+        self._entries = LRUCache(maxsize)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump_version(self) -> int:
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def key_for(self, request: Request) -> tuple:
+        query = sorted(request.query_params.multi_items())
+        return (self._version, request.url.path, tuple(query))
+
+    def get(self, key: tuple) -> CachedResponse | None:
+        return self._entries.get(key)
+
+    def store(
+        self, key: tuple, body: bytes, headers: dict[str, str] | None = None
+    ) -> CachedResponse:
+        entry = CachedResponse(body=body, etag=make_etag(body), headers=headers or {})
+        self._entries.set(key, entry)
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"version": self._version, **self._entries.stats()}
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag: hash of the exact response bytes."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def respond(request: Request, entry: CachedResponse) -> Response:
+    """
+    Turn a cached entry into a 200, or a 304 when the client already
+    holds the same representation.
+    """
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_SIZE)
+
+# extra work to trigger on every catalog change (e.g. snapshot publishing)
+_change_listeners: list[Callable[[], None]] = []
+
+
+def on_catalog_change(listener: Callable[[], None]) -> None:
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def invalidate_catalog() -> None:
+    """Call after committing any change to sneakers or their stock."""
+    catalog_cache.bump_version()
+    for listener in _change_listeners:
+        listener()
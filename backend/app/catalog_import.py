@@ -0,0 +1,255 @@
+# app/catalog_import.py
+"""
+Bulk catalog import from CSV or NDJSON.
+
+    python -m app.catalog_import supplier_feed.csv --batch-size 2000
+
+CSV columns match SneakerCreate, plus an optional "sizes" column written
+as "41:10;42:5" (eu_size:stock). NDJSON lines are SneakerImportRow
+objects with a nested "sizes" list.
+"""
+import argparse
+import csv
+import json
+from typing import Iterable, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .catalog_cache import invalidate_catalog
+from .database import SessionLocal
+from .inventory import refresh_availability
+from .search_index import search_index
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+
+_SNEAKER_COLUMNS = tuple(schemas.SneakerCreate.model_fields)
+# String(n) limits of the sneakers table, checked up front (MySQL would reject the whole batch)
+_MAX_LENGTHS = {
+    name: models.Sneaker.__table__.c[name].type.length
+    for name in _SNEAKER_COLUMNS
+    if getattr(models.Sneaker.__table__.c[name].type, "length", None)
+}
+
+
+# ---------- parsing ----------
+
+
+def _parse_csv_sizes(value: str | None) -> list[dict]:
+    sizes = []
+    for chunk in (value or "").split(";"):
+        if not chunk.strip():
+            continue
+        eu_size, _, stock = chunk.partition(":")
+        sizes.append({"eu_size": eu_size.strip(), "stock": stock.strip() or 0})
+    return sizes
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[tuple[int, dict | str]]:
+    """Yield (line number, raw row dict) pairs; empty cells become None."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        raw = {key: (value if value != "" else None) for key, value in row.items() if key}
+        raw["sizes"] = _parse_csv_sizes(raw.get("sizes"))
+        yield reader.line_num, raw
+
+
+def iter_ndjson(lines: Iterable[str]) -> Iterator[tuple[int, dict | str]]:
+    """Yield (line number, parsed object), or an error message for bad JSON."""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, f"Invalid JSON: {exc.msg}"
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def _length_message(row: schemas.SneakerImportRow) -> str | None:
+    too_long = [
+        f"{name}: at most {limit} characters"
+        for name, limit in _MAX_LENGTHS.items()
+        if getattr(row, name) is not None and len(getattr(row, name)) > limit
+    ]
+    return "; ".join(too_long) or None
+
+
+# ---------- inserting ----------
+
+
+def _can_return_ids(db: Session) -> bool:
+    return db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order
+
+
+def _first_inserted_id(db: Session) -> tuple[int, int]:
+    """MySQL: first id given to the last INSERT, and the auto-increment step."""
+    first, step = db.execute(text("SELECT LAST_INSERT_ID(), @@auto_increment_increment")).one()
+    return first, step
+
+
+class _UnknownIds(Exception):
+    """The ids read back don't belong to the rows just inserted."""
+
+
+def _insert_sneakers(db: Session, rows: list[dict]) -> list[int]:
+    """
+    Insert a batch of sneakers and return their ids in input order.
+
+    Uses one executemany INSERT ... RETURNING where the dialect can do
+    that (SQLite, MariaDB, PostgreSQL). MySQL has no RETURNING: the batch
+    goes in as one multi-row INSERT, which InnoDB numbers consecutively
+    (innodb_autoinc_lock_mode 1 or 2) from LAST_INSERT_ID(). The derived
+    ids are checked against the names just written; a mismatch fails the
+    batch, which is then retried one row at a time.
+    """
+    table = models.Sneaker.__table__
+    if _can_return_ids(db):
+        result = db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        )
+        return list(result.scalars())
+
+    db.execute(insert(table).values(rows))
+    first, step = _first_inserted_id(db)
+    ids = [first + n * step for n in range(len(rows))]
+    names = dict(db.execute(select(table.c.id, table.c.name).where(table.c.id.in_(ids))).all())
+    if [names.get(sneaker_id) for sneaker_id in ids] != [row["name"] for row in rows]:
+        raise _UnknownIds(f"Ids from {first} (step {step}) are not this batch's")
+    return ids
+
+
+def _flush_batch(
+    db: Session,
+    batch: list[tuple[int, schemas.SneakerImportRow]],
+    report: schemas.CatalogImportReport,
+) -> None:
+    """
+    Insert and commit one batch. If the database rejects it, the rows are
+    retried one per transaction so only the offending ones are reported.
+    """
+    sneaker_rows = [row.model_dump(include=set(_SNEAKER_COLUMNS)) for _, row in batch]
+    try:
+        ids = _insert_sneakers(db, sneaker_rows)
+        size_rows = [
+            {"sneaker_id": sneaker_id, **size.model_dump()}
+            for sneaker_id, (_, row) in zip(ids, batch)
+            for size in row.sizes
+        ]
+        if size_rows:
+            db.execute(insert(models.SneakerSize.__table__), size_rows)
+        refresh_availability(db, ids)
+        db.commit()
+    except (SQLAlchemyError, _UnknownIds) as exc:
+        db.rollback()
+        if len(batch) > 1:
+            for item in batch:
+                _flush_batch(db, [item], report)
+            return
+        reason = getattr(exc, "orig", None) or exc.__class__.__name__
+        _record_error(report, batch[0][0], f"Insert failed: {reason}")
+        return
+
+    report.imported += len(batch)
+    if search_index.built:
+        for sneaker_id, fields in zip(ids, sneaker_rows):
+            search_index.add(sneaker_id, fields)
+
+
+def _record_error(report: schemas.CatalogImportReport, line_no: int, message: str) -> None:
+    report.failed += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append(schemas.CatalogImportError(line=line_no, error=message))
+
+
+def import_catalog(
+    db: Session,
+    lines: Iterable[str],
+    fmt: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> schemas.CatalogImportReport:
+    """
+    Stream rows from lines, validate each against SneakerImportRow and
+    insert them batch_size at a time, one commit per batch. Bad rows are
+    reported and skipped; they never abort the run.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    report = schemas.CatalogImportReport()
+    rows = iter_csv(lines) if fmt == "csv" else iter_ndjson(lines)
+    batch: list[tuple[int, schemas.SneakerImportRow]] = []
+
+    try:
+        for line_no, raw in rows:
+            if isinstance(raw, str):
+                _record_error(report, line_no, raw)
+                continue
+            try:
+                row = schemas.SneakerImportRow.model_validate(raw)
+            except ValidationError as exc:
+                _record_error(report, line_no, _validation_message(exc))
+                continue
+            too_long = _length_message(row)
+            if too_long:
+                _record_error(report, line_no, too_long)
+                continue
+            batch.append((line_no, row))
+            if len(batch) >= batch_size:
+                _flush_batch(db, batch, report)
+                batch = []
+        if batch:
+            _flush_batch(db, batch, report)
+    except csv.Error as exc:
+        _record_error(report, 0, f"Unreadable CSV: {exc}")
+    finally:
+        if report.imported:
+            invalidate_catalog()
+
+    return report
+
+
+def format_for_filename(filename: str | None) -> str | None:
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import sneakers from CSV/NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or format_for_filename(args.path)
+    if fmt is None:
+        raise SystemExit("Cannot guess the format, pass --format csv|ndjson")
+
+    db: Session = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8", newline="") as fh:
+            report = import_catalog(db, fh, fmt, args.batch_size)
+    finally:
+        db.close()
+
+    print(f"✅ Imported {report.imported} sneakers, {report.failed} rows failed.")
+    for error in report.errors:
+        print(f"  line {error.line}: {error.error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# app/catalog_publisher.py
+"""
+Pre-rendered catalog snapshots served straight from /static.
+
+    python -m app.catalog_publisher
+
+writes app/static/catalog/<version>/<page>.<hash>.json for every page
+(all, men, women, brand-<slug>) and then swaps app/static/catalog/manifest.json
+to point at the new version. Clients read the manifest and fetch the
+content-hashed page files, which never change and can be cached forever.
+
+Pages are streamed to disk a batch of sneakers at a time, so memory does
+not grow with the catalog. Publishes in one process run one at a time.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, schemas
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "static", "catalog")
+URL_PREFIX = "/static/catalog"
+MANIFEST_NAME = "manifest.json"
+# old versions kept around for clients still holding an older manifest
+KEEP_VERSIONS = 3
+# sneakers read (and held in memory) per query while writing the pages
+PAGE_BATCH_SIZE = 1000
+# temp files/dirs older than this belong to a publish that died, not a running one
+STALE_TEMP_SECONDS = 3600
+# wait this long after a change so bursts of changes publish once
+DEBOUNCE_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_DEBOUNCE_SECONDS", "2"))
+
+_sneaker_adapter = TypeAdapter(schemas.SneakerRead)
+_publish_lock = threading.Lock()
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "unknown"
+
+
+def _iter_sneakers(db: Session, batch_size: int):
+    """The catalog in id order, one keyset-paginated query per batch_size sneakers."""
+    last_id = 0
+    while True:
+        batch = (
+            db.query(models.Sneaker)
+            .options(selectinload(models.Sneaker.sizes))
+            .filter(models.Sneaker.id > last_id)
+            .order_by(models.Sneaker.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+
+class _PageFile:
+    """One page written as a JSON array, item by item, hashed on the way."""
+
+    def __init__(self, path: str):
+        self.fh = open(path, "wb")
+        self.digest = hashlib.sha256()
+        self.empty = True
+
+    def _write(self, chunk: bytes) -> None:
+        self.fh.write(chunk)
+        self.digest.update(chunk)
+
+    def add(self, body: bytes) -> None:
+        self._write((b"[" if self.empty else b",") + body)
+        self.empty = False
+
+    def close(self) -> str:
+        self._write(b"[]" if self.empty else b"]")
+        self.fh.close()
+        return self.digest.hexdigest()
+
+
+def write_pages(db: Session, directory: str, batch_size: int = PAGE_BATCH_SIZE) -> dict[str, str]:
+    """Write every snapshot page to directory as <name>.json: name -> sha256 of it."""
+    pages = {name: _PageFile(os.path.join(directory, f"{name}.json")) for name in ("all", "men", "women")}
+    try:
+        for sneaker in _iter_sneakers(db, batch_size):
+            item = _sneaker_adapter.validate_python(sneaker, from_attributes=True)
+            body = _sneaker_adapter.dump_json(item)
+            names = ["all", f"brand-{_slug(item.brand)}"]
+            if item.gender in ("men", "women"):
+                names.append(item.gender)
+            for name in names:
+                page = pages.get(name)
+                if page is None:
+                    page = pages[name] = _PageFile(os.path.join(directory, f"{name}.json"))
+                page.add(body)
+    finally:
+        hashes = {name: page.close() for name, page in pages.items()}
+    return hashes
+
+
+def _write_manifest(root: str, manifest: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".manifest-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, os.path.join(root, MANIFEST_NAME))
+
+
+def read_manifest(root: str = SNAPSHOT_DIR) -> dict | None:
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def _is_newer(manifest: dict, than: datetime) -> bool:
+    generated_at = manifest.get("generated_at")
+    return generated_at is not None and datetime.fromisoformat(generated_at) > than
+
+
+def _prune(root: str, current: str) -> None:
+    versions = sorted(
+        (
+            entry
+            for entry in os.scandir(root)
+            if entry.is_dir() and not entry.name.startswith(".") and entry.name != current
+        ),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    # another process may be writing a fresh one: only leftovers of dead publishes go
+    stale_before = time.time() - STALE_TEMP_SECONDS
+    for entry in os.scandir(root):
+        if entry.name.startswith((".tmp-", ".manifest-")) and entry.stat().st_mtime < stale_before:
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+
+
+def publish_catalog(
+    db: Session,
+    root: str = SNAPSHOT_DIR,
+    url_prefix: str = URL_PREFIX,
+    batch_size: int = PAGE_BATCH_SIZE,
+) -> dict:
+    """
+    Write a new snapshot version and atomically point the manifest at it.
+    Publishing an unchanged catalog is a no-op, and so is a publish that
+    started before the current manifest was generated (a newer one, from
+    another process, got there first).
+    """
+    with _publish_lock:
+        os.makedirs(root, exist_ok=True)
+        started = datetime.now(timezone.utc)
+        # pages are streamed into a private directory, renamed into place when done
+        tmp_dir = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+        try:
+            hashes = write_pages(db, tmp_dir, batch_size)
+            filenames = {name: f"{name}.{digest[:16]}.json" for name, digest in hashes.items()}
+            version = hashlib.sha256(
+                "\n".join(sorted(filenames.values())).encode("utf-8")
+            ).hexdigest()[:16]
+
+            current = read_manifest(root)
+            if current and (current.get("version") == version or _is_newer(current, started)):
+                return current
+
+            version_dir = os.path.join(root, version)
+            if not os.path.isdir(version_dir):
+                for name, filename in filenames.items():
+                    os.rename(os.path.join(tmp_dir, f"{name}.json"), os.path.join(tmp_dir, filename))
+                os.rename(tmp_dir, version_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # gone already once renamed
+
+        manifest = {
+            "version": version,
+            "generated_at": started.isoformat(),
+            "pages": {
+                name: f"{url_prefix}/{version}/{filename}"
+                for name, filename in sorted(filenames.items())
+            },
+        }
+        _write_manifest(root, manifest)
+        _prune(root, version)
+        return manifest
+
+
+class SnapshotPublisher:
+    """
+    Debounced background publishing: request() can be called on every
+    catalog change; one publish runs DEBOUNCE_SECONDS after the first
+    request of a burst, in its own thread and DB session. Requests made
+    while a publish runs mark it dirty: one more publish follows it, never
+    alongside it.
+    """
+
+    def __init__(self, session_factory=SessionLocal, delay: float = DEBOUNCE_SECONDS):
+        self.session_factory = session_factory
+        self.delay = delay
+        self._timer: threading.Timer | None = None
+        self._running = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def request(self) -> None:
+        with self._lock:
+            if self._running:
+                self._dirty = True
+                return
+            if self._timer is None:
+                self._schedule()
+
+    def _schedule(self) -> None:
+        self._timer = threading.Timer(self.delay, self._run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._running = True
+        db = self.session_factory()
+        try:
+            manifest = publish_catalog(db)
+            logger.info("Published catalog snapshot %s", manifest["version"])
+        except Exception:
+            logger.exception("Catalog snapshot publishing failed")
+        finally:
+            db.close()
+            with self._lock:
+                self._running = False
+                if self._dirty:
+                    self._dirty = False
+                    self._schedule()
+
+
+snapshot_publisher = SnapshotPublisher()
+
+
+def main():
+    db: Session = SessionLocal()
+    try:
+        manifest = publish_catalog(db)
+    finally:
+        db.close()
+    print(f"✅ Published catalog snapshot {manifest['version']}:")
+    for name, url in manifest["pages"].items():
+        print(f"   {name}: {url}")
+
+
+if __name__ == "__main__":
+    main()
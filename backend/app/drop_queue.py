@@ -0,0 +1,220 @@
+# app/drop_queue.py
+"""
+Waiting room for hot drops: instead of every POST /cart/ for the sneaker
+fighting over DB connections and row locks, requests queue up per
+sneaker and a single asyncio consumer grants them in micro-batches:
+
+- one locking read of the sizes asked for, allocation in arrival order,
+  one executemany UPDATE and one commit per batch;
+- once a size has sold out, asks for it are refused straight away
+  (re-checked every SOLD_OUT_RECHECK_SECONDS, cart removals can free stock).
+
+So a drop costs one DB connection per queued sneaker however many buyers
+are waiting. The room allocates from the sneaker_sizes row: use it or
+drop-mode stripes (app/inventory.py) for a size, not both.
+
+Sync endpoints call in through anyio.from_thread.run(waiting_room.reserve, ...).
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .catalog_cache import invalidate_catalog
+from .database import SessionLocal
+from .inventory import apply_stock_deltas
+
+logger = logging.getLogger(__name__)
+
+DROP_QUEUE_BATCH_SIZE = int(os.getenv("DROP_QUEUE_BATCH_SIZE", "200"))
+# how long the consumer lets a batch fill up after its first ask
+DROP_QUEUE_WINDOW_MS = float(os.getenv("DROP_QUEUE_WINDOW_MS", "5"))
+DROP_QUEUE_MAX_WAITING = int(os.getenv("DROP_QUEUE_MAX_WAITING", "5000"))
+SOLD_OUT_RECHECK_SECONDS = 1.0
+
+
+class WaitingRoomFull(Exception):
+    pass
+
+
+@dataclass
+class _Ask:
+    eu_size: int
+    quantity: int
+    future: asyncio.Future
+
+
+class DropQueue:
+    """Queue + single consumer task for one sneaker."""
+
+    def __init__(self, sneaker_id: int, session_factory: Callable[[], Session]):
+        self.sneaker_id = sneaker_id
+        self.session_factory = session_factory
+        self._queue: asyncio.Queue[_Ask | None] = asyncio.Queue()
+        self._sold_out_until: dict[int, float] = {}
+        self.granted = 0
+        self.rejected = 0
+        self.batches = 0
+        self._task = asyncio.create_task(
+            self._consume(), name=f"drop-queue-{sneaker_id}"
+        )
+
+    @property
+    def waiting(self) -> int:
+        return self._queue.qsize()
+
+    def _known_sold_out(self, eu_size: int) -> bool:
+        until = self._sold_out_until.get(eu_size)
+        return until is not None and until > time.monotonic()
+
+    async def reserve(self, eu_size: int, quantity: int) -> bool:
+        if self._known_sold_out(eu_size):
+            self.rejected += 1
+            return False
+        if self._queue.qsize() >= DROP_QUEUE_MAX_WAITING:
+            raise WaitingRoomFull()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Ask(eu_size, quantity, future))
+        return await future
+
+    async def close(self) -> None:
+        """Serve everyone already waiting, then stop the consumer."""
+        self._queue.put_nowait(None)
+        await self._task
+
+    async def _consume(self) -> None:
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            if DROP_QUEUE_WINDOW_MS:
+                await asyncio.sleep(DROP_QUEUE_WINDOW_MS / 1000)
+            batch = [first]
+            closing = False
+            while len(batch) < DROP_QUEUE_BATCH_SIZE and not self._queue.empty():
+                ask = self._queue.get_nowait()
+                if ask is None:
+                    closing = True
+                    break
+                batch.append(ask)
+
+            try:
+                grants = await asyncio.to_thread(
+                    self._allocate, [(ask.eu_size, ask.quantity) for ask in batch]
+                )
+            except Exception as exc:
+                logger.exception("Drop queue batch failed for sneaker %s", self.sneaker_id)
+                for ask in batch:
+                    if not ask.future.done():
+                        ask.future.set_exception(exc)
+            else:
+                for ask, granted in zip(batch, grants):
+                    if not ask.future.done():
+                        ask.future.set_result(granted)
+            if closing:
+                return
+
+    def _allocate(self, asks: list[tuple[int, int]]) -> list[bool]:
+        """Grant asks in arrival order against the locked size rows (worker thread)."""
+        db = self.session_factory()
+        try:
+            size = models.SneakerSize
+            stock = {
+                row.eu_size: row.stock
+                for row in db.query(size)
+                .filter(
+                    size.sneaker_id == self.sneaker_id,
+                    size.eu_size.in_({eu_size for eu_size, _ in asks}),
+                )
+                .with_for_update()
+            }
+            left = dict(stock)
+            grants = []
+            for eu_size, quantity in asks:
+                # an ask too big for what is left doesn't hold up smaller ones
+                granted = left.get(eu_size, 0) >= quantity
+                if granted:
+                    left[eu_size] -= quantity
+                grants.append(granted)
+
+            deltas = {
+                (self.sneaker_id, eu_size): stock[eu_size] - left[eu_size]
+                for eu_size in stock
+            }
+            if not apply_stock_deltas(db, deltas):
+                raise RuntimeError("Stock changed outside the waiting room")
+            db.commit()
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.granted += sum(grants)
+        self.rejected += len(grants) - sum(grants)
+        recheck_at = time.monotonic() + SOLD_OUT_RECHECK_SECONDS
+        for eu_size, _ in asks:
+            if left.get(eu_size, 0) <= 0:
+                self._sold_out_until[eu_size] = recheck_at
+        if any(grants):
+            invalidate_catalog()
+        return grants
+
+    def stats(self) -> schemas.WaitingRoomStats:
+        return schemas.WaitingRoomStats(
+            sneaker_id=self.sneaker_id,
+            open=True,
+            waiting=self.waiting,
+            granted=self.granted,
+            rejected=self.rejected,
+            batches=self.batches,
+        )
+
+
+class WaitingRoom:
+    """The open drop queues, by sneaker id. Lives on the app's event loop."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._queues: dict[int, DropQueue] = {}
+
+    def is_open(self, sneaker_id: int) -> bool:
+        return sneaker_id in self._queues
+
+    async def open(self, sneaker_id: int) -> DropQueue:
+        if sneaker_id not in self._queues:
+            self._queues[sneaker_id] = DropQueue(sneaker_id, self.session_factory)
+        return self._queues[sneaker_id]
+
+    async def close(self, sneaker_id: int) -> schemas.WaitingRoomStats:
+        """Final counters of the room (open=False)."""
+        drop_queue = self._queues.pop(sneaker_id, None)
+        if drop_queue is None:
+            return self.stats(sneaker_id)
+        await drop_queue.close()
+        return drop_queue.stats().model_copy(update={"open": False})
+
+    async def close_all(self) -> None:
+        for sneaker_id in list(self._queues):
+            await self.close(sneaker_id)
+
+    async def reserve(self, sneaker_id: int, eu_size: int, quantity: int) -> bool | None:
+        """Granted or not; None when the sneaker has no open waiting room."""
+        drop_queue = self._queues.get(sneaker_id)
+        if drop_queue is None:
+            return None
+        return await drop_queue.reserve(eu_size, quantity)
+
+    def stats(self, sneaker_id: int) -> schemas.WaitingRoomStats:
+        drop_queue = self._queues.get(sneaker_id)
+        if drop_queue is None:
+            return schemas.WaitingRoomStats(
+                sneaker_id=sneaker_id, open=False, waiting=0, granted=0, rejected=0, batches=0
+            )
+        return drop_queue.stats()
+
+
+waiting_room = WaitingRoom()
@@ -0,0 +1,133 @@
+# app/fields.py
+"""
+Sparse fieldsets: ?fields=id,name,price or, for nested objects,
+?fields=id,quantity,sneaker.name,sneaker.price.
+
+parse_fields() turns the query value into a spec like
+{"id": True, "sneaker": {"name": True}} (validated against the response
+schema), loader_options() narrows what the ORM loads to that spec, and
+dump_sparse() serializes only the requested attributes.
+"""
+import types
+import typing
+from functools import lru_cache
+
+from fastapi import HTTPException
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, raiseload, selectinload
+
+Spec = dict[str, "bool | Spec"]
+
+
+def _nested_model(annotation) -> tuple[type[BaseModel], bool] | None:
+    """(model, is_list) when a field holds a model, a list of models or an optional model."""
+    origin = typing.get_origin(annotation)
+    if origin in (list, typing.List):
+        inner = _nested_model(typing.get_args(annotation)[0])
+        return (inner[0], True) if inner else None
+    if origin in (typing.Union, types.UnionType):
+        for arg in typing.get_args(annotation):
+            if arg is not type(None):
+                return _nested_model(arg)
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None
+
+
+def parse_fields(fields: str | None, schema: type[BaseModel]) -> Spec | None:
+    """None means "everything" (no fields= given)."""
+    if fields is None or not fields.strip():
+        return None
+
+    spec: Spec = {}
+    for path in (part.strip() for part in fields.split(",")):
+        if not path:
+            continue
+        node, model = spec, schema
+        names = path.split(".")
+        for depth, name in enumerate(names):
+            if model is None or name not in model.model_fields:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {path}")
+            if depth == len(names) - 1:
+                node[name] = True
+                break
+            if node.get(name) is True:
+                break  # whole sub-object already requested
+            nested = _nested_model(model.model_fields[name].annotation)
+            node = node.setdefault(name, {})
+            model = nested[0] if nested else None
+    return spec
+
+
+def loader_options(entity, spec: Spec, extra_columns=()) -> list:
+    """
+    ORM loader options fetching only what spec asks for: load_only() on the
+    requested columns, selectinload() on requested relationships and
+    raiseload() on the rest, so a missed attribute fails loudly instead of
+    lazy-loading once per row.
+    """
+    mapper = inspect(entity)
+    columns = {column.key: getattr(entity, column.key) for column in mapper.primary_key}
+    for attr in extra_columns:
+        columns[attr.key] = attr
+    for key in spec:
+        if key in mapper.column_attrs:
+            columns[key] = getattr(entity, key)
+        elif key in mapper.composites:
+            # a composite needs all of its columns, however few fields are asked for
+            for column in mapper.composites[key].columns:
+                prop = mapper.get_property_by_column(column)
+                columns[prop.key] = getattr(entity, prop.key)
+
+    options = []
+    for relationship in mapper.relationships:
+        attr = getattr(entity, relationship.key)
+        sub = spec.get(relationship.key)
+        if sub is None:
+            options.append(raiseload(attr))
+            continue
+        # the parent side of a many-to-one needs its foreign key loaded
+        for column in relationship.local_columns:
+            prop = mapper.get_property_by_column(column)
+            columns[prop.key] = getattr(entity, prop.key)
+        loader = selectinload(attr)
+        if isinstance(sub, dict):
+            loader = loader.options(*loader_options(relationship.mapper.class_, sub))
+        options.append(loader)
+
+    if any(key not in mapper.attrs for key in spec):
+        # a derived property (e.g. availability.sold_out) reads columns we
+        # can't see from here: load them all rather than lazy-load per row
+        return options
+    return [load_only(*columns.values()), *options]
+
+
+@lru_cache(maxsize=None)
+def _adapter(annotation) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+def dump_sparse(obj, spec: Spec, schema: type[BaseModel]) -> dict:
+    """JSON-ready dict with only the spec'd attributes of obj."""
+    data = {}
+    for key, sub in spec.items():
+        field = schema.model_fields[key]
+        value = getattr(obj, key, None)
+        if value is None and not field.is_required():
+            value = field.get_default(call_default_factory=True)
+        if sub is True:
+            adapter = _adapter(field.annotation)
+            data[key] = adapter.dump_python(
+                adapter.validate_python(value, from_attributes=True), mode="json"
+            )
+            continue
+        model, is_list = _nested_model(field.annotation)
+        if value is None:
+            data[key] = None
+        elif is_list:
+            data[key] = [dump_sparse(item, sub, model) for item in value]
+        else:
+            data[key] = dump_sparse(value, sub, model)
+    return data
@@ -0,0 +1,194 @@
+# app/group_commit.py
+"""
+Group commit: concurrent units of work (checkouts) that arrive within a
+short window share one transaction, and so one commit/fsync, instead of
+paying for one each.
+
+Every unit runs in its own SAVEPOINT, so one that fails (an empty cart, a
+sneaker gone) is rolled back alone and only its caller gets the error. If
+the group's transaction is rolled back by the database (deadlock, lock
+timeout), each unit is re-run in a transaction of its own so that no
+request fails because of its neighbours. Any other commit error goes back
+to every unit as is: the commit may have gone through, and re-running
+would place orders twice.
+
+The trade-off: a unit's row locks are held until the whole group commits,
+and every request waits up to the window before it starts. Keep the window
+at a few ms.
+
+Sync endpoints call in through anyio.from_thread.run(group.submit, work).
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 0 = off, every checkout commits on its own
+CHECKOUT_GROUP_COMMIT_MS = float(os.getenv("CHECKOUT_GROUP_COMMIT_MS", "0"))
+CHECKOUT_GROUP_MAX = int(os.getenv("CHECKOUT_GROUP_MAX", "64"))
+# deadlock, lock wait timeout: MySQL rolled the transaction back, safe to re-run
+ROLLED_BACK_MYSQL_ERRORS = {1205, 1213}
+
+Work = Callable[[Session], Any]
+
+
+@dataclass
+class _Unit:
+    work: Work
+    future: asyncio.Future
+
+
+class GroupCommitter:
+    """Queue + single consumer task, started on the event loop of the first submit."""
+
+    def __init__(
+        self,
+        window_ms: float = CHECKOUT_GROUP_COMMIT_MS,
+        max_group: int = CHECKOUT_GROUP_MAX,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.window_ms = window_ms
+        self.max_group = max_group
+        self.session_factory = session_factory
+        self.groups = 0
+        self.units = 0
+        self.fallbacks = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[_Unit | None] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+
+    async def submit(self, work: Work) -> Any:
+        """Run work(db) as part of the next group; its result or its exception."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._consume(self._queue), name="group-commit")
+        future = loop.create_future()
+        self._queue.put_nowait(_Unit(work, future))
+        return await future
+
+    async def close(self) -> None:
+        """Commit what is already queued, then stop the consumer."""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        while True:
+            first = await queue.get()
+            if first is None:
+                return
+            await asyncio.sleep(self.window_ms / 1000)
+            group = [first]
+            closing = False
+            while len(group) < self.max_group and not queue.empty():
+                unit = queue.get_nowait()
+                if unit is None:
+                    closing = True
+                    break
+                group.append(unit)
+
+            try:
+                outcomes = await asyncio.to_thread(self._run_group, [unit.work for unit in group])
+            except Exception as exc:
+                logger.exception("Group commit failed")
+                outcomes = [(None, exc)] * len(group)
+            for unit, (result, error) in zip(group, outcomes):
+                if unit.future.done():
+                    continue
+                if error is not None:
+                    unit.future.set_exception(error)
+                else:
+                    unit.future.set_result(result)
+            if closing:
+                return
+
+    # ---------- worker thread ----------
+
+    def _run_group(self, works: list[Work]) -> list[tuple[Any, Exception | None]]:
+        outcomes: list[tuple[Any, Exception | None]] = []
+        db = self.session_factory()
+        try:
+            _begin(db)
+            for work in works:
+                try:
+                    with db.begin_nested():
+                        outcomes.append((work(db), None))
+                except Exception as exc:
+                    if _not_committed(exc):
+                        raise  # the whole transaction is gone, not just this savepoint
+                    outcomes.append((None, exc))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            if not _not_committed(exc):
+                # the commit may have gone through: don't run anything twice
+                logger.exception("Group commit of %s units failed", len(works))
+                return [(None, error or exc) for _, error in _pad(outcomes, len(works))]
+            logger.warning("Group of %s units was rolled back, committing them one by one", len(works))
+            self.fallbacks += 1
+            outcomes = [
+                self._run_alone(work) if error is None else (None, error)
+                for work, (_, error) in zip(works, _pad(outcomes, len(works)))
+            ]
+        finally:
+            db.close()
+        self.groups += 1
+        self.units += len(works)
+        return outcomes
+
+    def _run_alone(self, work: Work) -> tuple[Any, Exception | None]:
+        db = self.session_factory()
+        try:
+            result = work(db)
+            db.commit()
+            return result, None
+        except Exception as exc:
+            db.rollback()
+            return None, exc
+        finally:
+            db.close()
+
+
+def _begin(db: Session) -> None:
+    """
+    Open the group's transaction before its first SAVEPOINT. pysqlite only
+    sends BEGIN ahead of DML, so there the first SAVEPOINT would become the
+    transaction and its RELEASE would commit it.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+
+def _not_committed(exc: Exception) -> bool:
+    """Errors after which the database has certainly rolled the transaction back."""
+    if not isinstance(exc, DBAPIError) or exc.orig is None:
+        return False
+    code = exc.orig.args[0] if exc.orig.args else None
+    if code in ROLLED_BACK_MYSQL_ERRORS:
+        return True
+    return "database is locked" in str(exc.orig)  # sqlite
+
+
+def _pad(outcomes: list, size: int) -> list:
+    """Outcomes of the units that never ran (group aborted early) count as clean."""
+    return outcomes + [(None, None)] * (size - len(outcomes))
+
+
+checkout_group = GroupCommitter()
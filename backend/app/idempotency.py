@@ -0,0 +1,183 @@
+# app/idempotency.py
+"""
+Idempotency-Key support for non-repeatable POSTs (checkout).
+
+The first request with a key claims it (a committed "pending" row), runs,
+and stores its response in the same transaction as its own writes.
+Requests repeating the key get that stored response back; ones arriving
+while the first is still running wait for its outcome. A failed request
+deletes its claim so the client can retry with the same key.
+
+A claim is a lease: one left pending for IDEMPOTENCY_LEASE_SECONDS (its
+worker crashed or hung) is taken over by the next request with the key.
+Claims are fenced by a random token, so a late first worker can neither store its
+response over the new claim nor free it.
+"""
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# how long a duplicate waits for the first request before giving up
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# a pending claim older than this is abandoned and may be taken over
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+# how often expired keys are deleted; <= 0 turns the background purge off
+PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+POLL_INTERVAL_SECONDS = 0.05
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+@dataclass(frozen=True)
+class KeyClaim:
+    """The key row this request owns while it runs."""
+    user_id: int
+    key: str
+    token: str
+
+
+def _key_filter(user_id: int, key: str) -> tuple:
+    row = models.IdempotencyKey
+    return (row.user_id == user_id, row.key == key)
+
+
+def _stored(db: Session, user_id: int, key: str):
+    row = models.IdempotencyKey
+    return db.execute(
+        select(
+            row.id, row.status, row.status_code, row.response_body, row.created_at, row.expires_at
+        ).where(
+            *_key_filter(user_id, key)
+        )
+    ).first()
+
+
+def _claimed(claim: KeyClaim) -> tuple:
+    row = models.IdempotencyKey
+    return (*_key_filter(claim.user_id, claim.key), row.claim_token == claim.token, row.status == "pending")
+
+
+def _try_claim(db: Session, user_id: int, key: str, now: datetime) -> KeyClaim | None:
+    token = uuid.uuid4().hex
+    db.add(
+        models.IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            status="pending",
+            claim_token=token,
+            created_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        )
+    )
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    return KeyClaim(user_id=user_id, key=key, token=token)
+
+
+def _drop(db: Session, *conditions) -> None:
+    db.execute(
+        delete(models.IdempotencyKey)
+        .where(*conditions)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def replay_or_claim(db: Session, user_id: int, key: str) -> JSONResponse | KeyClaim:
+    """
+    The claim when this request now owns the key and should run; otherwise
+    the response stored by the request that ran first.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        claim = _try_claim(db, user_id, key, now)
+        if claim is not None:
+            return claim
+
+        stored = _stored(db, user_id, key)
+        db.rollback()  # next read starts a fresh transaction (fresh snapshot)
+        if stored is None:
+            continue  # the first attempt failed meanwhile: run it ourselves
+        if stored.expires_at <= now:
+            _drop(db, *_key_filter(user_id, key), models.IdempotencyKey.expires_at <= now)
+            continue
+        if stored.status == "done":
+            return JSONResponse(
+                content=json.loads(stored.response_body),
+                status_code=stored.status_code,
+                headers={REPLAYED_HEADER: "true"},
+            )
+        if stored.created_at <= now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS):
+            # the claim outlived its lease: free it (unless it just finished) and claim anew
+            _drop(db, models.IdempotencyKey.id == stored.id, models.IdempotencyKey.status == "pending")
+            continue
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def complete_key(db: Session, claim: KeyClaim, body, status_code: int = 200) -> None:
+    """
+    Store the response; call inside the request's own transaction, before
+    commit. A claim that was taken over fails the request (409), so its
+    writes roll back instead of committing a second outcome for the key.
+    """
+    result = db.execute(
+        update(models.IdempotencyKey)
+        .where(*_claimed(claim))
+        .values(status="done", status_code=status_code, response_body=json.dumps(body))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise HTTPException(
+            status_code=409,
+            detail="This request's Idempotency-Key claim expired and was taken over",
+        )
+
+
+def release_key(db: Session, claim: KeyClaim) -> None:
+    """The request failed: roll it back and free the key for a retry."""
+    db.rollback()
+    _drop(db, *_claimed(claim))
+
+
+def purge_expired_keys(db: Session, now: datetime | None = None) -> int:
+    result = db.execute(
+        delete(models.IdempotencyKey)
+        .where(models.IdempotencyKey.expires_at <= (now or datetime.utcnow()))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def run_purge() -> None:
+    """One purge in its own session (used by the background task)."""
+    db = SessionLocal()
+    try:
+        purge_expired_keys(db)
+    finally:
+        db.close()
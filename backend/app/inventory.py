@@ -0,0 +1,457 @@
+# app/inventory.py
+"""
+Stock bookkeeping shared by the routers.
+
+Every stock change must also go through record_stock_change() in the same
+transaction. It only marks the sneaker: its sneaker_availability summary is
+recomputed from sneaker_sizes in a short transaction of its own once that
+transaction commits, so reservations never queue on the one summary row
+of a hot sneaker. Rebuild all summaries with:
+
+    python -m app.inventory
+
+Drop mode (hyped releases): a size's stock can be split over
+sneaker_size_stripes rows while sneaker_sizes.stock sits at 0, so
+reservations spread over N rows instead of all serializing on one. See
+enable_drop_mode() / rebalance_drop() / collapse_drop().
+"""
+import logging
+import random
+from typing import Iterable, Mapping
+
+from sqlalchemy import bindparam, delete, event, func, insert, select, tuple_, union_all, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 1000
+MAX_STRIPES = 64
+
+_STALE_KEY = "stale_availability"
+_COMMITTED_KEY = "committed_stale_availability"
+
+
+def size_bit(eu_size: int) -> int:
+    """Mask bit for an EU size, 0 if the size falls outside the mask."""
+    offset = eu_size - models.AVAILABILITY_SIZE_BASE
+    if 0 <= offset < models.AVAILABILITY_MASK_BITS:
+        return 1 << offset
+    return 0
+
+
+def record_stock_change(
+    db: Session, sneaker_id: int, eu_size: int, old_stock: int, new_stock: int
+) -> None:
+    """
+    Note one size's stock change for the sneaker's availability summary.
+
+    Nothing is written here: the summary is recomputed once db commits
+    (see _refresh_stale_availability), outside the transaction holding
+    the stock row locks, and not at all if it rolls back.
+    """
+    if new_stock != old_stock:
+        _mark_stale(db, sneaker_id)
+
+
+def _mark_stale(db: Session, sneaker_id: int) -> None:
+    db.info.setdefault(_STALE_KEY, set()).add(sneaker_id)
+
+
+def _size_filter(sneaker_id: int, eu_size: int) -> tuple:
+    size = models.SneakerSize
+    return (size.sneaker_id == sneaker_id, size.eu_size == eu_size)
+
+
+def _row_stock(db: Session, sneaker_id: int, eu_size: int) -> int | None:
+    return db.execute(
+        select(models.SneakerSize.stock).where(*_size_filter(sneaker_id, eu_size))
+    ).scalar()
+
+
+def current_stock(db: Session, sneaker_id: int, eu_size: int) -> int | None:
+    """Stock of one size (stripes included), None if the sneaker has no such size."""
+    stock = _row_stock(db, sneaker_id, eu_size)
+    if stock is None:
+        return None
+    striped = db.execute(
+        select(func.sum(models.SneakerSizeStripe.stock)).where(
+            *_stripe_filter(sneaker_id, eu_size)
+        )
+    ).scalar()
+    return stock + int(striped or 0)
+
+
+def reserve_stock(db: Session, sneaker_id: int, eu_size: int, quantity: int) -> bool:
+    """
+    Take quantity units of a size, all or nothing.
+
+    A single conditional UPDATE ... SET stock = stock - q WHERE stock >= q:
+    the row lock taken by the UPDATE makes check and decrement atomic, so
+    concurrent reservations can never oversell, and the affected row
+    count tells whether this one won. Nothing is read beforehand.
+    """
+    size = models.SneakerSize
+    result = db.execute(
+        update(size)
+        .where(*_size_filter(sneaker_id, eu_size), size.stock >= quantity)
+        .values(stock=size.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # in drop mode the row stays at 0 and the stock is in the stripes
+        return _reserve_from_stripes(db, sneaker_id, eu_size, quantity)
+    # our own (still uncommitted) write is what we read back here
+    new_stock = _row_stock(db, sneaker_id, eu_size)
+    record_stock_change(db, sneaker_id, eu_size, new_stock + quantity, new_stock)
+    return True
+
+
+def release_stock(db: Session, sneaker_id: int, eu_size: int, quantity: int) -> bool:
+    """Give quantity units back. False if the size does not exist."""
+    size = models.SneakerSize
+    result = db.execute(
+        update(size)
+        .where(*_size_filter(sneaker_id, eu_size))
+        .values(stock=size.stock + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return False
+    new_stock = _row_stock(db, sneaker_id, eu_size)
+    record_stock_change(db, sneaker_id, eu_size, new_stock - quantity, new_stock)
+    return True
+
+
+_sizes = models.SneakerSize.__table__
+# executemany form of reserve_stock/release_stock (negative delta = give back)
+_apply_delta = (
+    update(_sizes)
+    .where(
+        _sizes.c.sneaker_id == bindparam("b_sneaker_id"),
+        _sizes.c.eu_size == bindparam("b_eu_size"),
+        _sizes.c.stock >= bindparam("b_delta"),
+    )
+    .values(stock=_sizes.c.stock - bindparam("b_delta"))
+)
+
+
+def apply_stock_deltas(db: Session, deltas: Mapping[tuple[int, int], int]) -> bool:
+    """
+    Take (delta > 0) or give back (delta < 0) stock for many
+    (sneaker_id, eu_size) pairs at once: one executemany conditional
+    UPDATE, one read of the new levels for the availability summaries.
+
+    False when a size is missing or short of stock; the other rows may
+    already be updated, so the caller must roll back.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return True
+
+    result = db.execute(
+        _apply_delta,
+        [
+            {"b_sneaker_id": sneaker_id, "b_eu_size": eu_size, "b_delta": delta}
+            for (sneaker_id, eu_size), delta in deltas.items()
+        ],
+    )
+    if result.rowcount != len(deltas):
+        return False
+
+    size = models.SneakerSize
+    new_levels = db.execute(
+        select(size.sneaker_id, size.eu_size, size.stock).where(
+            tuple_(size.sneaker_id, size.eu_size).in_(list(deltas))
+        )
+    ).all()
+    for sneaker_id, eu_size, stock in new_levels:
+        delta = deltas[(sneaker_id, eu_size)]
+        record_stock_change(db, sneaker_id, eu_size, stock + delta, stock)
+    return True
+
+
+# ---------- drop mode: striped counters ----------
+
+
+def _stripe_filter(sneaker_id: int, eu_size: int) -> tuple:
+    stripe = models.SneakerSizeStripe
+    return (stripe.sneaker_id == sneaker_id, stripe.eu_size == eu_size)
+
+
+def _is_striped(db: Session, sneaker_id: int, eu_size: int) -> bool:
+    return db.execute(
+        select(models.SneakerSizeStripe.id).where(*_stripe_filter(sneaker_id, eu_size)).limit(1)
+    ).first() is not None
+
+
+def _take_from_stripe(db: Session, where: tuple, quantity: int) -> bool:
+    stripe = models.SneakerSizeStripe
+    result = db.execute(
+        update(stripe)
+        .where(*where, stripe.stock >= quantity)
+        .values(stock=stripe.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return bool(result.rowcount)
+
+
+def _reserve_from_stripes(db: Session, sneaker_id: int, eu_size: int, quantity: int) -> bool:
+    """
+    Take quantity units from the stripes: from one stripe when one looks
+    big enough (tried in random order), otherwise a part from each of
+    several. Every take is the same conditional UPDATE as reserve_stock,
+    so a stale read can only cost a retry, never oversell; a split take
+    that comes up short is given back before returning False.
+
+    To keep the stripes independent, stripe reservations don't mark the
+    (single, shared) availability row stale; it is recomputed when a stripe
+    runs dry, so total_stock may run high during a drop but sold_out and
+    in_stock_sizes flip when the size really sells out.
+    """
+    stripe = models.SneakerSizeStripe
+    levels = dict(
+        db.execute(
+            select(stripe.stripe, stripe.stock).where(
+                *_stripe_filter(sneaker_id, eu_size), stripe.stock > 0
+            )
+        ).all()
+    )
+    if sum(levels.values()) < quantity:
+        return False
+
+    def where(number: int) -> tuple:
+        return (*_stripe_filter(sneaker_id, eu_size), stripe.stripe == number)
+
+    def emptied(numbers: Iterable[int]) -> bool:
+        return db.execute(
+            select(stripe.id).where(
+                *_stripe_filter(sneaker_id, eu_size), stripe.stripe.in_(list(numbers)), stripe.stock == 0
+            ).limit(1)
+        ).first() is not None
+
+    candidates = [number for number, stock in levels.items() if stock >= quantity]
+    random.shuffle(candidates)
+    for number in candidates:
+        if _take_from_stripe(db, where(number), quantity):
+            if emptied([number]):
+                _mark_stale(db, sneaker_id)
+            return True
+
+    # no single stripe holds enough: split the take, biggest stripes first
+    taken: dict[int, int] = {}
+    remaining = quantity
+    for number, stock in sorted(levels.items(), key=lambda item: -item[1]):
+        part = min(remaining, stock)
+        if _take_from_stripe(db, where(number), part):
+            taken[number] = part
+            remaining -= part
+        if remaining == 0:
+            break
+    if remaining:
+        for number, part in taken.items():
+            db.execute(
+                update(stripe)
+                .where(*where(number))
+                .values(stock=stripe.stock + part)
+                .execution_options(synchronize_session=False)
+            )
+        return False
+    if emptied(taken):
+        _mark_stale(db, sneaker_id)
+    return True
+
+
+def stripe_stocks(db: Session, sneaker_id: int, eu_size: int) -> list[int]:
+    """Stock per stripe, in stripe order; [] when the size is not striped."""
+    stripe = models.SneakerSizeStripe
+    return list(
+        db.execute(
+            select(stripe.stock)
+            .where(*_stripe_filter(sneaker_id, eu_size))
+            .order_by(stripe.stripe)
+        ).scalars()
+    )
+
+
+def _restripe(db: Session, sneaker_id: int, eu_size: int, stripes: int) -> list[int] | None:
+    """
+    Gather the size's whole stock (row + stripes, both locked) and spread
+    it evenly over `stripes` new stripes, or put it all back on the row
+    when stripes == 0. None if the size does not exist.
+    """
+    size_row = (
+        db.query(models.SneakerSize)
+        .filter(*_size_filter(sneaker_id, eu_size))
+        .with_for_update()
+        .first()
+    )
+    if size_row is None:
+        return None
+
+    stripe = models.SneakerSizeStripe
+    striped = db.execute(
+        select(stripe.stock).where(*_stripe_filter(sneaker_id, eu_size)).with_for_update()
+    ).scalars().all()
+    total = size_row.stock + sum(striped)
+    db.execute(
+        delete(stripe)
+        .where(*_stripe_filter(sneaker_id, eu_size))
+        .execution_options(synchronize_session=False)
+    )
+
+    if stripes == 0:
+        size_row.stock = total
+        shares = []
+    else:
+        size_row.stock = 0
+        share, extra = divmod(total, stripes)
+        shares = [share + (1 if number < extra else 0) for number in range(stripes)]
+        db.execute(
+            insert(stripe.__table__),
+            [
+                {"sneaker_id": sneaker_id, "eu_size": eu_size, "stripe": number, "stock": stock}
+                for number, stock in enumerate(shares)
+            ],
+        )
+    refresh_availability(db, [sneaker_id])
+    return shares
+
+
+def enable_drop_mode(db: Session, sneaker_id: int, eu_size: int, stripes: int) -> list[int] | None:
+    """Split the size's stock over `stripes` rows (re-splitting if already striped)."""
+    if not 2 <= stripes <= MAX_STRIPES:
+        raise ValueError(f"stripes must be between 2 and {MAX_STRIPES}")
+    return _restripe(db, sneaker_id, eu_size, stripes)
+
+
+def rebalance_drop(db: Session, sneaker_id: int, eu_size: int) -> list[int] | None:
+    """Even out the stripes of a striped size (some run dry before others)."""
+    return _restripe(db, sneaker_id, eu_size, len(stripe_stocks(db, sneaker_id, eu_size)))
+
+
+def collapse_drop(db: Session, sneaker_id: int, eu_size: int) -> list[int] | None:
+    """End drop mode: all remaining stock goes back on the sneaker_sizes row."""
+    return _restripe(db, sneaker_id, eu_size, 0)
+
+
+def refresh_availability(db: Session, sneaker_ids: Iterable[int]) -> None:
+    """
+    Recompute the summary rows of sneaker_ids from sneaker_sizes (plus
+    any drop-mode stripes) with aggregate reads, then rewrite them. Used for new sneakers, imports and
+    backfills, and after commit for the sneakers whose stock changed.
+    """
+    sneaker_ids = list(dict.fromkeys(sneaker_ids))
+    if not sneaker_ids:
+        return
+
+    db.flush()  # pending ORM stock changes must be visible to the aggregate
+    availability = models.SneakerAvailability
+    # concurrent refreshes of a sneaker take turns, so the last one to
+    # write is also the one that read the latest stock
+    db.execute(
+        select(availability.sneaker_id)
+        .where(availability.sneaker_id.in_(sneaker_ids))
+        .with_for_update()
+    ).all()
+    summaries = {sneaker_id: [0, 0] for sneaker_id in sneaker_ids}
+    size = models.SneakerSize
+    stripe = models.SneakerSizeStripe
+    rows = db.execute(
+        union_all(
+            select(size.sneaker_id, size.eu_size, func.sum(size.stock))
+            .where(size.sneaker_id.in_(sneaker_ids))
+            .group_by(size.sneaker_id, size.eu_size),
+            select(stripe.sneaker_id, stripe.eu_size, func.sum(stripe.stock))
+            .where(stripe.sneaker_id.in_(sneaker_ids))
+            .group_by(stripe.sneaker_id, stripe.eu_size),
+        )
+    )
+    per_size: dict[tuple[int, int], int] = {}
+    for sneaker_id, eu_size, stock in rows:
+        key = (sneaker_id, eu_size)
+        per_size[key] = per_size.get(key, 0) + int(stock or 0)
+    for (sneaker_id, eu_size), stock in per_size.items():
+        summaries[sneaker_id][0] += stock
+        if stock > 0:
+            summaries[sneaker_id][1] |= size_bit(eu_size)
+
+    db.query(availability).filter(availability.sneaker_id.in_(sneaker_ids)).delete(
+        synchronize_session=False
+    )
+    db.execute(
+        insert(availability.__table__),
+        [
+            {"sneaker_id": sneaker_id, "total_stock": total, "in_stock_mask": mask}
+            for sneaker_id, (total, mask) in summaries.items()
+        ],
+    )
+
+
+def _refresh_committed(bind: Engine | Connection, sneaker_ids: set[int]) -> None:
+    with Session(bind=bind) as db:
+        refresh_availability(db, sorted(sneaker_ids))
+        db.commit()
+
+
+@event.listens_for(Session, "after_commit")
+def _keep_stale_availability(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint was released, the outer transaction goes on
+    stale = session.info.pop(_STALE_KEY, None)
+    if stale:
+        session.info[_COMMITTED_KEY] = stale
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _refresh_stale_availability(session: Session, transaction) -> None:
+    # runs once the connection is back in the pool, so the refresh never
+    # needs a second one; after a rollback there is nothing to refresh
+    if transaction.parent is not None:
+        return
+    session.info.pop(_STALE_KEY, None)
+    stale = session.info.pop(_COMMITTED_KEY, None)
+    if not stale:
+        return
+    try:
+        _refresh_committed(session.get_bind(), stale)
+    except Exception:
+        # the stock change itself is committed; the next change to these
+        # sneakers, or python -m app.inventory, brings the summaries back
+        logger.exception("Refreshing availability of sneakers %s failed", sorted(stale))
+
+
+def rebuild_availability(db: Session, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Backfill every sneaker's summary, one committed batch at a time."""
+    rebuilt = 0
+    last_id = 0
+    while True:
+        ids = [
+            sneaker_id
+            for (sneaker_id,) in db.query(models.Sneaker.id)
+            .filter(models.Sneaker.id > last_id)
+            .order_by(models.Sneaker.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return rebuilt
+        refresh_availability(db, ids)
+        db.commit()
+        rebuilt += len(ids)
+        last_id = ids[-1]
+
+
+def main():
+    db: Session = SessionLocal()
+    try:
+        rebuilt = rebuild_availability(db)
+    finally:
+        db.close()
+    print(f"✅ Rebuilt availability for {rebuilt} sneakers.")
+
+
+if __name__ == "__main__":
+    main()
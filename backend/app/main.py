@@ -1,19 +1,67 @@
 # backend/app/main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
 from . import models
+from .background import start_periodic, stop_all
+from .catalog_cache import on_catalog_change
+from .catalog_publisher import snapshot_publisher
 from .database import engine
-from .routers import auth, sneakers, cart,orders
+from .drop_queue import waiting_room
+from .group_commit import checkout_group
+from .idempotency import PURGE_INTERVAL_SECONDS, run_purge
+from .outbox import OUTBOX_PURGE_INTERVAL_SECONDS, default_worker, run_event_purge
+from .pagination import NEXT_CURSOR_HEADER
+from .reservations import CART_SWEEP_INTERVAL_SECONDS, run_sweeper
+from .rollups import SALES_ROLLUP_INTERVAL_SECONDS, run_refresh
+from .schema_upgrades import upgrade_schema
+from .search_index import warm_search_index
+from .routers import analytics, auth, sneakers, cart,orders
 
 
-# Create DB tables
+# Create DB tables, then add columns/indexes newer than existing ones
 if os.getenv("DISABLE_AUTO_CREATE_DB") != "1":
     models.Base.metadata.create_all(bind=engine)
-app = FastAPI(title="Sneaker Shop API")
+    upgrade_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-rendered catalog JSON under /static/catalog, republished on change
+    if os.getenv("CATALOG_SNAPSHOTS") == "1":
+        on_catalog_change(snapshot_publisher.request)
+        snapshot_publisher.request()
+
+    # built off the event loop, before the first search needs it
+    tasks = [asyncio.create_task(asyncio.to_thread(warm_search_index), name="search-index-build")]
+    # give back stock held by cart items whose reservation ran out
+    if CART_SWEEP_INTERVAL_SECONDS > 0:
+        tasks.append(
+            start_periodic("cart-reservation-sweeper", CART_SWEEP_INTERVAL_SECONDS, run_sweeper)
+        )
+    if PURGE_INTERVAL_SECONDS > 0:
+        tasks.append(start_periodic("idempotency-key-purge", PURGE_INTERVAL_SECONDS, run_purge))
+    if OUTBOX_PURGE_INTERVAL_SECONDS > 0:
+        tasks.append(
+            start_periodic("outbox-event-purge", OUTBOX_PURGE_INTERVAL_SECONDS, run_event_purge)
+        )
+    if SALES_ROLLUP_INTERVAL_SECONDS > 0:
+        tasks.append(start_periodic("sales-rollup", SALES_ROLLUP_INTERVAL_SECONDS, run_refresh))
+    # deliver outbox events in-process; otherwise run `python -m app.outbox`
+    if os.getenv("OUTBOX_WORKER") == "1":
+        tasks.append(asyncio.create_task(default_worker().run_forever(), name="outbox-worker"))
+    yield
+    await waiting_room.close_all()
+    await checkout_group.close()
+    await stop_all(tasks)
+
+
+app = FastAPI(title="Sneaker Shop API", lifespan=lifespan)
 
 
 # ---- CORS SETUP (DEV) ----
@@ -23,6 +71,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # the browser hides response headers from JS unless they are listed
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 # ---------------------------
 
@@ -42,6 +92,7 @@ app.include_router(auth.router)
 app.include_router(sneakers.router)
 app.include_router(cart.router)
 app.include_router(orders.router)
+app.include_router(analytics.router)
 
 @app.get("/")
 def read_root():
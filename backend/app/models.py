@@ -1,7 +1,8 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Float,Boolean,ForeignKey,DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float,Boolean,ForeignKey,DateTime,Date,Index,BigInteger,UniqueConstraint,Text
+from sqlalchemy.orm import composite, relationship
 from .database import Base
+from dataclasses import dataclass
 from datetime import datetime
 
 sneak_id = "sneakers.id"
@@ -24,6 +25,22 @@ class Sneaker(Base):
         back_populates="sneaker",
         cascade="all, delete-orphan",
     )
+    availability = relationship(
+        "SneakerAvailability",
+        back_populates="sneaker",
+        uselist=False,
+        lazy="joined",  # one row per sneaker, comes with the sneaker query
+        cascade="all, delete-orphan",
+    )
+
+    __table_args__ = (
+        # keyset pagination on (sort key, id) for GET /sneakers/
+        Index("ix_sneakers_price_id", "price", "id"),
+        Index("ix_sneakers_brand_id", "brand", "id"),
+        # faceted filtering: gender/brand equality + price range
+        Index("ix_sneakers_gender_brand_price", "gender", "brand", "price"),
+        Index("ix_sneakers_tag_price", "tag", "price"),
+    )
 
 class SneakerSize(Base):
     __tablename__ = "sneaker_sizes"
@@ -34,6 +51,61 @@ class SneakerSize(Base):
     stock = Column(Integer, nullable=False, default=0)
     sneaker = relationship("Sneaker", back_populates="sizes")
 
+    __table_args__ = (
+        # size lookups per sneaker and the "in stock in size X" filter
+        Index("ix_sneaker_sizes_sneaker_size_stock", "sneaker_id", "eu_size", "stock"),
+        # size facet counts: all in-stock rows of one size
+        Index("ix_sneaker_sizes_size_stock_sneaker", "eu_size", "stock", "sneaker_id"),
+    )
+
+class SneakerSizeStripe(Base):
+    """
+    Drop mode: the stock of a hot size split over several counter rows, so
+    concurrent reservations spread out instead of queueing on the single
+    sneaker_sizes row (which holds 0 meanwhile). See app/inventory.py.
+    """
+    __tablename__ = "sneaker_size_stripes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sneaker_id = Column(Integer, ForeignKey(sneak_id), nullable=False)
+    eu_size = Column(Integer, nullable=False)
+    stripe = Column(Integer, nullable=False)
+    stock = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("sneaker_id", "eu_size", "stripe", name="uq_sneaker_size_stripes"),
+    )
+
+# in_stock_mask bit i  <->  EU size AVAILABILITY_SIZE_BASE + i, so EU 16..78;
+# new sizes outside that range are rejected (schemas.SneakerSizeCreate)
+AVAILABILITY_SIZE_BASE = 16
+AVAILABILITY_MASK_BITS = 63
+
+class SneakerAvailability(Base):
+    """
+    Denormalized stock summary, one row per sneaker, recomputed right after
+    every committed stock change (see app/inventory.py).
+    """
+    __tablename__ = "sneaker_availability"
+
+    sneaker_id = Column(Integer, ForeignKey(sneak_id), primary_key=True)
+    total_stock = Column(Integer, nullable=False, default=0, index=True)
+    in_stock_mask = Column(BigInteger, nullable=False, default=0)
+    sneaker = relationship("Sneaker", back_populates="availability")
+
+    @property
+    def in_stock_sizes(self) -> list[int]:
+        mask = self.in_stock_mask or 0
+        return [
+            AVAILABILITY_SIZE_BASE + bit
+            for bit in range(AVAILABILITY_MASK_BITS)
+            if mask >> bit & 1
+        ]
+
+    @property
+    def sold_out(self) -> bool:
+        return (self.total_stock or 0) <= 0
+
 class User(Base):
     __tablename__ = "users"
 
@@ -52,6 +124,10 @@ class CartItem(Base):
     size = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
     image_url = Column(String(255), nullable=True)
+    # stock stays held for this line until then; NULL = never expires
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+    sneaker = relationship("Sneaker")
 
 class Order(Base):
     __tablename__ = "orders"
@@ -64,6 +140,22 @@ class Order(Base):
     user = relationship("User")
     items = relationship("OrderItem", back_populates="order")
 
+    __table_args__ = (
+        # order history: a user's orders, newest first
+        Index("ix_orders_user_created", "user_id", "created_at", "id"),
+    )
+
+@dataclass
+class SneakerSnapshot:
+    """The sneaker as it was when ordered (OrderItem.sneaker)."""
+    id: int
+    name: str | None
+    brand: str | None
+    price: float
+    colorway: str | None
+    image_url: str | None
+
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
@@ -73,8 +165,98 @@ class OrderItem(Base):
     size = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)  # snapshot price at time of order
+    # snapshot of the sneaker at time of order, so history needs no join
+    # (NULL on rows older than the columns until backfill_order_snapshots runs)
+    sneaker_name = Column(String(255), nullable=True)
+    sneaker_brand = Column(String(100), nullable=True)
+    sneaker_colorway = Column(String(255), nullable=True)
+    sneaker_image_url = Column(String(255), nullable=True)
 
     order = relationship("Order", back_populates="items")
-    sneaker = relationship("Sneaker")
+    sneaker = composite(
+        SneakerSnapshot,
+        sneaker_id,
+        sneaker_name,
+        sneaker_brand,
+        price,
+        sneaker_colorway,
+        sneaker_image_url,
+    )
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of a request sent with an Idempotency-Key header, so retries
+    get the first response back instead of running again (app/idempotency.py).
+    """
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey(users_id), nullable=False)
+    key = Column(String(255), nullable=False)
+    status = Column(String(16), nullable=False, default="pending")  # pending | done
+    # random per claim, so a request whose claim was taken over can't touch the new one
+    claim_token = Column(String(32), nullable=True)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+
+class OutboxEvent(Base):
+    """
+    Side effect of a committed change (e.g. "order.created"), written in
+    the same transaction and delivered later by the outbox worker (app/outbox.py).
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String(16), nullable=False, default="pending")  # pending | processing | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # the worker's claim query: due events in order
+        Index("ix_outbox_events_status_available", "status", "available_at", "id"),
+        # the retention purge: delivered events, oldest first
+        Index("ix_outbox_events_status_processed", "status", "processed_at"),
+    )
+
+
+class SalesDaily(Base):
+    """
+    Units and revenue per UTC day x sneaker x size x gender, folded in from
+    order_items by app/rollups.py so reports never scan the order tables.
+    """
+    __tablename__ = "sales_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    sneaker_id = Column(Integer, nullable=False)  # no FK: history outlives the catalog
+    size = Column(Integer, nullable=False)
+    gender = Column(String(10), nullable=False, default="")  # "" when the sneaker has none
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "sneaker_id", "size", "gender", name="uq_sales_daily_key"),
+    )
+
 
+class RollupState(Base):
+    """How far each rollup has read its source table (last source id included)."""
+    __tablename__ = "rollup_state"
 
+    name = Column(String(64), primary_key=True)
+    high_water_mark = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
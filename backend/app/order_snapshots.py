@@ -0,0 +1,79 @@
+# app/order_snapshots.py
+"""
+Backfill the sneaker snapshot columns of order items placed before
+checkout started filling them:
+
+    python -m app.order_snapshots
+
+Runs in id order, one committed batch at a time, so it can be stopped and
+restarted. Items whose sneaker has since been deleted keep NULLs. The
+columns themselves are added first if the table predates them.
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .schema_upgrades import upgrade_schema
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_order_snapshots(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Copy name, brand, colorway and image_url onto unfilled items. Returns how many."""
+    item, sneaker = models.OrderItem, models.Sneaker
+    table = item.__table__
+    update_snapshot = (
+        table.update()
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            sneaker_name=bindparam("b_name"),
+            sneaker_brand=bindparam("b_brand"),
+            sneaker_colorway=bindparam("b_colorway"),
+            sneaker_image_url=bindparam("b_image_url"),
+        )
+    )
+
+    filled = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(item.id, sneaker.name, sneaker.brand, sneaker.colorway, sneaker.image_url)
+            .join(sneaker, sneaker.id == item.sneaker_id)
+            .where(item.sneaker_name.is_(None), item.id > last_id)
+            .order_by(item.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.execute(
+            update_snapshot,
+            [
+                {
+                    "b_id": row.id,
+                    "b_name": row.name,
+                    "b_brand": row.brand,
+                    "b_colorway": row.colorway,
+                    "b_image_url": row.image_url,
+                }
+                for row in rows
+            ],
+        )
+        db.commit()
+        filled += len(rows)
+        last_id = rows[-1].id
+    return filled
+
+
+def main():
+    upgrade_schema()  # the snapshot columns must exist before they can be filled
+    db: Session = SessionLocal()
+    try:
+        filled = backfill_order_snapshots(db)
+    finally:
+        db.close()
+    print(f"✅ Snapshotted {filled} order items.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# app/outbox.py
+"""
+Transactional outbox: request handlers only enqueue() an event in their
+own transaction; the worker delivers it afterwards, so checkout latency
+doesn't grow with the number of downstream integrations.
+
+The worker claims due events in batches (FOR UPDATE SKIP LOCKED, so
+several workers can share the table), runs each event's handlers with
+bounded concurrency and retries failures with exponential backoff.
+Delivery is at-least-once: handlers must tolerate duplicates.
+Delivered events are deleted after OUTBOX_RETENTION_HOURS by
+purge_delivered_events(); failed ones stay until someone looks at them.
+
+Run standalone with:
+
+    python -m app.outbox
+
+or inside the API process with OUTBOX_WORKER=1.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_SINK_PATH = os.getenv("OUTBOX_SINK_PATH", "outbox_events.ndjson")
+# delivered events are kept this long (failed ones are never purged)
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "168"))
+# how often delivered events are deleted; <= 0 turns the background purge off
+OUTBOX_PURGE_INTERVAL_SECONDS = float(os.getenv("OUTBOX_PURGE_INTERVAL_SECONDS", "3600"))
+PURGE_BATCH_SIZE = 1000
+# a claimed event whose worker died is picked up again after this
+LEASE_SECONDS = 300
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 600.0
+
+Handler = Callable[[dict], Any]
+
+
+def enqueue(db: Session, topic: str, payload: dict) -> None:
+    """Add an event to the caller's transaction; it is only seen once that commits."""
+    db.add(models.OutboxEvent(topic=topic, payload=json.dumps(payload)))
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds before retry number `attempts` (exponential, full jitter on top half)."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class FileSink:
+    """Appends events as JSON lines; stands in for an external consumer."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict) -> None:
+        line = json.dumps(event, separators=(",", ":")) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as sink:
+            sink.write(line)
+
+
+@dataclass
+class ClaimedEvent:
+    id: int
+    topic: str
+    payload: dict
+    attempts: int
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        handlers: dict[str, list[Handler]] | None = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.session_factory = session_factory
+        self.handlers: dict[str, list[Handler]] = handlers or {}
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    def register(self, topic: str, handler: Handler) -> None:
+        self.handlers.setdefault(topic, []).append(handler)
+
+    # ---------- DB side (worker threads) ----------
+
+    def _claim(self, now: datetime) -> list[ClaimedEvent]:
+        event = models.OutboxEvent
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(event.id, event.topic, event.payload, event.attempts)
+                .where(
+                    or_(
+                        and_(event.status == "pending", event.available_at <= now),
+                        and_(event.status == "processing", event.locked_until <= now),
+                    )
+                )
+                .order_by(event.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                db.rollback()
+                return []
+            db.execute(
+                update(event)
+                .where(event.id.in_([row.id for row in rows]))
+                .values(
+                    status="processing",
+                    attempts=event.attempts + 1,
+                    locked_until=now + timedelta(seconds=LEASE_SECONDS),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        return [
+            ClaimedEvent(row.id, row.topic, json.loads(row.payload), row.attempts + 1)
+            for row in rows
+        ]
+
+    def _settle(self, now: datetime, outcomes: list[tuple[ClaimedEvent, str | None]]) -> None:
+        event = models.OutboxEvent
+        db = self.session_factory()
+        try:
+            done = [claimed.id for claimed, error in outcomes if error is None]
+            if done:
+                db.execute(
+                    update(event)
+                    .where(event.id.in_(done))
+                    .values(status="done", processed_at=now, locked_until=None, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for claimed, error in outcomes:
+                if error is None:
+                    continue
+                if claimed.attempts >= self.max_attempts:
+                    values = {"status": "failed", "locked_until": None}
+                    logger.error("Outbox event %s gave up: %s", claimed.id, error)
+                else:
+                    values = {
+                        "status": "pending",
+                        "locked_until": None,
+                        "available_at": now + timedelta(seconds=backoff_delay(claimed.attempts)),
+                    }
+                db.execute(
+                    update(event)
+                    .where(event.id == claimed.id)
+                    .values(last_error=error[:2000], **values)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------- delivery ----------
+
+    async def _deliver(self, claimed: ClaimedEvent, slots: asyncio.Semaphore) -> str | None:
+        async with slots:
+            try:
+                for handler in self.handlers.get(claimed.topic, []):
+                    event = {"id": claimed.id, "topic": claimed.topic, "payload": claimed.payload}
+                    if inspect.iscoroutinefunction(handler):
+                        await handler(event)
+                    else:
+                        await asyncio.to_thread(handler, event)
+            except Exception as exc:
+                return f"{type(exc).__name__}: {exc}"
+            return None
+
+    async def run_once(self, now: datetime | None = None) -> int:
+        """Claim, deliver and settle one batch. Returns how many events it claimed."""
+        now = now or datetime.utcnow()
+        claimed = await asyncio.to_thread(self._claim, now)
+        if not claimed:
+            return 0
+        slots = asyncio.Semaphore(self.concurrency)
+        errors = await asyncio.gather(*(self._deliver(event, slots) for event in claimed))
+        await asyncio.to_thread(self._settle, datetime.utcnow(), list(zip(claimed, errors)))
+        return len(claimed)
+
+    async def run_forever(self, poll_seconds: float = OUTBOX_POLL_SECONDS) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("Outbox batch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(poll_seconds)
+
+
+def purge_delivered_events(
+    db: Session, now: datetime | None = None, batch_size: int = PURGE_BATCH_SIZE
+) -> int:
+    """
+    Delete events delivered more than OUTBOX_RETENTION_HOURS ago, one
+    committed batch at a time so the workers are never held up for long.
+    Returns how many were deleted.
+    """
+    event = models.OutboxEvent
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=OUTBOX_RETENTION_HOURS)
+    purged = 0
+    while True:
+        ids = db.execute(
+            select(event.id)
+            .where(event.status == "done", event.processed_at <= cutoff)
+            .order_by(event.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return purged
+        db.execute(
+            delete(event).where(event.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        purged += len(ids)
+
+
+def run_event_purge() -> None:
+    """One purge in its own session (used by the background task)."""
+    db = SessionLocal()
+    try:
+        purge_delivered_events(db)
+    finally:
+        db.close()
+
+
+def default_worker() -> OutboxWorker:
+    worker = OutboxWorker()
+    worker.register("order.created", FileSink(OUTBOX_SINK_PATH))
+    return worker
+
+
+def main():
+    print(f"✅ Outbox worker running, delivering to {OUTBOX_SINK_PATH} (Ctrl+C to stop).")
+    try:
+        asyncio.run(default_worker().run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
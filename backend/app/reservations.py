@@ -0,0 +1,131 @@
+# app/reservations.py
+"""
+Cart reservations: stock taken by add_to_cart is only held until the cart
+line's expires_at. sweep_expired_reservations() deletes expired lines and
+gives their stock back, a batch at a time with set-based statements.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .cart_store import CartStore, cart_store_for
+from .catalog_cache import invalidate_catalog
+from .database import SessionLocal
+from .inventory import apply_stock_deltas
+
+CART_RESERVATION_MINUTES = int(os.getenv("CART_RESERVATION_MINUTES", "30"))
+# 0 disables the background sweeper
+CART_SWEEP_INTERVAL_SECONDS = float(os.getenv("CART_SWEEP_INTERVAL_SECONDS", "60"))
+SWEEP_BATCH_SIZE = 500
+
+
+def reservation_expiry(now: datetime | None = None) -> datetime:
+    return (now or datetime.utcnow()) + timedelta(minutes=CART_RESERVATION_MINUTES)
+
+
+class SweepMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.runs = 0
+        self.items_released = 0
+        self.units_released = 0
+        self.last_run_at: datetime | None = None
+        self.last_duration_ms: float | None = None
+
+    def record(self, items: int, units: int, started_at: datetime, duration_ms: float) -> None:
+        with self._lock:
+            self.runs += 1
+            self.items_released += items
+            self.units_released += units
+            self.last_run_at = started_at
+            self.last_duration_ms = duration_ms
+
+    def snapshot(self) -> schemas.ReservationSweepStats:
+        with self._lock:
+            return schemas.ReservationSweepStats(
+                runs=self.runs,
+                items_released=self.items_released,
+                units_released=self.units_released,
+                last_run_at=self.last_run_at,
+                last_duration_ms=self.last_duration_ms,
+            )
+
+
+sweep_metrics = SweepMetrics()
+
+
+def _sweep_batch(db: Session, store: CartStore, now: datetime, batch_size: int) -> tuple[int, int]:
+    lines = store.pop_expired(now, batch_size)
+    if not lines:
+        return 0, 0
+
+    released: dict[tuple[int, int], int] = defaultdict(int)
+    for line in lines:
+        released[(line.sneaker_id, line.size)] += line.quantity
+    # lines whose size row is gone have nothing to give back
+    size = models.SneakerSize
+    existing = set(
+        db.execute(
+            select(size.sneaker_id, size.eu_size).where(
+                tuple_(size.sneaker_id, size.eu_size).in_(list(released))
+            )
+        ).tuples()
+    )
+    released = {key: quantity for key, quantity in released.items() if key in existing}
+    if not apply_stock_deltas(db, {key: -quantity for key, quantity in released.items()}):
+        raise RuntimeError("Size rows vanished during the reservation sweep")
+
+    db.commit()
+    return len(lines), sum(released.values())
+
+
+def sweep_expired_reservations(
+    db: Session,
+    now: datetime | None = None,
+    batch_size: int = SWEEP_BATCH_SIZE,
+    store: CartStore | None = None,
+) -> tuple[int, int]:
+    """
+    Release every reservation that expired before now.
+
+    Per batch: the store removes up to batch_size expired lines (for SQL
+    one locking SELECT + one DELETE ... WHERE id IN (...)), then one
+    executemany UPDATE restores stock per (sneaker, size) (see
+    apply_stock_deltas) and the batch commits.
+    Returns (cart lines removed, stock units given back).
+    """
+    now = now or datetime.utcnow()
+    store = store or cart_store_for(db)
+    started = time.perf_counter()
+    items_total = units_total = 0
+    while True:
+        items, units = _sweep_batch(db, store, now, batch_size)
+        items_total += items
+        units_total += units
+        if items < batch_size:
+            break
+
+    sweep_metrics.record(
+        items_total, units_total, now, (time.perf_counter() - started) * 1000
+    )
+    if units_total:
+        invalidate_catalog()
+    return items_total, units_total
+
+
+def run_sweeper() -> None:
+    """One sweep in its own session (used by the background task)."""
+    db = SessionLocal()
+    try:
+        sweep_expired_reservations(db)
+    finally:
+        db.close()
@@ -0,0 +1,180 @@
+# app/rollups.py
+"""
+Incremental sales rollups.
+
+sales_daily is refreshed from order_items in id order, starting after the
+high-water mark kept in rollup_state, so each refresh only reads the items
+added since the last one. Items are folded in only once their order is
+ROLLUP_SETTLE_SECONDS old: a checkout still in flight may hold a lower id
+than rows already committed, and must not be skipped over.
+
+Refresh by hand with:
+
+    python -m app.rollups
+"""
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+SALES_ROLLUP = "sales_daily"
+# 0 disables the background refresh
+SALES_ROLLUP_INTERVAL_SECONDS = float(os.getenv("SALES_ROLLUP_INTERVAL_SECONDS", "300"))
+ROLLUP_SETTLE_SECONDS = int(os.getenv("ROLLUP_SETTLE_SECONDS", "60"))
+ROLLUP_BATCH_SIZE = 5000
+
+GROUP_COLUMNS = {
+    "day": models.SalesDaily.day,
+    "sneaker": models.SalesDaily.sneaker_id,
+    "size": models.SalesDaily.size,
+    "gender": models.SalesDaily.gender,
+}
+
+
+def _lock_state(db: Session, name: str) -> models.RollupState:
+    """The rollup's state row, locked so concurrent refreshes run one at a time."""
+    query = select(models.RollupState).where(models.RollupState.name == name).with_for_update()
+    state = db.scalars(query).first()
+    if state is not None:
+        return state
+    db.add(models.RollupState(name=name, high_water_mark=0))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # created by another refresh meanwhile
+    return db.scalars(query).one()
+
+
+def _read_items(db: Session, after_id: int, limit: int) -> list:
+    item, order, sneaker = models.OrderItem, models.Order, models.Sneaker
+    return db.execute(
+        select(
+            item.id,
+            item.sneaker_id,
+            item.size,
+            item.quantity,
+            item.price,
+            order.created_at,
+            sneaker.gender,
+        )
+        .join(order, order.id == item.order_id)
+        .outerjoin(sneaker, sneaker.id == item.sneaker_id)
+        .where(item.id > after_id)
+        .order_by(item.id)
+        .limit(limit)
+    ).all()
+
+
+def _fold(db: Session, totals: dict[tuple, list]) -> None:
+    """Add {(day, sneaker_id, size, gender): [units, revenue]} onto sales_daily."""
+    sales = models.SalesDaily
+    existing = {
+        (row.day, row.sneaker_id, row.size, row.gender): row.id
+        for row in db.execute(
+            select(sales.id, sales.day, sales.sneaker_id, sales.size, sales.gender)
+            .where(tuple_(sales.day, sales.sneaker_id, sales.size, sales.gender).in_(list(totals)))
+        )
+    }
+
+    updates = [
+        {"b_id": existing[key], "b_units": units, "b_revenue": revenue}
+        for key, (units, revenue) in totals.items()
+        if key in existing
+    ]
+    if updates:
+        table = sales.__table__
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                units=table.c.units + bindparam("b_units"),
+                revenue=table.c.revenue + bindparam("b_revenue"),
+            ),
+            updates,
+        )
+    inserts = [
+        {"day": day, "sneaker_id": sneaker_id, "size": size, "gender": gender, "units": units, "revenue": revenue}
+        for (day, sneaker_id, size, gender), (units, revenue) in totals.items()
+        if (day, sneaker_id, size, gender) not in existing
+    ]
+    if inserts:
+        db.execute(insert(sales), inserts)
+
+
+def refresh_sales_rollup(
+    db: Session,
+    now: datetime | None = None,
+    batch_size: int = ROLLUP_BATCH_SIZE,
+) -> int:
+    """Fold order items past the high-water mark into sales_daily. Returns how many."""
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+    state = _lock_state(db, SALES_ROLLUP)
+    folded = 0
+    while True:
+        rows = _read_items(db, state.high_water_mark, batch_size)
+        settled = []
+        for row in rows:
+            if row.created_at > cutoff:
+                break
+            settled.append(row)
+        if not settled:
+            break
+
+        totals: dict[tuple, list] = defaultdict(lambda: [0, 0.0])
+        for row in settled:
+            key = (row.created_at.date(), row.sneaker_id, row.size, row.gender or "")
+            totals[key][0] += row.quantity
+            totals[key][1] += row.quantity * row.price
+        _fold(db, totals)
+        state.high_water_mark = settled[-1].id
+        state.updated_at = datetime.utcnow()
+        folded += len(settled)
+        if len(settled) < len(rows) or len(rows) < batch_size:
+            break
+
+    db.commit()
+    return folded
+
+
+def sales_report(db: Session, start: date, end: date, group_by: list[str]) -> list[dict]:
+    """Units and revenue between start and end (inclusive), summed per group_by."""
+    columns = [GROUP_COLUMNS[name].label(name) for name in group_by]
+    rows = db.execute(
+        select(
+            *columns,
+            func.sum(models.SalesDaily.units).label("units"),
+            func.sum(models.SalesDaily.revenue).label("revenue"),
+        )
+        .where(models.SalesDaily.day >= start, models.SalesDaily.day <= end)
+        .group_by(*columns)
+        .order_by(*columns)
+    ).all()
+    return [
+        {**{name: getattr(row, name) for name in group_by}, "units": int(row.units), "revenue": round(row.revenue, 2)}
+        for row in rows
+    ]
+
+
+def run_refresh() -> int:
+    db = SessionLocal()
+    try:
+        return refresh_sales_rollup(db)
+    finally:
+        db.close()
+
+
+def main():
+    started = time.perf_counter()
+    folded = run_refresh()
+    print(f"✅ Folded {folded} order items into sales_daily in {time.perf_counter() - started:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# app/routers/analytics.py
+from datetime import date
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from .. import schemas
+from ..database import get_db
+from ..rollups import GROUP_COLUMNS, sales_report
+from .auth import require_admin
+
+router = APIRouter(prefix="/analytics", tags=["analytics"], dependencies=[Depends(require_admin)])
+
+MAX_RANGE_DAYS = 366 * 3
+
+
+@router.get("/sales", response_model=List[schemas.SalesRow], response_model_exclude_none=True)
+def get_sales(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    group_by: str = Query("day", description="comma-separated: day, sneaker, size, gender"),
+    db: Session = Depends(get_db),
+):
+    """
+    Units sold and revenue from the daily rollups (app/rollups.py), so the
+    figures lag checkout by up to one refresh interval.
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' is before 'from'")
+    if (end - start).days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    groups = list(dict.fromkeys(name.strip() for name in group_by.split(",") if name.strip()))
+    unknown = [name for name in groups if name not in GROUP_COLUMNS]
+    if unknown or not groups:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by takes {', '.join(GROUP_COLUMNS)}",
+        )
+    return sales_report(db, start, end, groups)
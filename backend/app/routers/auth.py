@@ -1,4 +1,5 @@
 # app/routers/auth.py
+import os
 from datetime import timedelta
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -6,6 +7,7 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from .. import models, schemas
 from ..database import get_db
+from ..user_cache import cached_user, remember_user, user_cache
 from ..security import (
     create_access_token,
     decode_token,
@@ -22,6 +24,12 @@ oauth2_scheme = OAuth2PasswordBearer(
     scopes={"me": "Read info about the current user"},
 )
 
+# comma-separated emails of the accounts allowed into the admin endpoints
+# (sales analytics, drop controls); empty means nobody
+ADMIN_EMAILS = frozenset(
+    email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+)
+
 # ---------- helpers ----------
 
 def get_user_by_email(db: Session, email: str) -> models.User | None:
@@ -49,7 +57,17 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = get_user_by_email(db, token_data.sub)
+    # tokens carry the user id (uid); older ones only the email
+    if token_data.uid is not None:
+        user = cached_user(token_data.uid)
+        if user is None:
+            user = db.get(models.User, token_data.uid)
+            if user is not None:
+                remember_user(db, user)
+        if user is not None and user.email != token_data.sub:
+            user = None  # email changed since the token was issued
+    else:
+        user = get_user_by_email(db, token_data.sub)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,6 +77,12 @@ def get_current_user(
     return user
 
 
+def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return current_user
+
+
 # ---------- routes ----------
 
 @router.post("/register", response_model=schemas.UserRead, status_code=201)
@@ -98,7 +122,7 @@ def login(
         )
 
     access_token = create_access_token(
-        data={"sub": user.email},
+        data={"sub": user.email, "uid": user.id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
 
@@ -110,3 +134,11 @@ async def read_me(
     current_user: Annotated[models.User, Depends(get_current_user)],
 ):
     return current_user
+
+
+@router.get("/cache/stats", response_model=schemas.CacheStats)
+def auth_cache_stats(
+    current_user: Annotated[models.User, Depends(get_current_user)],
+):
+    """Hit/miss counters of this process's authenticated-user cache."""
+    return user_cache.stats()
@@ -1,9 +1,19 @@
 # app/routers/cart.py
+from dataclasses import replace
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 from .. import models, schemas
+from ..cart_store import CartLine, CartStore, get_cart_store, with_sneakers
+from ..catalog_cache import invalidate_catalog
 from ..database import get_db
+from ..drop_queue import WaitingRoomFull, waiting_room
+from ..fields import dump_sparse, loader_options, parse_fields
+from ..inventory import apply_stock_deltas, current_stock, release_stock, reserve_stock
+from ..reservations import reservation_expiry, sweep_metrics
 from .auth import get_current_user
 
 router = APIRouter(prefix="/cart", tags=["cart"])
@@ -12,8 +22,8 @@ router = APIRouter(prefix="/cart", tags=["cart"])
 # ---------- Helpers ----------
 
 
-def _to_cart_item_read(item: models.CartItem, sneaker: models.Sneaker) -> schemas.CartItemRead:
-  """Build CartItemRead from ORM objects."""
+def _to_cart_item_read(item: CartLine, sneaker: models.Sneaker) -> schemas.CartItemRead:
+  """Build CartItemRead from a cart line and its sneaker."""
   sneaker_data = schemas.CartItemSneaker(
       id=sneaker.id,
       name=sneaker.name,
@@ -31,53 +41,95 @@ def _to_cart_item_read(item: models.CartItem, sneaker: models.Sneaker) -> schema
       quantity=item.quantity,
       size=item.size,
       sneaker=sneaker_data,
+      expires_at=item.expires_at,
   )
 
 
-def _get_size_row_or_400(db: Session, sneaker_id: int, eu_size: int) -> models.SneakerSize:
-  size_row = (
-      db.query(models.SneakerSize)
-      .filter(
-          models.SneakerSize.sneaker_id == sneaker_id,
-          models.SneakerSize.eu_size == eu_size,
-      )
-      .first()
+def _size_not_available(eu_size: int) -> HTTPException:
+  return HTTPException(
+      status_code=400,
+      detail=f"Size {eu_size} is not available for this sneaker",
   )
-  if not size_row:
+
+
+def _reserve_or_400(
+    db: Session,
+    sneaker_id: int,
+    eu_size: int,
+    quantity: int,
+    already_in_cart: int | None = None,
+) -> None:
+  """
+  Atomically take stock for a cart change or raise the matching 400.
+  Stock is only read on the failure path, to build the message.
+  """
+  if reserve_stock(db, sneaker_id, eu_size, quantity):
+      return
+  stock = current_stock(db, sneaker_id, eu_size)
+  if stock is None:
+      raise _size_not_available(eu_size)
+  if already_in_cart is not None:
+      # existing quantity + requested > total stock
       raise HTTPException(
           status_code=400,
-          detail=f"Size {eu_size} is not available for this sneaker",
+          detail=f"Only {stock + already_in_cart} items available for size {eu_size}",
       )
-  return size_row
+  raise HTTPException(
+      status_code=400,
+      detail=f"Only {stock} items left for size {eu_size}",
+  )
+
+
+def _reserve_in_waiting_room(sneaker_id: int, eu_size: int, quantity: int) -> bool | None:
+  """
+  Queue the reservation when the sneaker has an open waiting room (the
+  stock is taken and committed by the room's consumer). None otherwise.
+  """
+  if not waiting_room.is_open(sneaker_id):
+      return None
+  try:
+      return from_thread.run(waiting_room.reserve, sneaker_id, eu_size, quantity)
+  except WaitingRoomFull:
+      raise HTTPException(status_code=429, detail="Too many buyers waiting, try again")
 
 
 # ---------- Endpoints ----------
 
 
+@router.get("/reservations/stats", response_model=schemas.ReservationSweepStats)
+def reservation_sweep_stats():
+  """Counters of the expired-reservation sweeper in this process."""
+  return sweep_metrics.snapshot()
+
+
 @router.get("/", response_model=List[schemas.CartItemRead])
 def get_cart(
+    fields: str | None = Query(
+        None, description="Comma-separated subset, e.g. id,quantity,size,sneaker.name"
+    ),
     db: Session = Depends(get_db),
+    store: CartStore = Depends(get_cart_store),
     current_user: models.User = Depends(get_current_user),
 ):
-  items = (
-      db.query(models.CartItem)
-      .filter(models.CartItem.user_id == current_user.id)
-      .all()
-  )
-
-  result: list[schemas.CartItemRead] = []
-  for item in items:
-      sneaker = (
-          db.query(models.Sneaker)
-          .filter(models.Sneaker.id == item.sneaker_id)
-          .first()
+  spec = parse_fields(fields, schemas.CartItemRead)
+  if spec is not None:
+      lines = store.lines(current_user.id)
+      sneaker_spec = spec.get("sneaker")
+      if sneaker_spec:
+          # only the requested sneaker columns are loaded
+          options = (
+              loader_options(models.Sneaker, sneaker_spec)
+              if isinstance(sneaker_spec, dict)
+              else ()
+          )
+          lines = with_sneakers(db, lines, options)
+      return JSONResponse(
+          [dump_sparse(line, spec, schemas.CartItemRead) for line in lines]
       )
-      if not sneaker:
-          continue
-
-      result.append(_to_cart_item_read(item, sneaker))
 
-  return result
+  # the SQL store fetches lines and sneakers in one joined query
+  lines = with_sneakers(db, store.lines(current_user.id, with_sneakers=True))
+  return [_to_cart_item_read(line, line.sneaker) for line in lines]
 
 
 @router.post(
@@ -88,6 +140,7 @@ def get_cart(
 def add_to_cart(
     payload: schemas.CartItemCreate,
     db: Session = Depends(get_db),
+    store: CartStore = Depends(get_cart_store),
     current_user: models.User = Depends(get_current_user),
 ):
   """
@@ -96,6 +149,7 @@ def add_to_cart(
   - checks stock in SneakerSize
   - reduces stock
   - merges with existing cart item of same sneaker+size
+  - (re)starts the reservation timer
   """
   sneaker = (
       db.query(models.Sneaker)
@@ -105,50 +159,185 @@ def add_to_cart(
   if not sneaker:
       raise HTTPException(status_code=404, detail="Sneaker not found")
 
-  size_row = _get_size_row_or_400(db, sneaker.id, payload.size)
-
-  if size_row.stock < payload.quantity:
+  queued = _reserve_in_waiting_room(sneaker.id, payload.size, payload.quantity)
+  if queued is False:
       raise HTTPException(
           status_code=400,
-          detail=f"Only {size_row.stock} items left for size {payload.size}",
+          detail=f"Not enough stock left for size {payload.size}",
+      )
+  if queued is None:
+      existing = store.find(current_user.id, payload.sneaker_id, payload.size)
+
+      # decrease stock by added quantity, atomically
+      _reserve_or_400(
+          db,
+          sneaker.id,
+          payload.size,
+          payload.quantity,
+          already_in_cart=existing.quantity if existing else None,
       )
 
-  item = (
-      db.query(models.CartItem)
-      .filter(
-          models.CartItem.user_id == current_user.id,
-          models.CartItem.sneaker_id == payload.sneaker_id,
-          models.CartItem.size == payload.size,
+  try:
+      # merges into the existing line, if any
+      line = store.add(
+          current_user.id,
+          payload.sneaker_id,
+          payload.size,
+          payload.quantity,
+          reservation_expiry(),
       )
-      .first()
-  )
+      db.commit()
+  except Exception:
+      if queued:
+          # the waiting room already committed the stock: give it back
+          db.rollback()
+          release_stock(db, sneaker.id, payload.size, payload.quantity)
+          db.commit()
+      raise
+  invalidate_catalog()
 
-  if item:
-      new_qty = item.quantity + payload.quantity
-      if new_qty > size_row.stock + item.quantity:
-          # existing quantity + requested > total stock
-          max_available = size_row.stock + item.quantity
-          raise HTTPException(
-              status_code=400,
-              detail=f"Only {max_available} items available for size {payload.size}",
-          )
-      item.quantity = new_qty
-  else:
-      item = models.CartItem(
-          user_id=current_user.id,
-          sneaker_id=payload.sneaker_id,
-          size=payload.size,
-          quantity=payload.quantity,
+  return _to_cart_item_read(line, sneaker)
+
+
+@router.post("/batch", response_model=List[schemas.CartItemRead])
+def batch_update_cart(
+    payload: schemas.CartBatchRequest,
+    db: Session = Depends(get_db),
+    store: CartStore = Depends(get_cart_store),
+    current_user: models.User = Depends(get_current_user),
+):
+  """
+  Apply many cart changes in one transaction, all or nothing, and return
+  the resulting cart (cart page edits, merging a guest cart after login).
+
+  Operations run in order with the same rules as the single-item
+  endpoints: add merges into an existing line, update to quantity <= 0
+  removes the line. Cart lines, sneakers and size rows are loaded with
+  one query each and stock moves in one executemany UPDATE, however many
+  operations there are. Sizes in drop mode are taken from their stripes
+  one by one, as add_to_cart does. Adds to a sneaker with an open waiting
+  room are refused (409): they have to queue through POST /cart/.
+  """
+  items = store.lines(current_user.id, lock=True)
+  by_id = {item.id: item for item in items}
+  by_key: dict[tuple[int, int], CartLine] = {}
+  for item in items:
+      by_key.setdefault((item.sneaker_id, item.size), item)
+
+  quantities = {item.id: item.quantity for item in items}
+  touched: set[int] = set()
+  added: dict[tuple[int, int], int] = {}
+  for operation in payload.operations:
+      if operation.op == "add":
+          key = (operation.sneaker_id, operation.size)
+          line = by_key.get(key)
+          if line is not None:
+              quantities[line.id] += operation.quantity
+              touched.add(line.id)
+          else:
+              added[key] = added.get(key, 0) + operation.quantity
+          continue
+      if operation.item_id not in by_id:
+          raise HTTPException(status_code=404, detail="Cart item not found")
+      quantities[operation.item_id] = (
+          operation.quantity if operation.op == "update" else 0
       )
-      db.add(item)
+      touched.add(operation.item_id)
+
+  sneaker_ids = {item.sneaker_id for item in items} | {key[0] for key in added}
+  sneakers = {
+      sneaker.id: sneaker
+      for sneaker in db.query(models.Sneaker).filter(models.Sneaker.id.in_(sneaker_ids))
+  }
+  if any(sneaker_id not in sneakers for sneaker_id, _ in added):
+      raise HTTPException(status_code=404, detail="Sneaker not found")
 
-  # decrease stock by added quantity
-  size_row.stock -= payload.quantity
+  # stock to take (> 0) or give back (< 0) per (sneaker, size)
+  deltas: dict[tuple[int, int], int] = dict(added)
+  for item in items:
+      key = (item.sneaker_id, item.size)
+      deltas[key] = deltas.get(key, 0) + max(quantities[item.id], 0) - item.quantity
+  deltas = {key: delta for key, delta in deltas.items() if delta}
+  taking = [key for key, delta in deltas.items() if delta > 0]
 
-  db.commit()
-  db.refresh(item)
+  queued = sorted({sneaker_id for sneaker_id, _ in taking if waiting_room.is_open(sneaker_id)})
+  if queued:
+      raise HTTPException(
+          status_code=409,
+          detail=f"Sneaker {queued[0]} has an open waiting room, add it with POST /cart/",
+      )
 
-  return _to_cart_item_read(item, sneaker)
+  if deltas:
+      size, stripe = models.SneakerSize, models.SneakerSizeStripe
+      stock = {
+          (row.sneaker_id, row.eu_size): row.stock
+          for row in db.query(size)
+          .filter(tuple_(size.sneaker_id, size.eu_size).in_(list(deltas)))
+          .with_for_update()
+      }
+      # sizes in drop mode: the row stays at 0, the stock is in the stripes
+      striped = set(
+          db.execute(
+              select(stripe.sneaker_id, stripe.eu_size)
+              .where(tuple_(stripe.sneaker_id, stripe.eu_size).in_(taking))
+              .distinct()
+          ).tuples()
+      ) if taking else set()
+      for key, delta in list(deltas.items()):
+          sneaker_id, eu_size = key
+          if key not in stock:
+              if delta > 0:
+                  raise _size_not_available(eu_size)
+              del deltas[key]  # size row is gone, nothing to give back
+          elif key in striped:
+              continue  # checked by the stripe reservation below
+          elif stock[key] < delta:
+              line = by_key.get(key)
+              if line is not None:
+                  raise HTTPException(
+                      status_code=400,
+                      detail=f"Only {stock[key] + line.quantity} items available for size {eu_size}",
+                  )
+              raise HTTPException(
+                  status_code=400,
+                  detail=f"Only {stock[key]} items left for size {eu_size}",
+              )
+      if not apply_stock_deltas(db, {key: delta for key, delta in deltas.items() if key not in striped}):
+          raise HTTPException(status_code=409, detail="Stock changed, please retry")
+      for sneaker_id, eu_size in sorted(striped):
+          line = by_key.get((sneaker_id, eu_size))
+          _reserve_or_400(
+              db,
+              sneaker_id,
+              eu_size,
+              deltas[(sneaker_id, eu_size)],
+              already_in_cart=line.quantity if line else None,
+          )
+
+  expiry = reservation_expiry()
+  store.set_quantities(
+      current_user.id,
+      {item_id: quantities[item_id] for item_id in touched},
+      expiry,
+  )
+  remaining = [
+      replace(item, quantity=quantities[item.id], expires_at=expiry)
+      if item.id in touched else item
+      for item in items
+      if quantities[item.id] > 0
+  ]
+  for (sneaker_id, eu_size), quantity in added.items():
+      remaining.append(store.add(current_user.id, sneaker_id, eu_size, quantity, expiry))
+
+  cart = [
+      _to_cart_item_read(item, sneakers[item.sneaker_id])
+      for item in sorted(remaining, key=lambda item: item.id)
+      if item.sneaker_id in sneakers
+  ]
+  db.commit()
+  if deltas:
+      invalidate_catalog()
+  return cart
 
 
 @router.patch("/{item_id}", response_model=schemas.CartItemRead)
@@ -156,6 +345,7 @@ def update_cart_item(
     item_id: int,
     payload: schemas.CartItemUpdate,
     db: Session = Depends(get_db),
+    store: CartStore = Depends(get_cart_store),
     current_user: models.User = Depends(get_current_user),
 ):
   """
@@ -165,14 +355,7 @@ def update_cart_item(
   - if increasing, checks stock and reduces it
   - if decreasing, restores stock
   """
-  item = (
-      db.query(models.CartItem)
-      .filter(
-          models.CartItem.id == item_id,
-          models.CartItem.user_id == current_user.id,
-      )
-      .first()
-  )
+  item = store.get(current_user.id, item_id)
   if not item:
       raise HTTPException(status_code=404, detail="Cart item not found")
 
@@ -184,16 +367,16 @@ def update_cart_item(
   if not sneaker:
       raise HTTPException(status_code=404, detail="Sneaker not found")
 
-  size_row = _get_size_row_or_400(db, sneaker.id, item.size)
-
   current_qty = item.quantity
   new_qty = payload.quantity
 
   if new_qty <= 0:
       # remove item and give stock back
-      size_row.stock += current_qty
-      db.delete(item)
+      if not release_stock(db, sneaker.id, item.size, current_qty):
+          raise _size_not_available(item.size)
+      store.set_quantities(current_user.id, {item.id: 0}, None)
       db.commit()
+      invalidate_catalog()
       # keep same behavior you had: 204 via HTTPException
       raise HTTPException(status_code=204, detail="Item removed")
 
@@ -201,19 +384,19 @@ def update_cart_item(
 
   if diff > 0:
       # increasing quantity
-      if size_row.stock < diff:
-          raise HTTPException(
-              status_code=400,
-              detail=f"Only {size_row.stock} items left for size {item.size}",
-          )
-      size_row.stock -= diff
+      _reserve_or_400(db, sneaker.id, item.size, diff)
   elif diff < 0:
       # decreasing quantity, give stock back
-      size_row.stock += (-diff)
+      if not release_stock(db, sneaker.id, item.size, -diff):
+          raise _size_not_available(item.size)
 
-  item.quantity = new_qty
+  expiry = reservation_expiry()
+  store.set_quantities(current_user.id, {item.id: new_qty}, expiry)
   db.commit()
-  db.refresh(item)
+  if diff != 0:
+      invalidate_catalog()
+
+  item = replace(item, quantity=new_qty, expires_at=expiry)
 
   return _to_cart_item_read(item, sneaker)
 
@@ -222,40 +405,26 @@ def update_cart_item(
 def delete_cart_item(
     item_id: int,
     db: Session = Depends(get_db),
+    store: CartStore = Depends(get_cart_store),
     current_user: models.User = Depends(get_current_user),
 ):
   """
   Remove an item from the cart and restore stock.
   """
-  item = (
-      db.query(models.CartItem)
-      .filter(
-          models.CartItem.id == item_id,
-          models.CartItem.user_id == current_user.id,
-      )
-      .first()
-  )
+  item = store.get(current_user.id, item_id)
   if not item:
       raise HTTPException(status_code=404, detail="Cart item not found")
 
-  size_row = (
-      db.query(models.SneakerSize)
-      .filter(
-          models.SneakerSize.sneaker_id == item.sneaker_id,
-          models.SneakerSize.eu_size == item.size,
-      )
-      .first()
-  )
-
-  if size_row:
-      size_row.stock += item.quantity
+  release_stock(db, item.sneaker_id, item.size, item.quantity)
 
-  db.delete(item)
+  store.set_quantities(current_user.id, {item.id: 0}, None)
   db.commit()
+  invalidate_catalog()
 
 @router.delete("/clear-after-checkout/all", status_code=status.HTTP_204_NO_CONTENT)
 def clear_cart_after_checkout(
         db: Session = Depends(get_db),
+        store: CartStore = Depends(get_cart_store),
         current_user: models.User = Depends(get_current_user),
   ):
       """
@@ -263,14 +432,6 @@ def clear_cart_after_checkout(
       IMPORTANT: does NOT restore stock, because stock was already decreased
       when items were added/updated in the cart.
       """
-      items = (
-          db.query(models.CartItem)
-          .filter(models.CartItem.user_id == current_user.id)
-          .all()
-      )
-
-      for item in items:
-          db.delete(item)
-
+      store.clear(current_user.id)
       db.commit()
 
@@ -1,75 +1,216 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
+from anyio import from_thread
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session, load_only, selectinload
 from ..database import get_db
 from .. import models, schemas
+from ..cart_store import CartStore, SqlCartStore, get_cart_store, with_sneakers
 from .auth import get_current_user
+from ..fields import dump_sparse, loader_options, parse_fields
+from ..group_commit import checkout_group
+from ..idempotency import KeyClaim, complete_key, release_key, replay_or_claim
+from ..outbox import enqueue
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from typing import List
 
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+DEFAULT_ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+SNAPSHOT_COLUMNS = (
+    models.Sneaker.price,
+    models.Sneaker.name,
+    models.Sneaker.brand,
+    models.Sneaker.colorway,
+    models.Sneaker.image_url,
+)
+
+
+def _order_options() -> list:
+    """Items for a whole page of orders in one extra query; their sneaker is a snapshot column set."""
+    return [selectinload(models.Order.items)]
+
+
+def _order_cursor(order: models.Order) -> str:
+    return encode_cursor({"k": [order.created_at.isoformat(), order.id]})
+
+
+def _seek_after(cursor: str):
+    """Orders older than the cursor's (created_at, id)."""
+    payload = decode_cursor(cursor)
+    try:
+        created_at, order_id = payload["k"]
+        created_at = datetime.fromisoformat(created_at)
+        order_id = int(order_id)
+    except (TypeError, KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return or_(
+        models.Order.created_at < created_at,
+        and_(models.Order.created_at == created_at, models.Order.id < order_id),
+    )
+
 
 @router.post("/checkout", response_model=schemas.OrderRead)
 def create_order(
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
+    store: CartStore = Depends(get_cart_store),
     current_user: models.User = Depends(get_current_user),
 ):
-    # Get cart items
-    cart_items = (
-        db.query(models.CartItem)
-        .filter(models.CartItem.user_id == current_user.id)
-        .all()
-    )
+    """
+    Turn the cart into an order with a fixed number of statements whatever
+    its size: one joined read of cart + prices, the order insert, one bulk
+    insert of order items, one set-based delete of the cart.
+
+    With an Idempotency-Key header, retries of the same key get the first
+    response back (without touching cart or stock) instead of a new order.
+    """
+    if idempotency_key is None:
+        return _checkout(db, store, current_user)
+
+    claim = replay_or_claim(db, current_user.id, idempotency_key)
+    if not isinstance(claim, KeyClaim):
+        return claim  # the stored response of the first request
+    try:
+        return _checkout(db, store, current_user, claim)
+    except Exception:
+        release_key(db, claim)
+        raise
+
+
+def _checkout(
+    db: Session,
+    store: CartStore,
+    current_user: models.User,
+    claim: KeyClaim | None = None,
+) -> dict:
+    """
+    Place and commit the order, on its own or, with CHECKOUT_GROUP_COMMIT_MS
+    set, in a transaction shared with concurrent checkouts (app/group_commit.py).
+    """
+    if not (checkout_group.enabled and isinstance(store, SqlCartStore)):
+        body = _place_order(db, store, current_user, claim)
+        db.commit()
+        return body
 
-    if not cart_items:
+    def work(group_db: Session) -> dict:
+        return _place_order(group_db, SqlCartStore(group_db), current_user, claim)
+
+    return from_thread.run(checkout_group.submit, work)
+
+
+def _place_order(
+    db: Session,
+    store: CartStore,
+    current_user: models.User,
+    claim: KeyClaim | None = None,
+) -> dict:
+    """Order, items, cart delete and outbox event, uncommitted; the response body."""
+    # locked: the reservation sweeper must not release these mid-checkout
+    lines = store.lines(current_user.id, lock=True, with_sneakers=True)
+    if not lines:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
-    # Calculate total
-    total = sum(
-        item.quantity *
-        db.query(models.Sneaker).filter(models.Sneaker.id == item.sneaker_id).first().price
-        for item in cart_items
-    )
+    priced = with_sneakers(db, lines, [load_only(*SNAPSHOT_COLUMNS)])
+    if len(priced) != len(lines):
+        raise HTTPException(status_code=400, detail="Cart has sneakers that are no longer sold")
 
-    # Create order
     order = models.Order(
         user_id=current_user.id,
-        total=total,
+        total=sum(line.quantity * line.sneaker.price for line in priced),
     )
     db.add(order)
     db.flush()  # get order.id before inserting items
 
-    # Add order items
-    for item in cart_items:
-        sneaker = db.query(models.Sneaker).filter(models.Sneaker.id == item.sneaker_id).first()
-        order_item = models.OrderItem(
-            order_id=order.id,
-            sneaker_id=item.sneaker_id,
-            size=item.size,
-            quantity=item.quantity,
-            price=sneaker.price,  # snapshot
-        )
-        db.add(order_item)
+    db.execute(
+        insert(models.OrderItem),
+        [
+            {
+                "order_id": order.id,
+                "sneaker_id": line.sneaker_id,
+                "size": line.size,
+                "quantity": line.quantity,
+                # snapshot, order history never reads the live sneaker
+                "price": line.sneaker.price,
+                "sneaker_name": line.sneaker.name,
+                "sneaker_brand": line.sneaker.brand,
+                "sneaker_colorway": line.sneaker.colorway,
+                "sneaker_image_url": line.sneaker.image_url,
+            }
+            for line in priced
+        ],
+    )
 
     # Clear cart NOW (but do NOT restore stock)
-    for item in cart_items:
-        db.delete(item)
+    store.clear(current_user.id)
+
+    # serialized before commit, which would expire the loaded rows
+    order = _load_order(db, order.id)
+    body = schemas.OrderRead.model_validate(order, from_attributes=True).model_dump(mode="json")
+    if claim is not None:
+        complete_key(db, claim, body)
+    # downstream integrations hang off this event, not off the request
+    enqueue(db, "order.created", {"user_id": current_user.id, "order": body})
+    return body
 
-    db.commit()
-    db.refresh(order)
 
-    return order
+def _load_order(db: Session, order_id: int) -> models.Order:
+    """The order with its items and their sneakers, in two queries."""
+    return (
+        db.query(models.Order)
+        .options(*_order_options())
+        .filter(models.Order.id == order_id)
+        .one()
+    )
+
 
 @router.get("/", response_model=List[schemas.OrderRead])
 def get_my_orders(
+    response: Response,
+    limit: int = Query(DEFAULT_ORDER_PAGE_SIZE, ge=1, le=MAX_ORDER_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = Query(
+        None, description="Comma-separated subset, e.g. id,total,items.quantity"
+    ),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
+    """
+    One page of the user's orders, newest first, keyset-paginated on
+    (created_at, id); the next page's cursor comes in X-Next-Cursor.
+    Items and sneakers are loaded for the whole page at once, so a page
+    costs the same few queries however many orders the user has.
+    """
+    spec = parse_fields(fields, schemas.OrderRead)
+    query = db.query(models.Order).filter(models.Order.user_id == current_user.id)
+    if spec is not None:
+        query = query.options(
+            *loader_options(models.Order, spec, extra_columns=[models.Order.created_at])
+        )
+    else:
+        query = query.options(*_order_options())
+    if cursor:
+        query = query.filter(_seek_after(cursor))
+
+    # fetch one extra row to know whether another page exists
     orders = (
-        db.query(models.Order)
-        .filter(models.Order.user_id == current_user.id)
-        .order_by(models.Order.created_at.desc())
+        query
+        .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+        .limit(limit + 1)
         .all()
     )
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        headers[NEXT_CURSOR_HEADER] = _order_cursor(orders[-1])
 
+    if spec is not None:
+        return JSONResponse(
+            [dump_sparse(order, spec, schemas.OrderRead) for order in orders],
+            headers=headers,
+        )
+    response.headers.update(headers)
     return orders
@@ -1,36 +1,592 @@
 # app/routers/sneakers.py
-from typing import List
-from fastapi import APIRouter, HTTPException,Depends
-from sqlalchemy.orm import Session
+import io
+import json
+from dataclasses import dataclass
+from itertools import groupby
+from typing import List, Literal
+from fastapi import APIRouter, HTTPException, Depends, File, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from sqlalchemy import String, and_, case, cast, exists, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session, selectinload
 
 from .. import models, schemas
+from ..catalog_import import DEFAULT_BATCH_SIZE, format_for_filename, import_catalog
+from ..catalog_cache import catalog_cache, invalidate_catalog, respond
 from ..database import get_db
+from ..drop_queue import waiting_room
+from ..fields import dump_sparse, loader_options, parse_fields
+from ..inventory import (
+    collapse_drop,
+    enable_drop_mode,
+    rebalance_drop,
+    refresh_availability,
+    stripe_stocks,
+)
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from ..search_index import ensure_search_index, index_sneaker
+from .auth import require_admin
 
 router = APIRouter(prefix="/sneakers", tags=["sneakers"])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_SEARCH_RESULTS = 100
+MAX_BATCH_IDS = 300
+# drop controls (stripes, waiting room)
+ADMIN_ONLY = [Depends(require_admin)]
+# rows fetched per round trip from the server-side cursor during export
+EXPORT_CHUNK_SIZE = 1000
+
+# sort key -> column; "id" is always appended as the tie-breaker
+SORT_COLUMNS = {
+    "id": models.Sneaker.id,
+    "price": models.Sneaker.price,
+    "brand": models.Sneaker.brand,
+}
+
+SortOption = Literal["id", "-id", "price", "-price", "brand", "-brand"]
+
+# lower bounds of the price facet buckets; the last one is open-ended
+PRICE_BUCKETS = (0, 50, 100, 150, 200, 300)
+
+_sneaker_adapter = TypeAdapter(schemas.SneakerRead)
+_sneaker_list_adapter = TypeAdapter(list[schemas.SneakerRead])
+
+FIELDS_QUERY = Query(
+    None, description="Comma-separated subset of fields, e.g. id,name,price,image_url"
+)
+
+
+# ---------- Helpers ----------
+
+
+@dataclass
+class SneakerFilters:
+    gender: str | None = None
+    brand: list[str] | None = None
+    tag: str | None = None
+    min_price: float | None = None
+    max_price: float | None = None
+    size: int | None = None  # EU size that must have stock > 0
+    in_stock: bool | None = None  # read from the availability summary
+
+    def conditions(self) -> list:
+        sneaker = models.Sneaker
+        conditions = []
+        if self.gender in ("men", "women"):
+            conditions.append(sneaker.gender == self.gender)
+        if self.brand:
+            conditions.append(sneaker.brand.in_(self.brand))
+        if self.tag:
+            conditions.append(sneaker.tag == self.tag)
+        if self.min_price is not None:
+            conditions.append(sneaker.price >= self.min_price)
+        if self.max_price is not None:
+            conditions.append(sneaker.price <= self.max_price)
+        if self.size is not None:
+            conditions.append(
+                exists().where(
+                    models.SneakerSize.sneaker_id == sneaker.id,
+                    models.SneakerSize.eu_size == self.size,
+                    models.SneakerSize.stock > 0,
+                )
+            )
+        if self.in_stock is not None:
+            has_stock = sneaker.availability.has(
+                models.SneakerAvailability.total_stock > 0
+            )
+            conditions.append(has_stock if self.in_stock else ~has_stock)
+        return conditions
+
+
+def sneaker_filters(
+    gender: str | None = None,
+    brand: list[str] | None = Query(None),
+    tag: str | None = None,
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    size: int | None = None,
+    in_stock: bool | None = None,
+) -> SneakerFilters:
+    return SneakerFilters(gender, brand, tag, min_price, max_price, size, in_stock)
+
+
+def _price_bucket_label(index: int) -> str:
+    low = PRICE_BUCKETS[index]
+    if index + 1 < len(PRICE_BUCKETS):
+        return f"{low}-{PRICE_BUCKETS[index + 1]}"
+    return f"{low}+"
+
+
+def _facet_statement(conditions: list):
+    """
+    Every facet as one UNION ALL statement of (facet, value, count) rows,
+    so the DB does all the grouping in a single round trip.
+    """
+    sneaker, size = models.Sneaker, models.SneakerSize
+    price_bucket = case(
+        *(
+            (sneaker.price < PRICE_BUCKETS[i + 1], _price_bucket_label(i))
+            for i in range(len(PRICE_BUCKETS) - 1)
+        ),
+        else_=_price_bucket_label(len(PRICE_BUCKETS) - 1),
+    )
+
+    total = select(
+        literal("total").label("facet"),
+        literal("").label("value"),
+        func.count(sneaker.id).label("count"),
+    ).where(*conditions)
+    brands = (
+        select(literal("brand"), sneaker.brand, func.count(sneaker.id))
+        .where(*conditions)
+        .group_by(sneaker.brand)
+    )
+    prices = (
+        select(literal("price"), price_bucket, func.count(sneaker.id))
+        .where(*conditions)
+        .group_by(price_bucket)
+    )
+    sizes = (
+        select(
+            literal("size"),
+            cast(size.eu_size, String),
+            func.count(func.distinct(size.sneaker_id)),
+        )
+        .join(sneaker, sneaker.id == size.sneaker_id)
+        .where(size.stock > 0, *conditions)
+        .group_by(size.eu_size)
+    )
+    return union_all(total, brands, prices, sizes)
+
+
+def _export_lines(db: Session, chunk_size: int):
+    """
+    One JSON line per sneaker, sizes embedded, read through a single
+    streamed (server-side cursor) LEFT JOIN ordered by sneaker id so the
+    size rows of a sneaker arrive together. Memory use is bounded by
+    chunk_size whatever the catalog size.
+    """
+    sneaker, size = models.Sneaker, models.SneakerSize
+    columns = [getattr(sneaker, name) for name in ("id", *schemas.SneakerBase.model_fields)]
+    stmt = (
+        select(
+            *columns,
+            size.id.label("size_id"),
+            size.eu_size.label("size_eu_size"),
+            size.stock.label("size_stock"),
+        )
+        .outerjoin(size, size.sneaker_id == sneaker.id)
+        .order_by(sneaker.id, size.eu_size)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    buffer: list[str] = []
+    flush_at = 1  # first line goes out right away, then in batches
+    for _sneaker_id, rows in groupby(db.execute(stmt), key=lambda row: row.id):
+        rows = list(rows)
+        record = {column.key: getattr(rows[0], column.key) for column in columns}
+        record["sizes"] = [
+            {"eu_size": row.size_eu_size, "stock": row.size_stock, "id": row.size_id}
+            for row in rows
+            if row.size_id is not None
+        ]
+        buffer.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if len(buffer) >= flush_at:
+            yield "".join(buffer)
+            buffer = []
+            flush_at = 100
+    if buffer:
+        yield "".join(buffer)
+
+
+def _sort_keys(sort: str) -> list:
+    column = SORT_COLUMNS[sort.lstrip("-")]
+    if column is models.Sneaker.id:
+        return [models.Sneaker.id]
+    return [column, models.Sneaker.id]
+
+
+def _seek_condition(keys: list, values: list, descending: bool):
+    """
+    Row-value comparison (a, b) > (x, y) spelled out as
+    a > x OR (a = x AND b > y), which both MySQL and SQLite can
+    turn into an index range scan.
+    """
+    first, value = keys[0], values[0]
+    condition = first < value if descending else first > value
+    if len(keys) == 1:
+        return condition
+    return or_(
+        condition,
+        and_(first == value, _seek_condition(keys[1:], values[1:], descending)),
+    )
+
+
+def _cursor_values(cursor: str, sort: str, keys: list) -> list:
+    payload = decode_cursor(cursor)
+    values = payload.get("k") if payload else None
+    if (
+        payload is None
+        or payload.get("s") != sort
+        or not isinstance(values, list)
+        or len(values) != len(keys)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _sneaker_options(spec: dict | None, extra_columns=()) -> list:
+    if spec is None:
+        return [selectinload(models.Sneaker.sizes)]
+    return loader_options(models.Sneaker, spec, extra_columns)
+
+
+def _dump_sneakers(sneakers: list[models.Sneaker], spec: dict | None) -> bytes:
+    if spec is None:
+        return _sneaker_list_adapter.dump_json(
+            _sneaker_list_adapter.validate_python(sneakers, from_attributes=True)
+        )
+    return to_json([dump_sparse(sneaker, spec, schemas.SneakerRead) for sneaker in sneakers])
+
+
+def _dump_sneaker(sneaker: models.Sneaker, spec: dict | None) -> bytes:
+    if spec is None:
+        return _sneaker_adapter.dump_json(
+            _sneaker_adapter.validate_python(sneaker, from_attributes=True)
+        )
+    return to_json(dump_sparse(sneaker, spec, schemas.SneakerRead))
+
+
+def _parse_ids(ids: str) -> list[int]:
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request"
+        )
+    return parsed
+
+
+def _next_cursor(sneaker: models.Sneaker, sort: str) -> str:
+    values = [getattr(sneaker, key.key) for key in _sort_keys(sort)]
+    return encode_cursor({"s": sort, "k": values})
+
+
+# ---------- Endpoints ----------
+
+
 @router.get("/", response_model=list[schemas.SneakerRead])
 def list_sneakers(
-    gender: str | None = None,
+    request: Request,
+    filters: SneakerFilters = Depends(sneaker_filters),
+    sort: SortOption = "id",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = FIELDS_QUERY,
     db: Session = Depends(get_db),  # ✅ only here
 ):
-    query = db.query(models.Sneaker)
-    if gender in ("men", "women"):
-        query = query.filter(models.Sneaker.gender == gender)
-    return query.all()
+    """
+    One page of sneakers, keyset-paginated on (sort key, id).
+
+    The cursor for the following page is returned in the X-Next-Cursor
+    header; it is absent on the last page. Sizes for the whole page are
+    loaded with a single extra IN query. Pages are served from the
+    catalog cache until the catalog changes.
+    """
+    cache_key = catalog_cache.key_for(request)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return respond(request, cached)
+
+    spec = parse_fields(fields, schemas.SneakerRead)
+    keys = _sort_keys(sort)
+    query = (
+        db.query(models.Sneaker)
+        .options(*_sneaker_options(spec, extra_columns=keys))
+        .filter(*filters.conditions())
+    )
+
+    descending = sort.startswith("-")
+    if cursor is not None:
+        values = _cursor_values(cursor, sort, keys)
+        query = query.filter(_seek_condition(keys, values, descending))
+
+    query = query.order_by(*(key.desc() if descending else key.asc() for key in keys))
+
+    # fetch one extra row to know whether another page exists
+    sneakers = query.limit(limit + 1).all()
+    headers = {}
+    if len(sneakers) > limit:
+        sneakers = sneakers[:limit]
+        headers[NEXT_CURSOR_HEADER] = _next_cursor(sneakers[-1], sort)
+
+    body = _dump_sneakers(sneakers, spec)
+    return respond(request, catalog_cache.store(cache_key, body, headers))
 
 
 @router.post("/", response_model=schemas.SneakerRead, status_code=201)
 def create_sneaker(sneaker: schemas.SneakerCreate, db: Session = Depends(get_db)):
     db_sneaker = models.Sneaker(**sneaker.dict())
     db.add(db_sneaker)
+    db.flush()
+    refresh_availability(db, [db_sneaker.id])
     db.commit()
     db.refresh(db_sneaker)
+    # index first: a search cached between the two would miss the new sneaker
+    index_sneaker(db_sneaker)
+    invalidate_catalog()
     return db_sneaker
 
 
+@router.post("/import", response_model=schemas.CatalogImportReport)
+def import_sneakers(
+    file: UploadFile = File(...),
+    format: Literal["csv", "ndjson"] | None = None,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk-load sneakers (with nested sizes) from a CSV or NDJSON upload.
+    The file is streamed and inserted in batches; invalid rows are
+    reported per line instead of failing the whole import.
+    """
+    fmt = format or format_for_filename(file.filename)
+    if fmt is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Cannot guess the file format, pass ?format=csv or ?format=ndjson",
+        )
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    return import_catalog(db, lines, fmt, batch_size)
+
+
+@router.get("/export.ndjson")
+def export_sneakers(
+    chunk_size: int = Query(EXPORT_CHUNK_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """
+    Full catalog as newline-delimited JSON (one SneakerRead per line),
+    streamed while it is read from the DB.
+    """
+    return StreamingResponse(
+        _export_lines(db, chunk_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="sneakers.ndjson"'},
+    )
+
+
+@router.get("/facets", response_model=schemas.SneakerFacets)
+def sneaker_facets(
+    request: Request,
+    filters: SneakerFilters = Depends(sneaker_filters),
+    db: Session = Depends(get_db),
+):
+    """
+    Sidebar counts (brands, in-stock sizes, price buckets) for the
+    sneakers matching the same filters GET /sneakers/ accepts.
+    """
+    cache_key = catalog_cache.key_for(request)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return respond(request, cached)
+
+    counts: dict[str, dict[str, int]] = {"total": {}, "brand": {}, "price": {}, "size": {}}
+    for facet, value, count in db.execute(_facet_statement(filters.conditions())):
+        counts[facet][value] = count
+
+    bucket_labels = [_price_bucket_label(i) for i in range(len(PRICE_BUCKETS))]
+    facets = schemas.SneakerFacets(
+        total=counts["total"].get("", 0),
+        brands=[
+            schemas.FacetCount(value=value, count=count)
+            for value, count in sorted(
+                counts["brand"].items(), key=lambda pair: (-pair[1], pair[0])
+            )
+        ],
+        sizes=[
+            schemas.FacetCount(value=value, count=counts["size"][value])
+            for value in sorted(counts["size"], key=int)
+        ],
+        price_buckets=[
+            schemas.FacetCount(value=label, count=counts["price"][label])
+            for label in bucket_labels
+            if label in counts["price"]
+        ],
+    )
+    return respond(request, catalog_cache.store(cache_key, facets.model_dump_json().encode()))
+
+
+@router.get("/batch", response_model=schemas.SneakerBatchRead)
+def get_sneakers_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated sneaker ids, e.g. 4,8,15"),
+    fields: str | None = FIELDS_QUERY,
+    db: Session = Depends(get_db),
+):
+    """
+    Many sneakers in one round trip: one IN query for the rows plus one for
+    their sizes. Items come back in the requested order; unknown ids are
+    listed under "missing" instead of failing the request.
+    """
+    cache_key = catalog_cache.key_for(request)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return respond(request, cached)
+
+    requested = _parse_ids(ids)
+    spec = parse_fields(fields, schemas.SneakerRead)
+    by_id = {
+        sneaker.id: sneaker
+        for sneaker in db.query(models.Sneaker)
+        .options(*_sneaker_options(spec))
+        .filter(models.Sneaker.id.in_(requested))
+    }
+    found = [by_id[sneaker_id] for sneaker_id in requested if sneaker_id in by_id]
+    missing = [sneaker_id for sneaker_id in requested if sneaker_id not in by_id]
+
+    body = b'{"items":' + _dump_sneakers(found, spec) + b',"missing":' + to_json(missing) + b"}"
+    return respond(request, catalog_cache.store(cache_key, body))
+
+
+@router.get("/search", response_model=list[schemas.SneakerRead])
+def search_sneakers(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    fields: str | None = FIELDS_QUERY,
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over name, brand, colorway, tag and description.
+
+    Matching and ranking happen in the in-memory index; the DB is only
+    asked for the ranked ids (one IN query plus one for their sizes).
+    """
+    cache_key = catalog_cache.key_for(request)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return respond(request, cached)
+
+    spec = parse_fields(fields, schemas.SneakerRead)
+    ranked_ids = [
+        sneaker_id for sneaker_id, _score in ensure_search_index(db).search(q, limit)
+    ]
+    sneakers = []
+    if ranked_ids:
+        by_id = {
+            sneaker.id: sneaker
+            for sneaker in db.query(models.Sneaker)
+            .options(*_sneaker_options(spec))
+            .filter(models.Sneaker.id.in_(ranked_ids))
+        }
+        sneakers = [by_id[sneaker_id] for sneaker_id in ranked_ids if sneaker_id in by_id]
+
+    body = _dump_sneakers(sneakers, spec)
+    return respond(request, catalog_cache.store(cache_key, body))
+
+
 @router.get("/{sneaker_id}", response_model=schemas.SneakerRead)
-def get_sneaker(sneaker_id: int, db: Session = Depends(get_db)):
-    sneaker = db.query(models.Sneaker).filter(models.Sneaker.id == sneaker_id).first()
+def get_sneaker(
+    sneaker_id: int,
+    request: Request,
+    fields: str | None = FIELDS_QUERY,
+    db: Session = Depends(get_db),
+):
+    cache_key = catalog_cache.key_for(request)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return respond(request, cached)
+
+    spec = parse_fields(fields, schemas.SneakerRead)
+    query = db.query(models.Sneaker)
+    if spec is not None:
+        query = query.options(*_sneaker_options(spec))
+    sneaker = query.filter(models.Sneaker.id == sneaker_id).first()
     if not sneaker:
         raise HTTPException(status_code=404, detail="Sneaker not found")
-    return sneaker
+
+    body = _dump_sneaker(sneaker, spec)
+    return respond(request, catalog_cache.store(cache_key, body))
+
+
+# ---------- Drop mode (striped stock) ----------
+
+
+def _stripes_read(sneaker_id: int, eu_size: int, shares: list[int] | None) -> schemas.SizeStripesRead:
+    if shares is None:
+        raise HTTPException(status_code=404, detail="Size not found")
+    return schemas.SizeStripesRead(
+        sneaker_id=sneaker_id, eu_size=eu_size, stock=sum(shares), stripes=shares
+    )
+
+
+@router.put("/{sneaker_id}/sizes/{eu_size}/stripes", response_model=schemas.SizeStripesRead, dependencies=ADMIN_ONLY)
+def start_drop(
+    sneaker_id: int,
+    eu_size: int,
+    payload: schemas.SizeStripesUpdate,
+    db: Session = Depends(get_db),
+):
+    """
+    Put a hot size in drop mode: its stock is split over N counter rows
+    and reservations spread over them instead of queueing on one row.
+    """
+    shares = enable_drop_mode(db, sneaker_id, eu_size, payload.stripes)
+    db.commit()
+    invalidate_catalog()
+    return _stripes_read(sneaker_id, eu_size, shares)
+
+
+@router.post("/{sneaker_id}/sizes/{eu_size}/stripes/rebalance", response_model=schemas.SizeStripesRead, dependencies=ADMIN_ONLY)
+def rebalance_stripes(sneaker_id: int, eu_size: int, db: Session = Depends(get_db)):
+    """Even out the stripes once some have run dry before others."""
+    if not stripe_stocks(db, sneaker_id, eu_size):
+        raise HTTPException(status_code=400, detail="Size is not in drop mode")
+    shares = rebalance_drop(db, sneaker_id, eu_size)
+    db.commit()
+    invalidate_catalog()
+    return _stripes_read(sneaker_id, eu_size, shares)
+
+
+@router.delete("/{sneaker_id}/sizes/{eu_size}/stripes", response_model=schemas.SizeStripesRead, dependencies=ADMIN_ONLY)
+def end_drop(sneaker_id: int, eu_size: int, db: Session = Depends(get_db)):
+    """Collapse the stripes back into the size's single stock row."""
+    shares = collapse_drop(db, sneaker_id, eu_size)
+    if shares is None:
+        raise HTTPException(status_code=404, detail="Size not found")
+    db.commit()
+    invalidate_catalog()
+    stock = db.query(models.SneakerSize.stock).filter(
+        models.SneakerSize.sneaker_id == sneaker_id, models.SneakerSize.eu_size == eu_size
+    ).scalar()
+    return schemas.SizeStripesRead(sneaker_id=sneaker_id, eu_size=eu_size, stock=stock, stripes=[])
+
+
+@router.put("/{sneaker_id}/waiting-room", response_model=schemas.WaitingRoomStats, dependencies=ADMIN_ONLY)
+async def open_waiting_room(sneaker_id: int):
+    """
+    Queue POST /cart/ for this sneaker: one consumer grants reservations
+    in arrival order, in batches, instead of every request hitting the DB.
+    """
+    await waiting_room.open(sneaker_id)
+    return waiting_room.stats(sneaker_id)
+
+
+@router.get("/{sneaker_id}/waiting-room", response_model=schemas.WaitingRoomStats, dependencies=ADMIN_ONLY)
+async def waiting_room_stats(sneaker_id: int):
+    return waiting_room.stats(sneaker_id)
+
+
+@router.delete("/{sneaker_id}/waiting-room", response_model=schemas.WaitingRoomStats, dependencies=ADMIN_ONLY)
+async def close_waiting_room(sneaker_id: int):
+    """Serve whoever is still queued, then go back to direct reservations."""
+    return await waiting_room.close(sneaker_id)
@@ -0,0 +1,88 @@
+# app/schema_upgrades.py
+"""
+Bring an existing database up to the models.
+
+create_all() only creates missing tables: columns and indexes added to a
+table that already exists never reach it, and every query selecting them
+fails. The ones listed here are added in place. Each step checks the live
+schema first, so running this again, or on a fresh database, changes
+nothing. Runs at startup with the table creation, or by hand:
+
+    python -m app.schema_upgrades
+"""
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import Column, Table
+
+from . import models
+from .database import engine as default_engine
+
+# table -> columns added after the table first shipped (all nullable)
+NEW_COLUMNS: dict[str, list[str]] = {
+    "cart_items": ["expires_at"],  # reservation deadlines
+    "idempotency_keys": ["claim_token"],  # fences taken-over claims
+    # sneaker snapshot, filled on old rows by app/order_snapshots.py
+    "order_items": ["sneaker_name", "sneaker_brand", "sneaker_colorway", "sneaker_image_url"],
+}
+
+# table -> indexes added after the table first shipped
+NEW_INDEXES: dict[str, list[str]] = {
+    # keyset pagination of the catalog
+    "sneakers": [
+        "ix_sneakers_price_id",
+        "ix_sneakers_brand_id",
+        # faceted filters
+        "ix_sneakers_gender_brand_price",
+        "ix_sneakers_tag_price",
+    ],
+    # size lookups and the "in stock in size X" facet
+    "sneaker_sizes": ["ix_sneaker_sizes_sneaker_size_stock", "ix_sneaker_sizes_size_stock_sneaker"],
+    "cart_items": ["ix_cart_items_expires_at"],  # the reservation sweeper
+    "orders": ["ix_orders_user_created"],  # order history pages
+    "outbox_events": ["ix_outbox_events_status_processed"],  # the retention purge
+}
+
+
+def _add_column(conn: Connection, table: Table, column: Column) -> None:
+    preparer = conn.dialect.identifier_preparer
+    conn.exec_driver_sql(
+        f"ALTER TABLE {preparer.format_table(table)} "
+        f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=conn.dialect)} NULL"
+    )
+
+
+def upgrade_schema(engine: Engine = default_engine) -> list[str]:
+    """Add the missing columns and indexes; returns what was added."""
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        tables = models.Base.metadata.tables
+
+        for table_name, column_names in NEW_COLUMNS.items():
+            if table_name not in existing_tables:
+                continue  # create_all makes it whole
+            present = {column["name"] for column in inspector.get_columns(table_name)}
+            for name in column_names:
+                if name not in present:
+                    _add_column(conn, tables[table_name], tables[table_name].c[name])
+                    added.append(f"{table_name}.{name}")
+
+        for table_name, index_names in NEW_INDEXES.items():
+            if table_name not in existing_tables:
+                continue
+            present = {index["name"] for index in inspector.get_indexes(table_name)}
+            for index in tables[table_name].indexes:
+                if index.name in index_names and index.name not in present:
+                    index.create(conn)
+                    added.append(index.name)
+    return added
+
+
+def main():
+    added = upgrade_schema()
+    print(f"✅ Schema up to date ({', '.join(added) or 'nothing to add'}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # app/schemas.py
-from pydantic import BaseModel,EmailStr,ConfigDict
-from datetime import datetime
-from typing import List
+from pydantic import BaseModel,EmailStr,ConfigDict,Field,model_validator
+from datetime import date, datetime
+from typing import List, Literal
 
 
 class SneakerSizeBase(BaseModel):
@@ -9,7 +9,8 @@ class SneakerSizeBase(BaseModel):
     stock: int
 
 class SneakerSizeCreate(SneakerSizeBase):
-    pass
+    # the sizes sneaker_availability.in_stock_mask has a bit for (EU 16..78)
+    eu_size: int = Field(ge=16, le=78)
 
 class SneakerSizeRead(SneakerSizeBase):
     id: int
@@ -37,6 +38,7 @@ class CartItemRead(BaseModel):
     image_url: str | None = None
     gender: str | None = None
     description: str | None = None
+    expires_at: datetime | None = None  # reservation end, stock is released after
     model_config = ConfigDict(from_attributes=True)
 
 class SneakerBase(BaseModel):
@@ -53,13 +55,73 @@ class SneakerCreate(SneakerBase):
     pass
 
 
+class SneakerImportRow(SneakerCreate):
+    sizes: list[SneakerSizeCreate] = []
+
+
+class CatalogImportError(BaseModel):
+    line: int
+    error: str
+
+
+class CatalogImportReport(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: list[CatalogImportError] = []  # capped, see catalog_import
+
+
+class SneakerAvailabilityRead(BaseModel):
+    total_stock: int
+    in_stock_sizes: list[int]
+    sold_out: bool
+    model_config = ConfigDict(from_attributes=True)
+
+
 class SneakerRead(SneakerBase):
     id: int
     sizes: list[SneakerSizeRead] = []  # NEW: include size/stock info
+    availability: SneakerAvailabilityRead | None = None
 
     class Config:
         orm_mode = True
         
+class SneakerBatchRead(BaseModel):
+    items: list[SneakerRead]  # in the requested order
+    missing: list[int]
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class SneakerFacets(BaseModel):
+    total: int
+    brands: list[FacetCount]
+    sizes: list[FacetCount]  # sneakers with stock in that EU size
+    price_buckets: list[FacetCount]
+
+
+class SizeStripesUpdate(BaseModel):
+    stripes: int = Field(ge=2, le=64)
+
+
+class SizeStripesRead(BaseModel):
+    sneaker_id: int
+    eu_size: int
+    stock: int  # all stripes together
+    stripes: list[int]  # stock per stripe, [] outside drop mode
+
+
+class WaitingRoomStats(BaseModel):
+    sneaker_id: int
+    open: bool
+    waiting: int
+    granted: int
+    rejected: int
+    batches: int
+
+
 class CartItemBase(BaseModel):
     sneaker_id: int
     quantity: int = 1
@@ -76,6 +138,36 @@ class CartItemUpdate(BaseModel):
     quantity: int
 
 
+class CartBatchOperation(BaseModel):
+    """
+    One change in POST /cart/batch:
+    add (sneaker_id, size, quantity), update (item_id, quantity), remove (item_id).
+    """
+    op: Literal["add", "update", "remove"]
+    item_id: int | None = None
+    sneaker_id: int | None = None
+    size: int | None = None
+    quantity: int | None = None
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        required = {
+            "add": ("sneaker_id", "size", "quantity"),
+            "update": ("item_id", "quantity"),
+            "remove": ("item_id",),
+        }[self.op]
+        missing = [name for name in required if getattr(self, name) is None]
+        if missing:
+            raise ValueError(f"{self.op} needs {', '.join(missing)}")
+        if self.op == "add" and self.quantity <= 0:
+            raise ValueError("add needs a positive quantity")
+        return self
+
+
+class CartBatchRequest(BaseModel):
+    operations: list[CartBatchOperation] = Field(min_length=1, max_length=100)
+
+
 class UserBase(BaseModel):
     email: EmailStr
     full_name: str | None = None
@@ -104,6 +196,43 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     sub: str | None = None  # email
+    uid: int | None = None  # user id, absent from tokens issued before it
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+class ReservationSweepStats(BaseModel):
+    runs: int
+    items_released: int
+    units_released: int
+    last_run_at: datetime | None = None
+    last_duration_ms: float | None = None
+
+
+class SalesRow(BaseModel):
+    # only the group_by fields are set
+    day: date | None = None
+    sneaker: int | None = None  # sneaker id
+    size: int | None = None
+    gender: str | None = None
+    units: int
+    revenue: float
+
+
+class OrderItemSneaker(BaseModel):
+    """Snapshot taken at checkout, not the live catalog row."""
+    id: int
+    name: str | None = None
+    brand: str | None = None
+    price: float
+    colorway: str | None = None
+    image_url: str | None = None
+    model_config = ConfigDict(from_attributes=True)
+
 
 class OrderItemRead(BaseModel):
     id: int
@@ -111,7 +240,7 @@ class OrderItemRead(BaseModel):
     size: int
     quantity: int
     price: float
-    sneaker: CartItemSneaker  # reuse your sneaker schema
+    sneaker: OrderItemSneaker
 
     class Config:
         orm_mode = True
@@ -0,0 +1,290 @@
+# app/search_index.py
+import heapq
+import logging
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Iterable, Mapping
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import LRUCache
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# how much a hit in each field counts towards the score
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "brand": 2.0,
+    "tag": 1.5,
+    "colorway": 1.0,
+    "description": 0.5,
+}
+# a prefix hit ("jor" -> "jordan") counts less than the full word
+PREFIX_FACTOR = 0.5
+# cap on how many vocabulary words a single prefix may expand to
+MAX_PREFIX_EXPANSIONS = 64
+RESULT_CACHE_SIZE = 1024
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over the text fields of the catalog.
+
+    postings: token -> {sneaker_id: weighted term frequency}
+    vocabulary is kept sorted so prefix lookups are a bisect + short scan.
+    by_weight: token -> its sneaker ids best first, sorted on first use and
+    dropped when the token's postings change (one-word queries read it).
+    """
+
+    def __init__(self):
+        self._postings: dict[str, dict[int, float]] = {}
+        self._doc_tokens: dict[int, set[str]] = {}
+        self._vocabulary: list[str] = []
+        self._by_weight: dict[str, list[int]] = {}
+        self._lock = threading.RLock()
+        # ranked results of recent queries, dropped on any index change
+        self._results = LRUCache(RESULT_CACHE_SIZE)
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    # ---------- maintenance ----------
+
+    @staticmethod
+    def _weights(fields: Mapping[str, str | None]) -> dict[str, float]:
+        weights: dict[str, float] = {}
+        for field_name, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field_name)):
+                weights[token] = weights.get(token, 0.0) + weight
+        return weights
+
+    def add(self, sneaker_id: int, fields: Mapping[str, str | None]) -> None:
+        """Index (or re-index) one sneaker."""
+        weights = self._weights(fields)
+
+        with self._lock:
+            self._results.clear()
+            self._remove_locked(sneaker_id)
+            for token, weight in weights.items():
+                self._by_weight.pop(token, None)
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    insort(self._vocabulary, token)
+                postings[sneaker_id] = weight
+            self._doc_tokens[sneaker_id] = set(weights)
+
+    def _postings_add(self, sneaker_id: int, fields: Mapping[str, str | None]) -> None:
+        """add() for a fresh index being rebuilt: no lock, vocabulary sorted at the end."""
+        weights = self._weights(fields)
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[sneaker_id] = weight
+        self._doc_tokens[sneaker_id] = set(weights)
+
+    def remove(self, sneaker_id: int) -> None:
+        with self._lock:
+            self._results.clear()
+            self._remove_locked(sneaker_id)
+
+    def _remove_locked(self, sneaker_id: int) -> None:
+        for token in self._doc_tokens.pop(sneaker_id, ()):
+            self._by_weight.pop(token, None)
+            postings = self._postings[token]
+            postings.pop(sneaker_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def rebuild(self, documents: Iterable[tuple[int, Mapping[str, str | None]]]) -> None:
+        """
+        Replace the whole index. Built aside and swapped in, so searches keep
+        being served (from the old contents) while a big catalog is read.
+        """
+        fresh = SearchIndex()
+        for sneaker_id, fields in documents:
+            fresh._postings_add(sneaker_id, fields)
+        fresh._vocabulary = sorted(fresh._postings)
+        with self._lock:
+            self._postings = fresh._postings
+            self._doc_tokens = fresh._doc_tokens
+            self._vocabulary = fresh._vocabulary
+            self._by_weight = {}
+            self._results.clear()
+            self.built = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._vocabulary.clear()
+            self._by_weight.clear()
+            self._results.clear()
+            self.built = False
+
+    # ---------- querying ----------
+
+    def _expand(self, token: str) -> list[tuple[str, float]]:
+        """Vocabulary words matching token, with the factor they score at."""
+        matches = []
+        if token in self._postings:
+            matches.append((token, 1.0))
+        start = bisect_left(self._vocabulary, token)
+        for word in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+            if not word.startswith(token):
+                break
+            if word != token:
+                matches.append((word, PREFIX_FACTOR))
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """
+        Ranked (sneaker_id, score) pairs for sneakers matching every query
+        word, either exactly or as a prefix. Scores are tf-idf style.
+
+        Words are matched rarest first: only the first word's postings are
+        walked, later words are looked up for the surviving candidates, and
+        only the top `limit` are ranked.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        key = (tuple(tokens), limit)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                return cached
+            ranked = self._search_locked(tokens, limit)
+            self._results.set(key, ranked)
+        return ranked
+
+    def _ranked(self, word: str) -> list[int]:
+        ranked = self._by_weight.get(word)
+        if ranked is None:
+            postings = self._postings[word]
+            ranked = self._by_weight[word] = sorted(postings, key=lambda sneaker_id: (-postings[sneaker_id], sneaker_id))
+        return ranked
+
+    def _search_locked(self, tokens: list[str], limit: int) -> list[tuple[int, float]]:
+        total_docs = len(self._doc_tokens) or 1
+        # per query word: (postings, idf * prefix factor) of every word it matches
+        terms = []
+        for token in tokens:
+            matches = self._expand(token)
+            if not matches:
+                return []
+            if len(tokens) == 1 and len(matches) == 1:
+                # one word matching one vocabulary word: scores follow the weights
+                (word, factor), = matches
+                postings = self._postings[word]
+                scale = math.log(1 + total_docs / len(postings)) * factor
+                return [(sneaker_id, postings[sneaker_id] * scale) for sneaker_id in self._ranked(word)[:limit]]
+            terms.append([
+                (self._postings[word], math.log(1 + total_docs / len(self._postings[word])) * factor)
+                for word, factor in matches
+            ])
+        terms.sort(key=lambda expansions: sum(len(postings) for postings, _ in expansions))
+
+        scores: dict[int, float] = {}
+        for postings, scale in terms[0]:
+            if not scores:
+                scores = {sneaker_id: weight * scale for sneaker_id, weight in postings.items()}
+                continue
+            for sneaker_id, weight in postings.items():
+                scores[sneaker_id] = scores.get(sneaker_id, 0.0) + weight * scale
+        for expansions in terms[1:]:
+            if len(expansions) == 1:  # the usual case, a word with no longer words
+                (postings, scale), = expansions
+                scores = {
+                    sneaker_id: score + postings[sneaker_id] * scale
+                    for sneaker_id, score in scores.items()
+                    if sneaker_id in postings
+                }
+                if not scores:
+                    return []
+                continue
+            narrowed = {}
+            for sneaker_id, score in scores.items():
+                hit = False
+                for postings, scale in expansions:
+                    weight = postings.get(sneaker_id)
+                    if weight is not None:
+                        score += weight * scale
+                        hit = True
+                if hit:
+                    narrowed[sneaker_id] = score
+            scores = narrowed
+            if not scores:
+                return []
+
+        def ranked(pairs) -> list[tuple[int, float]]:
+            # best score first, lower id first on ties
+            return sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+
+        if len(scores) <= limit:
+            return ranked(scores.items())
+        # plain floats through nlargest (no key function) find the cut-off score;
+        # only what beats it is sorted, ties at it are settled on the lowest ids
+        cutoff = heapq.nlargest(limit, scores.values())[-1]
+        above = ranked((sneaker_id, score) for sneaker_id, score in scores.items() if score > cutoff)
+        tied = heapq.nsmallest(
+            limit - len(above),
+            (sneaker_id for sneaker_id, score in scores.items() if score == cutoff),
+        )
+        return above + [(sneaker_id, cutoff) for sneaker_id in tied]
+
+
+search_index = SearchIndex()
+
+
+def sneaker_fields(sneaker) -> dict[str, str | None]:
+    return {name: getattr(sneaker, name) for name in FIELD_WEIGHTS}
+
+
+def index_sneaker(sneaker: models.Sneaker) -> None:
+    """
+    Keep the index in step with a created/changed sneaker. Skipped until
+    the index is built, which will pick the row up anyway.
+    """
+    if search_index.built:
+        search_index.add(sneaker.id, sneaker_fields(sneaker))
+
+
+def build_search_index(db: Session) -> SearchIndex:
+    columns = [models.Sneaker.id] + [
+        getattr(models.Sneaker, name) for name in FIELD_WEIGHTS
+    ]
+    rows = db.query(*columns).yield_per(1000)
+    search_index.rebuild((row.id, row._mapping) for row in rows)
+    return search_index
+
+
+def ensure_search_index(db: Session) -> SearchIndex:
+    """The index, built from the DB here only if startup didn't (see warm_search_index)."""
+    if not search_index.built:
+        build_search_index(db)
+    return search_index
+
+
+def warm_search_index() -> None:
+    """Build the index at startup (in a worker thread), not in the first search."""
+    db = SessionLocal()
+    try:
+        build_search_index(db)
+    except Exception:
+        logger.exception("Building the search index failed, the first search will retry")
+    finally:
+        db.close()
@@ -42,6 +42,7 @@ def decode_token(token: str) -> schemas.TokenData | None:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub: str | None = payload.get("sub")
-        return schemas.TokenData(sub=sub)
+        uid = payload.get("uid")
+        return schemas.TokenData(sub=sub, uid=uid if isinstance(uid, int) else None)
     except JWTError:
         return None
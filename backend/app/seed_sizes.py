@@ -1,45 +1,63 @@
 from sqlalchemy.orm import Session
 from .database import SessionLocal
 from . import models
+from .catalog_cache import invalidate_catalog
+from .inventory import refresh_availability
 
 
 MEN_SIZES = [41, 42, 43, 44, 45, 46]
 WOMEN_SIZES = [35, 36, 37, 38, 39, 40, 41]
 
 
+def seed_default_sizes(db: Session, sneaker_ids: list[int] | None = None) -> int:
+    """Give sneakers (all by default) their default size rows, 10 in stock. Returns how many were created."""
+    query = db.query(models.Sneaker)
+    if sneaker_ids is not None:
+        query = query.filter(models.Sneaker.id.in_(sneaker_ids))
+    sneakers = query.all()
+
+    created = 0
+    touched = []
+    for sneaker in sneakers:
+        gender = (sneaker.gender or "").lower()
+        sizes = WOMEN_SIZES if gender == "women" else MEN_SIZES
+
+        for size in sizes:
+            # skip if size already exists
+            existing = (
+                db.query(models.SneakerSize)
+                .filter_by(sneaker_id=sneaker.id, eu_size=size)
+                .first()
+            )
+            if existing:
+                continue
+
+            db.add(
+                models.SneakerSize(
+                    sneaker_id=sneaker.id,
+                    eu_size=size,
+                    stock=10,  # default stock
+                )
+            )
+            created += 1
+            touched.append(sneaker.id)
+
+    # new stock must show up in the availability summaries too
+    refresh_availability(db, touched)
+    db.commit()
+    if created:
+        invalidate_catalog()
+    return created
+
+
 def main():
     db: Session = SessionLocal()
     try:
-        sneakers = db.query(models.Sneaker).all()
-        if not sneakers:
+        if not db.query(models.Sneaker.id).first():
             print("No sneakers found.")
             return
 
-        created = 0
-        for sneaker in sneakers:
-            gender = (sneaker.gender or "").lower()
-            sizes = WOMEN_SIZES if gender == "women" else MEN_SIZES
-
-            for size in sizes:
-                # skip if size already exists
-                existing = (
-                    db.query(models.SneakerSize)
-                    .filter_by(sneaker_id=sneaker.id, eu_size=size)
-                    .first()
-                )
-                if existing:
-                    continue
-
-                db.add(
-                    models.SneakerSize(
-                        sneaker_id=sneaker.id,
-                        eu_size=size,
-                        stock=10,  # default stock
-                    )
-                )
-                created += 1
-
-        db.commit()
+        created = seed_default_sizes(db)
         print(f"✅ Created {created} size rows.")
     finally:
         db.close()
@@ -0,0 +1,57 @@
+# app/user_cache.py
+"""
+Resolved users by id, so authenticated requests skip the users query.
+
+Entries are detached User rows living at most AUTH_CACHE_TTL_SECONDS.
+Any ORM update or delete of a user drops its entry (on flush and again on
+commit, so a request racing the change can't re-cache the old row for
+long). Bulk query.update()/delete() on users bypass these events: call
+forget_user() after them.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import LRUCache
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+user_cache = LRUCache(AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+_CHANGED_KEY = "user_cache.changed"
+
+
+def cached_user(user_id: int) -> models.User | None:
+    return user_cache.get(user_id)
+
+
+def remember_user(db: Session, user: models.User) -> models.User:
+    """Cache user, detached from db so it outlives the request's session."""
+    if user.id in db.info.get(_CHANGED_KEY, ()):
+        return user  # changed in this transaction, not committed yet
+    db.expunge(user)
+    user_cache.set(user.id, user)
+    return user
+
+
+def forget_user(user_id: int) -> None:
+    user_cache.pop(user_id)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target: models.User) -> None:
+    forget_user(target.id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_changed(session: Session) -> None:
+    for user_id in session.info.pop(_CHANGED_KEY, ()):
+        forget_user(user_id)
@@ -0,0 +1,191 @@
+# benchmarks/checkout_bench.py
+"""
+Checkout cost by cart size: SQL statements and latency of POST /orders/checkout
+against a throwaway SQLite database. Both should stay flat as the cart grows.
+
+    python -m backend.benchmarks.checkout_bench [--runs 20]
+
+With --concurrency, instead: N buyers checking out at once, per-request
+commits against group commit (CHECKOUT_GROUP_COMMIT_MS), reporting
+throughput and p99 latency of each.
+
+    python -m backend.benchmarks.checkout_bench --concurrency 32 [--window-ms 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DISABLE_AUTO_CREATE_DB", "1")
+# no background jobs against the real database while benchmarking
+os.environ.setdefault("CART_SWEEP_INTERVAL_SECONDS", "0")
+os.environ.setdefault("SALES_ROLLUP_INTERVAL_SECONDS", "0")
+
+from fastapi import Header
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import database, models
+from backend.app.group_commit import checkout_group
+from backend.app.main import app
+from backend.app.routers.auth import get_current_user
+
+CART_SIZES = (1, 5, 10, 25, 50)
+
+
+def _setup(db_url: str):
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    user = models.User(email="bench@example.com", hashed_password="x", full_name="Bench")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    return engine, session_factory
+
+
+def _fill_cart(client: TestClient, session_factory, items: int) -> None:
+    db = session_factory()
+    try:
+        sneakers = [
+            models.Sneaker(name=f"Bench {i}", brand="Bench", price=100.0) for i in range(items)
+        ]
+        db.add_all(sneakers)
+        db.flush()
+        db.add_all(
+            models.SneakerSize(sneaker_id=sneaker.id, eu_size=42, stock=1000)
+            for sneaker in sneakers
+        )
+        db.commit()
+        ids = [sneaker.id for sneaker in sneakers]
+    finally:
+        db.close()
+    for sneaker_id in ids:
+        client.post("/cart/", json={"sneaker_id": sneaker_id, "quantity": 1, "size": 42})
+
+
+def main(runs: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session_factory = _setup(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        client = TestClient(app)
+        statements: list[str] = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+        )
+
+        print(f"{'cart size':>9}  {'queries':>7}  {'median ms':>9}  {'p95 ms':>7}")
+        for items in CART_SIZES:
+            timings, counts = [], []
+            for _ in range(runs):
+                _fill_cart(client, session_factory, items)
+                statements.clear()
+                started = time.perf_counter()
+                resp = client.post("/orders/checkout")
+                timings.append((time.perf_counter() - started) * 1000)
+                counts.append(len(statements))
+                resp.raise_for_status()
+            p95 = _percentile(timings, 0.95)
+            print(
+                f"{items:>9}  {max(counts):>7}  {statistics.median(timings):>9.2f}  {p95:>7.2f}"
+            )
+        engine.dispose()
+    app.dependency_overrides.clear()
+
+
+def _percentile(timings: list[float], fraction: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def _load_round(client: TestClient, session_factory, buyers: list[int], sneaker_id: int) -> list[float]:
+    """Give every buyer a one-line cart, then have them all check out at once."""
+    db = session_factory()
+    try:
+        db.add_all(
+            models.CartItem(user_id=user_id, sneaker_id=sneaker_id, size=42, quantity=1)
+            for user_id in buyers
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    def checkout(user_id: int) -> float:
+        started = time.perf_counter()
+        client.post("/orders/checkout", headers={"X-Bench-User": str(user_id)}).raise_for_status()
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=len(buyers)) as pool:
+        return list(pool.map(checkout, buyers))
+
+
+def main_concurrent(runs: int, concurrency: int, window_ms: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session_factory = _setup(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db = session_factory()
+        users = [
+            models.User(email=f"buyer{n}@example.com", hashed_password="x", full_name=f"Buyer {n}")
+            for n in range(concurrency)
+        ]
+        sneaker = models.Sneaker(name="Bench Load", brand="Bench", price=100.0)
+        db.add_all([*users, sneaker])
+        db.flush()
+        db.add(models.SneakerSize(sneaker_id=sneaker.id, eu_size=42, stock=10**9))
+        db.commit()
+        for user in users:
+            db.refresh(user)
+            db.expunge(user)
+        sneaker_id = sneaker.id
+        db.close()
+        by_id = {user.id: user for user in users}
+
+        def bench_user(x_bench_user: int = Header(...)):
+            return by_id[x_bench_user]
+
+        app.dependency_overrides[get_current_user] = bench_user
+        checkout_group.session_factory = session_factory
+
+        print(f"{'mode':>14}  {'orders/s':>9}  {'median ms':>9}  {'p99 ms':>7}")
+        for label, window in (("per-request", 0.0), (f"group {window_ms:g}ms", window_ms)):
+            checkout_group.window_ms = window
+            # one event loop for the run, so the group consumer outlives requests
+            with TestClient(app) as client:
+                timings, elapsed = [], 0.0
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    timings += _load_round(client, session_factory, list(by_id), sneaker_id)
+                    elapsed += time.perf_counter() - started
+            print(
+                f"{label:>14}  {len(timings) / elapsed:>9.1f}  "
+                f"{statistics.median(timings):>9.2f}  {_percentile(timings, 0.99):>7.2f}"
+            )
+        engine.dispose()
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=0, help="buyers at once; 0 = cart-size mode")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    if args.concurrency:
+        main_concurrent(args.runs, args.concurrency, args.window_ms)
+    else:
+        main(args.runs)
@@ -8,13 +8,29 @@ BACKEND_DIR = os.path.dirname(CURRENT_DIR)
 if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 
+# no periodic jobs in tests: they'd run whenever a test starts the app's lifespan
+for interval in (
+    "CART_SWEEP_INTERVAL_SECONDS",
+    "SALES_ROLLUP_INTERVAL_SECONDS",
+    "IDEMPOTENCY_PURGE_INTERVAL_SECONDS",
+    "OUTBOX_PURGE_INTERVAL_SECONDS",
+):
+    os.environ.setdefault(interval, "0")
+# the user the tests sign in as (override_get_current_user) is an admin
+os.environ.setdefault("ADMIN_EMAILS", "test@example.com")
+
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from backend.app import main,models
 from backend.app import database
+from backend.app.catalog_cache import catalog_cache
+from backend.app.reservations import sweep_metrics
+from backend.app.search_index import search_index
 from backend.app.routers.auth import get_current_user
 
 # from app.main import app
@@ -39,6 +55,9 @@ TestingSessionLocal = sessionmaker(
 # database.Base.metadata.create_all(bind=engine)
 database.Base.metadata.drop_all(bind=engine)
 database.Base.metadata.create_all(bind=engine)
+# code opening its own sessions (startup index build, waiting room, workers)
+# must land on the test DB, never on the MySQL database SessionLocal points at
+database.SessionLocal.configure(bind=engine)
 
 def override_get_db():
     db = TestingSessionLocal()
@@ -73,6 +92,19 @@ def override_get_current_user():
 main.app.dependency_overrides[database.get_db] = override_get_db
 main.app.dependency_overrides[get_current_user] = override_get_current_user
 
+@pytest.fixture(autouse=True)
+def reset_in_process_state():
+    """
+    Tests seed the DB directly through db_session, which bypasses the
+    invalidation hooks in the routers, so start every test from empty
+    in-process caches.
+    """
+    catalog_cache.clear()
+    search_index.reset()
+    sweep_metrics.reset()
+    yield
+
+
 @pytest.fixture
 def client() -> TestClient:
     """FastAPI TestClient using the SQLite test database."""
@@ -84,7 +116,46 @@ def client() -> TestClient:
 def db_session():
     """Raw SQLAlchemy session for seeding data directly in tests."""
     db = TestingSessionLocal()
+
+    # The API writes through its own sessions, so re-read rows this session
+    # already holds instead of returning stale identity-map copies.
+    @event.listens_for(db, "do_orm_execute")
+    def _always_refresh(orm_execute_state):
+        if orm_execute_state.is_select:
+            orm_execute_state.update_execution_options(populate_existing=True)
+
     try:
         yield db
     finally:
         db.close()
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory bound to the test DB, for code that opens its own sessions."""
+    return TestingSessionLocal
+
+
+@pytest.fixture
+def count_queries():
+    """
+    Context manager collecting every SQL statement sent to the test DB:
+
+        with count_queries() as statements:
+            client.get(...)
+        assert len(statements) == 2
+    """
+    @contextmanager
+    def _count():
+        statements: list[str] = []
+
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", _before_execute)
+
+    return _count
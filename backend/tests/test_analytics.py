@@ -0,0 +1,108 @@
+# backend/tests/test_analytics.py
+from datetime import datetime, timedelta
+
+from backend.app import main, models
+from backend.app.rollups import refresh_sales_rollup
+from backend.app.routers import auth
+from backend.app.routers.auth import get_current_user
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+LATER = datetime.utcnow() + timedelta(hours=1)
+TODAY = datetime.utcnow().date().isoformat()
+
+
+def reset_rollup(db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.query(models.SalesDaily).delete()
+    db_session.query(models.RollupState).delete()
+    db_session.commit()
+    # everything ordered so far is history, start the rollup from here
+    refresh_sales_rollup(db_session, now=LATER)
+    db_session.query(models.SalesDaily).delete()
+    db_session.commit()
+
+
+def buy(client, db_session, name, quantity, price=100.0, gender="men"):
+    sneaker, _ = create_sneaker_with_size(db_session, name=name, stock=10)
+    sneaker.price = price
+    sneaker.gender = gender
+    db_session.commit()
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": quantity, "size": 42})
+    assert client.post("/orders/checkout").status_code == 200
+    return sneaker
+
+
+def sales(client, group_by="day"):
+    resp = client.get("/analytics/sales", params={"from": TODAY, "to": TODAY, "group_by": group_by})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_rollup_is_incremental(client, db_session):
+    reset_rollup(db_session)
+    first = buy(client, db_session, "Rollup One", 2, price=50.0)
+    assert refresh_sales_rollup(db_session, now=LATER) == 1
+    assert sales(client) == [{"day": TODAY, "units": 2, "revenue": 100.0}]
+
+    # nothing new, nothing folded twice
+    assert refresh_sales_rollup(db_session, now=LATER) == 0
+    buy(client, db_session, "Rollup Two", 1, price=80.0, gender="women")
+    client.post("/cart/", json={"sneaker_id": first.id, "quantity": 1, "size": 42})
+    client.post("/orders/checkout")
+    assert refresh_sales_rollup(db_session, now=LATER) == 2
+
+    assert sales(client) == [{"day": TODAY, "units": 4, "revenue": 230.0}]
+    assert sales(client, "gender") == [
+        {"gender": "men", "units": 3, "revenue": 150.0},
+        {"gender": "women", "units": 1, "revenue": 80.0},
+    ]
+    by_sneaker = sales(client, "sneaker,size")
+    assert {"sneaker": first.id, "size": 42, "units": 3, "revenue": 150.0} in by_sneaker
+    assert db_session.query(models.SalesDaily).count() == 2
+
+
+def test_recent_orders_wait_until_settled(client, db_session):
+    reset_rollup(db_session)
+    buy(client, db_session, "Rollup Fresh", 1)
+    assert refresh_sales_rollup(db_session) == 0
+    assert sales(client) == []
+    assert refresh_sales_rollup(db_session, now=LATER) == 1
+
+
+def test_refresh_in_small_batches(client, db_session):
+    reset_rollup(db_session)
+    for n in range(3):
+        buy(client, db_session, f"Rollup Batch {n}", 1, price=10.0)
+    assert refresh_sales_rollup(db_session, now=LATER, batch_size=2) == 3
+    assert sales(client) == [{"day": TODAY, "units": 3, "revenue": 30.0}]
+
+
+def test_report_reads_only_the_rollup(client, db_session, count_queries):
+    reset_rollup(db_session)
+    buy(client, db_session, "Rollup Query", 1)
+    refresh_sales_rollup(db_session, now=LATER)
+    with count_queries() as statements:
+        sales(client, "day,gender")
+    statements = [s for s in statements if "FROM users" not in s]  # the login
+    assert len(statements) == 1
+    assert "sales_daily" in statements[0]
+    assert "order_items" not in statements[0]
+
+
+def test_bad_report_parameters(client):
+    params = {"from": TODAY, "to": TODAY}
+    assert client.get("/analytics/sales", params={**params, "group_by": "colour"}).status_code == 400
+    assert client.get("/analytics/sales", params={"from": TODAY, "to": "2000-01-01"}).status_code == 400
+    assert client.get("/analytics/sales", params={"from": TODAY}).status_code == 422
+
+
+def test_report_requires_login(client, monkeypatch):
+    monkeypatch.delitem(main.app.dependency_overrides, get_current_user)
+    resp = client.get("/analytics/sales", params={"from": TODAY, "to": TODAY})
+    assert resp.status_code == 401
+
+
+def test_report_is_admin_only(client, monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_EMAILS", frozenset({"boss@example.com"}))
+    resp = client.get("/analytics/sales", params={"from": TODAY, "to": TODAY})
+    assert resp.status_code == 403
@@ -0,0 +1,67 @@
+# backend/tests/test_auth.py
+import pytest
+
+from backend.app import main, models
+from backend.app.routers.auth import get_current_user
+from backend.app.security import create_access_token, decode_token
+from backend.app.user_cache import user_cache
+
+
+@pytest.fixture
+def real_auth(monkeypatch):
+    """Undo the conftest override so requests go through the JWT."""
+    monkeypatch.delitem(main.app.dependency_overrides, get_current_user)
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+
+def register_and_login(client, email):
+    client.post("/auth/register", json={"email": email, "password": "pw", "full_name": "Cached"})
+    token = client.post("/auth/login", data={"username": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def user_queries(statements):
+    return [s for s in statements if "FROM users" in s]
+
+
+def test_token_carries_the_user_id_and_users_are_cached(client, db_session, real_auth, count_queries):
+    headers = register_and_login(client, "cache1@example.com")
+    user = db_session.query(models.User).filter(models.User.email == "cache1@example.com").one()
+    token = headers["Authorization"].split()[1]
+    assert decode_token(token).uid == user.id
+
+    with count_queries() as first:
+        assert client.get("/auth/me", headers=headers).json()["email"] == "cache1@example.com"
+    with count_queries() as second:
+        assert client.get("/auth/me", headers=headers).status_code == 200
+    assert len(user_queries(first)) == 1
+    assert user_queries(second) == []
+
+    stats = client.get("/auth/cache/stats", headers=headers).json()
+    assert stats["hits"] >= 2 and stats["misses"] == 1 and stats["size"] == 1
+
+
+def test_changed_or_deleted_users_are_not_served_from_the_cache(client, db_session, real_auth):
+    headers = register_and_login(client, "cache2@example.com")
+    client.get("/auth/me", headers=headers)  # cached
+
+    user = db_session.query(models.User).filter(models.User.email == "cache2@example.com").one()
+    user.full_name = "Renamed"
+    user.is_active = False
+    db_session.commit()
+    me = client.get("/auth/me", headers=headers).json()
+    assert (me["full_name"], me["is_active"]) == ("Renamed", False)
+
+    db_session.delete(user)
+    db_session.commit()
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_tokens_without_user_id_still_work(client, db_session, real_auth):
+    register_and_login(client, "cache3@example.com")
+    legacy = create_access_token(data={"sub": "cache3@example.com"})
+    resp = client.get("/auth/me", headers={"Authorization": f"Bearer {legacy}"})
+    assert resp.status_code == 200
+    assert resp.json()["email"] == "cache3@example.com"
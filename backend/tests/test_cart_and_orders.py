@@ -1,5 +1,6 @@
 # backend/tests/test_cart_and_orders.py
 from backend.app import models
+from backend.app.order_snapshots import backfill_order_snapshots
 
 
 def create_sneaker_with_size(
@@ -466,3 +467,124 @@ def test_get_my_orders_returns_orders_sorted_desc(client, db_session):
     assert len(orders) >= 2
     assert orders[0]["id"] == order2_id
     assert orders[1]["id"] == order1_id
+
+
+def test_get_cart_is_a_single_query_whatever_the_cart_size(client, db_session, count_queries):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+
+    def cart_queries():
+        with count_queries() as statements:
+            resp = client.get("/cart/")
+        assert resp.status_code == 200
+        # ignore the test auth override's own user lookup
+        return [s for s in statements if "FROM users" not in s], resp.json()
+
+    sneaker, _ = create_sneaker_with_size(db_session, name="Cart Query 0", eu_size=40)
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 40})
+    one_item_queries, cart = cart_queries()
+    assert len(cart) == 1
+    assert len(one_item_queries) == 1
+
+    for i in range(1, 5):
+        sneaker, _ = create_sneaker_with_size(db_session, name=f"Cart Query {i}", eu_size=40)
+        client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 40})
+    five_item_queries, cart = cart_queries()
+    assert [item["sneaker"]["name"] for item in cart] == [f"Cart Query {i}" for i in range(5)]
+    assert len(five_item_queries) == 1
+
+
+def test_checkout_query_count_does_not_grow_with_the_cart(client, db_session, count_queries):
+    def checkout_queries(items: int, tag: str):
+        db_session.query(models.CartItem).delete()
+        db_session.commit()
+        for i in range(items):
+            sneaker, _ = create_sneaker_with_size(db_session, name=f"{tag} {i}", price=10.0)
+            client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+        with count_queries() as statements:
+            resp = client.post("/orders/checkout")
+        assert resp.status_code == 200
+        assert resp.json()["total"] == 10.0 * items
+        assert len(resp.json()["items"]) == items
+        return [s for s in statements if "FROM users" not in s]
+
+    assert len(checkout_queries(1, "Flat A")) == len(checkout_queries(8, "Flat B"))
+
+
+def test_order_history_is_paginated_and_eager_loaded(client, db_session, count_queries):
+    db_session.query(models.OrderItem).delete()
+    db_session.query(models.Order).delete()
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+
+    placed = []
+    for i in range(5):
+        for j in range(i + 1):  # later orders have more items
+            sneaker, _ = create_sneaker_with_size(db_session, name=f"History {i}.{j}", price=5.0)
+            client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+        placed.append(client.post("/orders/checkout").json()["id"])
+
+    seen, page_queries = [], []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        with count_queries() as statements:
+            resp = client.get("/orders/", params=params)
+        assert resp.status_code == 200
+        page_queries.append(len([s for s in statements if "FROM users" not in s]))
+        assert not [s for s in statements if "FROM sneakers" in s]
+        page = resp.json()
+        assert all(item["sneaker"]["name"].startswith("History") for o in page for item in o["items"])
+        seen += [order["id"] for order in page]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == placed[::-1]
+    # orders + their items, whatever the page holds; no sneakers join
+    assert page_queries == [2, 2, 2]
+
+    assert client.get("/orders/", params={"cursor": "garbage"}).status_code == 400
+
+
+def test_order_history_shows_the_sneaker_as_bought(client, db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker, _ = create_sneaker_with_size(db_session, name="Snapshot Original", price=70.0)
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+    order_id = client.post("/orders/checkout").json()["id"]
+
+    sneaker.name = "Snapshot Renamed"
+    sneaker.image_url = "/static/sneakers/new.jpg"
+    db_session.commit()
+
+    order = next(o for o in client.get("/orders/").json() if o["id"] == order_id)
+    assert order["items"][0]["sneaker"] == {
+        "id": sneaker.id,
+        "name": "Snapshot Original",
+        "brand": "Nike",
+        "price": 70.0,
+        "colorway": "Blue/White",
+        "image_url": "http://example.com/cart.jpg",
+    }
+
+
+def test_backfill_fills_items_ordered_before_snapshots(client, db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker, _ = create_sneaker_with_size(db_session, name="Snapshot Backfill")
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+    order_id = client.post("/orders/checkout").json()["id"]
+    # as if placed before the snapshot columns existed
+    db_session.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).update(
+        {"sneaker_name": None, "sneaker_brand": None, "sneaker_colorway": None, "sneaker_image_url": None}
+    )
+    db_session.commit()
+
+    assert backfill_order_snapshots(db_session, batch_size=1) >= 1
+    assert backfill_order_snapshots(db_session) == 0
+
+    item = db_session.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).one()
+    db_session.refresh(item)
+    assert item.sneaker.name == "Snapshot Backfill"
+    assert item.sneaker.colorway == "Blue/White"
@@ -0,0 +1,126 @@
+# backend/tests/test_cart_batch.py
+from backend.app import models
+from backend.app.drop_queue import waiting_room
+from backend.app.inventory import stripe_stocks
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+
+def clear_cart(db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+
+
+def stock_of(db_session, size_row):
+    db_session.refresh(size_row)
+    return size_row.stock
+
+
+def test_batch_applies_add_update_remove_together(client, db_session, count_queries):
+    clear_cart(db_session)
+    keep, keep_size = create_sneaker_with_size(db_session, name="Batch Keep", stock=5, eu_size=42)
+    drop, drop_size = create_sneaker_with_size(db_session, name="Batch Drop", stock=5, eu_size=43)
+    new, new_size = create_sneaker_with_size(db_session, name="Batch New", stock=5, eu_size=44)
+    kept = client.post("/cart/", json={"sneaker_id": keep.id, "quantity": 1, "size": 42}).json()
+    dropped = client.post("/cart/", json={"sneaker_id": drop.id, "quantity": 2, "size": 43}).json()
+
+    operations = [
+        {"op": "update", "item_id": kept["id"], "quantity": 3},
+        {"op": "remove", "item_id": dropped["id"]},
+        {"op": "add", "sneaker_id": new.id, "size": 44, "quantity": 2},
+        {"op": "add", "sneaker_id": new.id, "size": 44, "quantity": 1},
+    ]
+    with count_queries() as statements:
+        resp = client.post("/cart/batch", json={"operations": operations})
+    assert resp.status_code == 200, resp.text
+
+    cart = resp.json()
+    assert [(line["sneaker"]["id"], line["quantity"]) for line in cart] == [
+        (keep.id, 3),
+        (new.id, 3),
+    ]
+    assert client.get("/cart/").json() == cart
+    assert stock_of(db_session, keep_size) == 2
+    assert stock_of(db_session, drop_size) == 5
+    assert stock_of(db_session, new_size) == 2
+
+    # every size's stock moves in one executemany UPDATE
+    updates = [s for s in statements if s.lstrip().upper().startswith("UPDATE SNEAKER_SIZES")]
+    assert len(updates) == 1
+
+
+def test_batch_is_all_or_nothing(client, db_session):
+    clear_cart(db_session)
+    sneaker, size_row = create_sneaker_with_size(db_session, name="Batch Short", stock=2, eu_size=40)
+    other, other_size = create_sneaker_with_size(db_session, name="Batch Fine", stock=2, eu_size=41)
+    line = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 40}).json()
+
+    resp = client.post(
+        "/cart/batch",
+        json={
+            "operations": [
+                {"op": "add", "sneaker_id": other.id, "size": 41, "quantity": 1},
+                {"op": "update", "item_id": line["id"], "quantity": 5},
+            ]
+        },
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Only 2 items available for size 40"
+    assert stock_of(db_session, size_row) == 1
+    assert stock_of(db_session, other_size) == 2
+    assert [item["id"] for item in client.get("/cart/").json()] == [line["id"]]
+
+
+def test_batch_rejects_unknown_items_and_bad_operations(client, db_session):
+    clear_cart(db_session)
+    sneaker, _ = create_sneaker_with_size(db_session, name="Batch Errors", stock=2, eu_size=45)
+
+    unknown_item = client.post(
+        "/cart/batch", json={"operations": [{"op": "remove", "item_id": 999999}]}
+    )
+    assert unknown_item.status_code == 404
+
+    unknown_size = client.post(
+        "/cart/batch",
+        json={"operations": [{"op": "add", "sneaker_id": sneaker.id, "size": 30, "quantity": 1}]},
+    )
+    assert unknown_size.status_code == 400
+
+    missing_fields = client.post("/cart/batch", json={"operations": [{"op": "update", "item_id": 1}]})
+    assert missing_fields.status_code == 422
+    assert client.post("/cart/batch", json={"operations": []}).status_code == 422
+
+
+def test_batch_takes_drop_sizes_from_their_stripes(client, db_session):
+    clear_cart(db_session)
+    sneaker, size_row = create_sneaker_with_size(db_session, name="Batch Striped", stock=6, eu_size=39)
+    assert client.put(f"/sneakers/{sneaker.id}/sizes/39/stripes", json={"stripes": 3}).status_code == 200
+
+    resp = client.post(
+        "/cart/batch",
+        json={"operations": [{"op": "add", "sneaker_id": sneaker.id, "size": 39, "quantity": 4}]},
+    )
+    assert resp.status_code == 200, resp.text
+    assert [line["quantity"] for line in resp.json()] == [4]
+    assert sum(stripe_stocks(db_session, sneaker.id, 39)) == 2
+    assert stock_of(db_session, size_row) == 0
+
+    short = client.post(
+        "/cart/batch",
+        json={"operations": [{"op": "update", "item_id": resp.json()[0]["id"], "quantity": 7}]},
+    )
+    assert short.status_code == 400
+    assert short.json()["detail"] == "Only 6 items available for size 39"
+
+
+def test_batch_refuses_adds_behind_an_open_waiting_room(client, db_session, monkeypatch):
+    clear_cart(db_session)
+    sneaker, size_row = create_sneaker_with_size(db_session, name="Batch Room", stock=3, eu_size=38)
+    monkeypatch.setattr(waiting_room, "is_open", lambda sneaker_id: sneaker_id == sneaker.id)
+
+    resp = client.post(
+        "/cart/batch",
+        json={"operations": [{"op": "add", "sneaker_id": sneaker.id, "size": 38, "quantity": 1}]},
+    )
+    assert resp.status_code == 409
+    assert "waiting room" in resp.json()["detail"]
+    assert stock_of(db_session, size_row) == 3
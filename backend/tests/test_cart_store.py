@@ -0,0 +1,124 @@
+# backend/tests/test_cart_store.py
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Depends
+
+from backend.app import main, models, reservations
+from backend.app.cart_store import InMemoryCartStore, get_cart_store
+from backend.app.database import get_db
+from backend.app.reservations import sweep_expired_reservations
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+
+@pytest.fixture
+def memory_store():
+    store = InMemoryCartStore()
+    main.app.dependency_overrides[get_cart_store] = lambda db=Depends(get_db): store.bind(db)
+    yield store
+    del main.app.dependency_overrides[get_cart_store]
+
+
+def test_memory_store_merges_and_isolates_users():
+    store = InMemoryCartStore()
+    first = store.add(1, sneaker_id=10, size=42, quantity=1, expires_at=None)
+    merged = store.add(1, sneaker_id=10, size=42, quantity=2, expires_at=None)
+    store.add(2, sneaker_id=10, size=42, quantity=5, expires_at=None)
+
+    assert merged.id == first.id and merged.quantity == 3
+    assert [line.quantity for line in store.lines(1)] == [3]
+    assert store.get(2, first.id) is None
+
+    # callers get copies, not the stored lines
+    merged.quantity = 99
+    assert store.get(1, first.id).quantity == 3
+
+    store.set_quantities(1, {first.id: 0}, None)
+    assert store.lines(1) == []
+    assert len(store.lines(2)) == 1
+
+
+def test_cart_and_checkout_through_memory_store(client, db_session, memory_store, count_queries):
+    sneaker, size_row = create_sneaker_with_size(
+        db_session, name="Memory Cart", price=40.0, stock=5, eu_size=43
+    )
+
+    with count_queries() as statements:
+        added = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 2, "size": 43})
+        client.patch(f"/cart/{added.json()['id']}", json={"quantity": 3})
+        cart = client.get("/cart/").json()
+    assert added.status_code == 201
+    assert [(line["sneaker"]["name"], line["quantity"]) for line in cart] == [("Memory Cart", 3)]
+    # stock still lives in the DB, the cart itself never touches it
+    assert not [s for s in statements if "cart_items" in s]
+    db_session.refresh(size_row)
+    assert size_row.stock == 2
+
+    sparse = client.get("/cart/", params={"fields": "quantity,sneaker.name"}).json()
+    assert sparse == [{"quantity": 3, "sneaker": {"name": "Memory Cart"}}]
+
+    order = client.post("/orders/checkout")
+    assert order.status_code == 200
+    assert order.json()["total"] == 120.0
+    assert client.get("/cart/").json() == []
+
+
+def test_sweeper_releases_memory_store_lines(db_session, memory_store):
+    sneaker, size_row = create_sneaker_with_size(db_session, name="Memory Sweep", stock=0, eu_size=39)
+    memory_store.add(1, sneaker.id, 39, 2, datetime.utcnow() - timedelta(minutes=1))
+    memory_store.add(2, sneaker.id, 39, 1, datetime.utcnow() + timedelta(minutes=1))
+
+    assert sweep_expired_reservations(db_session, store=memory_store.bind(db_session)) == (1, 2)
+    db_session.refresh(size_row)
+    assert size_row.stock == 2
+    assert memory_store.lines(1) == [] and len(memory_store.lines(2)) == 1
+
+
+def test_memory_store_changes_follow_the_transaction(db_session):
+    store = InMemoryCartStore()
+    line = store.add(1, sneaker_id=10, size=42, quantity=2, expires_at=None)
+    view = store.bind(db_session)
+
+    view.set_quantities(1, {line.id: 0}, None)
+    view.add(1, sneaker_id=11, size=40, quantity=1, expires_at=None)
+    view.clear(2)
+    db_session.rollback()
+    assert [(kept.sneaker_id, kept.quantity) for kept in store.lines(1)] == [(10, 2)]
+
+    view.set_quantities(1, {line.id: 5}, None)
+    db_session.commit()
+    assert store.lines(1)[0].quantity == 5
+
+
+def test_sweeper_skips_carts_held_by_a_request(db_session, session_factory):
+    store = InMemoryCartStore()
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    line = store.add(1, sneaker_id=10, size=42, quantity=2, expires_at=expired)
+    request_db = session_factory()
+    try:
+        # a PATCH/checkout holds the line, the sweeper must not release it under it
+        assert store.bind(request_db).get(1, line.id) is not None
+        store.bind(request_db).set_quantities(1, {line.id: 3}, expired)
+        assert store.bind(db_session).pop_expired(datetime.utcnow(), 10) == []
+        # others read the cart as last committed
+        assert store.bind(db_session).lines(1)[0].quantity == 2
+        request_db.commit()
+    finally:
+        request_db.close()
+
+    assert [popped.quantity for popped in store.bind(db_session).pop_expired(datetime.utcnow(), 10)] == [3]
+
+
+def test_failed_sweep_puts_the_lines_back(db_session, monkeypatch):
+    sneaker, size_row = create_sneaker_with_size(db_session, name="Memory Undo", stock=0, eu_size=37)
+    store = InMemoryCartStore()
+    store.add(1, sneaker.id, 37, 2, datetime.utcnow() - timedelta(minutes=1))
+    monkeypatch.setattr(reservations, "apply_stock_deltas", lambda db, deltas: False)
+
+    with pytest.raises(RuntimeError):
+        sweep_expired_reservations(db_session, store=store.bind(db_session))
+    db_session.rollback()
+
+    assert [line.quantity for line in store.lines(1)] == [2]
+    db_session.refresh(size_row)
+    assert size_row.stock == 0
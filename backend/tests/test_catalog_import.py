@@ -0,0 +1,196 @@
+# backend/tests/test_catalog_import.py
+import json
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from backend.app import catalog_import, models
+from backend.app.catalog_import import import_catalog
+
+
+def test_import_csv_with_nested_sizes_in_batches(db_session):
+    lines = [
+        "name,brand,price,gender,tag,sizes\n",
+        "Import CSV 1,ImportBrand,99.5,men,csv_import,41:3;42:0\n",
+        "Import CSV 2,ImportBrand,not-a-price,men,csv_import,\n",
+        "Import CSV 3,ImportBrand,120,women,csv_import,38:7\n",
+        "Import CSV 4,ImportBrand,80,,csv_import,\n",
+    ]
+
+    report = import_catalog(db_session, lines, "csv", batch_size=2)
+
+    assert report.imported == 3
+    assert report.failed == 1
+    assert report.errors[0].line == 3
+    assert "price" in report.errors[0].error
+
+    sneakers = (
+        db_session.query(models.Sneaker)
+        .filter(models.Sneaker.tag == "csv_import")
+        .order_by(models.Sneaker.id)
+        .all()
+    )
+    assert [s.name for s in sneakers] == ["Import CSV 1", "Import CSV 3", "Import CSV 4"]
+    assert sorted((size.eu_size, size.stock) for size in sneakers[0].sizes) == [
+        (41, 3),
+        (42, 0),
+    ]
+    assert sneakers[2].gender is None
+
+
+def test_import_ndjson_reports_bad_lines_without_aborting(db_session):
+    good = {
+        "name": "Import NDJSON",
+        "brand": "ImportBrand",
+        "price": 150,
+        "tag": "ndjson_import",
+        "sizes": [{"eu_size": 44, "stock": 2}],
+    }
+    lines = [
+        json.dumps(good) + "\n",
+        "{not json\n",
+        "\n",
+        json.dumps({"name": "Missing brand", "price": 10}) + "\n",
+    ]
+
+    report = import_catalog(db_session, lines, "ndjson")
+
+    assert report.imported == 1
+    assert [error.line for error in report.errors] == [2, 4]
+    sneaker = (
+        db_session.query(models.Sneaker)
+        .filter(models.Sneaker.tag == "ndjson_import")
+        .one()
+    )
+    assert [(size.eu_size, size.stock) for size in sneaker.sizes] == [(44, 2)]
+
+
+def test_sizes_the_availability_mask_cannot_hold_are_rejected(db_session):
+    lines = [
+        "name,brand,price,tag,sizes\n",
+        "Import Kids,ImportBrand,40,size_range_import,15:2\n",
+        "Import Giant,ImportBrand,40,size_range_import,79:1\n",
+        "Import Edges,ImportBrand,40,size_range_import,16:1;78:1\n",
+    ]
+
+    report = import_catalog(db_session, lines, "csv")
+
+    assert report.imported == 1
+    assert [error.line for error in report.errors] == [2, 3]
+    assert all("eu_size" in error.error for error in report.errors)
+    sneaker = db_session.query(models.Sneaker).filter(models.Sneaker.tag == "size_range_import").one()
+    assert sneaker.availability.in_stock_sizes == [16, 78]
+
+
+def test_rejected_batch_is_retried_row_by_row(db_session, monkeypatch):
+    insert_sneakers = catalog_import._insert_sneakers
+
+    def reject_bad_rows(db, rows):
+        if any(row["name"] == "Import Bad" for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("Duplicate entry"))
+        return insert_sneakers(db, rows)
+
+    monkeypatch.setattr(catalog_import, "_insert_sneakers", reject_bad_rows)
+    lines = [
+        "name,brand,price,tag\n",
+        "Import Ok 1,ImportBrand,10,row_retry\n",
+        "Import Bad,ImportBrand,10,row_retry\n",
+        f"{'x' * 256},ImportBrand,10,row_retry\n",
+        "Import Ok 2,ImportBrand,10,row_retry\n",
+    ]
+
+    report = import_catalog(db_session, lines, "csv", batch_size=10)
+
+    assert report.imported == 2
+    # length checks happen while reading, insert failures when the batch is written
+    assert [(error.line, error.error) for error in report.errors] == [
+        (4, "name: at most 255 characters"),
+        (3, "Insert failed: Duplicate entry"),
+    ]
+    names = db_session.query(models.Sneaker.name).filter(models.Sneaker.tag == "row_retry")
+    assert sorted(name for name, in names) == ["Import Ok 1", "Import Ok 2"]
+
+
+def without_returning(monkeypatch, back):
+    """Take the MySQL path on SQLite: LAST_INSERT_ID() is faked from last_insert_rowid()."""
+    monkeypatch.setattr(catalog_import, "_can_return_ids", lambda db: False)
+    monkeypatch.setattr(
+        catalog_import,
+        "_first_inserted_id",
+        lambda db: (db.execute(text("SELECT last_insert_rowid()")).scalar() - back, 1),
+    )
+
+
+MULTI_ROW_LINES = [
+    "name,brand,price,tag,sizes\n",
+    "Import Multi 1,ImportBrand,10,multi_row,40:1\n",
+    "Import Multi 2,ImportBrand,10,multi_row,41:2\n",
+    "Import Multi 3,ImportBrand,10,multi_row,42:3\n",
+]
+
+
+def clear_multi_row(db_session):
+    ids = [id_ for id_, in db_session.query(models.Sneaker.id).filter(models.Sneaker.tag == "multi_row")]
+    db_session.query(models.SneakerSize).filter(models.SneakerSize.sneaker_id.in_(ids)).delete()
+    db_session.query(models.SneakerAvailability).filter(
+        models.SneakerAvailability.sneaker_id.in_(ids)
+    ).delete()
+    db_session.query(models.Sneaker).filter(models.Sneaker.id.in_(ids)).delete()
+    db_session.commit()
+
+
+def multi_row_sizes(db_session):
+    rows = (
+        db_session.query(models.Sneaker.name, models.SneakerSize.eu_size, models.SneakerSize.stock)
+        .join(models.SneakerSize)
+        .filter(models.Sneaker.tag == "multi_row")
+        .order_by(models.Sneaker.name)
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_import_without_returning_uses_one_multi_row_insert(db_session, monkeypatch, count_queries):
+    clear_multi_row(db_session)
+    without_returning(monkeypatch, back=2)
+
+    with count_queries() as statements:
+        report = import_catalog(db_session, MULTI_ROW_LINES, "csv", batch_size=3)
+
+    assert report.imported == 3 and report.failed == 0
+    assert len([s for s in statements if s.lstrip().upper().startswith("INSERT INTO SNEAKERS ")]) == 1
+    assert multi_row_sizes(db_session) == [
+        ("Import Multi 1", 40, 1), ("Import Multi 2", 41, 2), ("Import Multi 3", 42, 3),
+    ]
+
+
+def test_import_without_returning_retries_when_ids_do_not_match(db_session, monkeypatch):
+    clear_multi_row(db_session)
+    # only right for single rows, so the batch of three fails the check
+    without_returning(monkeypatch, back=0)
+
+    report = import_catalog(db_session, MULTI_ROW_LINES, "csv", batch_size=3)
+
+    assert report.imported == 3 and report.failed == 0
+    assert multi_row_sizes(db_session) == [
+        ("Import Multi 1", 40, 1), ("Import Multi 2", 41, 2), ("Import Multi 3", 42, 3),
+    ]
+
+
+def test_import_endpoint_streams_uploaded_file(client):
+    content = "name,brand,price,tag\nUploaded,ImportBrand,70,upload_import\n"
+
+    resp = client.post(
+        "/sneakers/import",
+        files={"file": ("feed.csv", content.encode(), "text/csv")},
+    )
+
+    assert resp.status_code == 200
+    assert resp.json() == {"imported": 1, "failed": 0, "errors": []}
+
+
+def test_import_endpoint_requires_known_format(client):
+    resp = client.post(
+        "/sneakers/import",
+        files={"file": ("feed.txt", b"whatever", "text/plain")},
+    )
+    assert resp.status_code == 400
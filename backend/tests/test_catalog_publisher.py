@@ -0,0 +1,119 @@
+# backend/tests/test_catalog_publisher.py
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend.app import catalog_publisher, models
+from backend.app.catalog_publisher import SnapshotPublisher, publish_catalog, read_manifest
+
+
+def _page(root, manifest, name):
+    relative = manifest["pages"][name].removeprefix("/static/catalog/")
+    with open(os.path.join(root, relative), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def test_publish_writes_hashed_pages_and_manifest(tmp_path, db_session):
+    sneaker = models.Sneaker(
+        name="Snapshot Runner", brand="Snap Brand", price=99.0, gender="women"
+    )
+    db_session.add(sneaker)
+    db_session.commit()
+    db_session.add(models.SneakerSize(sneaker_id=sneaker.id, eu_size=38, stock=2))
+    db_session.commit()
+
+    manifest = publish_catalog(db_session, root=str(tmp_path))
+
+    assert read_manifest(str(tmp_path)) == manifest
+    assert {"all", "men", "women", "brand-snap-brand"} <= set(manifest["pages"])
+    for url in manifest["pages"].values():
+        assert url.startswith(f"/static/catalog/{manifest['version']}/")
+
+    women = _page(tmp_path, manifest, "women")
+    assert all(item["gender"] == "women" for item in women)
+    published = next(item for item in women if item["id"] == sneaker.id)
+    assert published["sizes"][0]["eu_size"] == 38
+    assert [item["id"] for item in _page(tmp_path, manifest, "brand-snap-brand")] == [
+        sneaker.id
+    ]
+
+
+def test_publish_is_noop_when_unchanged_and_swaps_on_change(tmp_path, db_session):
+    first = publish_catalog(db_session, root=str(tmp_path))
+    assert publish_catalog(db_session, root=str(tmp_path)) == first
+
+    db_session.add(models.Sneaker(name="New Drop", brand="Snap Brand", price=10.0))
+    db_session.commit()
+    second = publish_catalog(db_session, root=str(tmp_path))
+
+    assert second["version"] != first["version"]
+    assert read_manifest(str(tmp_path))["version"] == second["version"]
+    # the previous version stays readable for clients holding the old manifest
+    assert os.path.isdir(tmp_path / first["version"])
+    assert not [p for p in os.listdir(tmp_path) if p.startswith(".")]
+
+
+def test_publish_streams_pages_in_batches(tmp_path, db_session):
+    for number in range(3):
+        db_session.add(
+            models.Sneaker(name=f"Streamed {number}", brand="Stream Brand", price=5.0, gender="men")
+        )
+    db_session.commit()
+
+    batched = publish_catalog(db_session, root=str(tmp_path / "batched"), batch_size=2)
+    whole = publish_catalog(db_session, root=str(tmp_path / "whole"), batch_size=10_000)
+
+    assert batched["version"] == whole["version"]
+    assert [item["name"] for item in _page(tmp_path / "batched", batched, "brand-stream-brand")] == [
+        "Streamed 0", "Streamed 1", "Streamed 2",
+    ]
+
+
+def test_publish_keeps_other_publishes_temp_dirs_and_newer_manifests(tmp_path, db_session):
+    in_progress = tmp_path / ".tmp-other-publish"
+    abandoned = tmp_path / ".tmp-crashed-publish"
+    in_progress.mkdir()
+    abandoned.mkdir()
+    long_ago = time.time() - catalog_publisher.STALE_TEMP_SECONDS - 1
+    os.utime(abandoned, (long_ago, long_ago))
+
+    first = publish_catalog(db_session, root=str(tmp_path))
+    assert in_progress.is_dir() and not abandoned.exists()
+
+    # a publish that started before the live manifest was generated leaves it alone
+    later = datetime.now(timezone.utc) + timedelta(minutes=1)
+    newer = {**first, "version": "from-elsewhere", "generated_at": later.isoformat()}
+    with open(tmp_path / "manifest.json", "w", encoding="utf-8") as fh:
+        json.dump(newer, fh)
+    db_session.add(models.Sneaker(name="Late Drop", brand="Snap Brand", price=10.0))
+    db_session.commit()
+    assert publish_catalog(db_session, root=str(tmp_path)) == newer
+
+
+def test_publisher_never_runs_two_publishes_at_once(monkeypatch, session_factory):
+    running = []
+    overlaps = []
+    runs = threading.Semaphore(0)
+
+    def slow_publish(db):
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+        runs.release()
+        return {"version": "v"}
+
+    monkeypatch.setattr(catalog_publisher, "publish_catalog", slow_publish)
+    publisher = SnapshotPublisher(session_factory=session_factory, delay=0.01)
+
+    publisher.request()
+    assert runs.acquire(timeout=0) is False
+    time.sleep(0.03)  # the first publish is running now
+    publisher.request()
+    publisher.request()
+
+    assert runs.acquire(timeout=2) and runs.acquire(timeout=2)
+    time.sleep(0.1)
+    assert overlaps == [1, 1]
@@ -0,0 +1,147 @@
+# backend/tests/test_drop_mode.py
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from backend.app import main, models
+from backend.app.inventory import reserve_stock, stripe_stocks
+from backend.app.routers import auth
+from backend.app.routers.auth import get_current_user
+from backend.tests.test_inventory import availability_of, create_sneaker_with_sizes
+
+THREADS = 16
+ATTEMPTS_PER_THREAD = 6
+STOCK = 25
+
+
+def test_drop_mode_lifecycle(client, db_session):
+    sneaker = create_sneaker_with_sizes(db_session, {42: 10, 43: 1}, name="Drop Cycle")
+
+    resp = client.put(f"/sneakers/{sneaker.id}/sizes/42/stripes", json={"stripes": 4})
+    assert resp.status_code == 200
+    assert resp.json() == {"sneaker_id": sneaker.id, "eu_size": 42, "stock": 10, "stripes": [3, 3, 2, 2]}
+    assert availability_of(client, sneaker.id)["total_stock"] == 11
+
+    # the main row is empty, reservations come out of the stripes
+    for _ in range(3):
+        assert client.post(
+            "/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42}
+        ).status_code == 201
+    assert sum(stripe_stocks(db_session, sneaker.id, 42)) == 7
+
+    rebalanced = client.post(f"/sneakers/{sneaker.id}/sizes/42/stripes/rebalance").json()
+    assert sorted(rebalanced["stripes"]) == [1, 2, 2, 2]
+
+    collapsed = client.delete(f"/sneakers/{sneaker.id}/sizes/42/stripes")
+    assert collapsed.json()["stock"] == 7
+    assert stripe_stocks(db_session, sneaker.id, 42) == []
+    assert availability_of(client, sneaker.id) == {
+        "total_stock": 8,
+        "in_stock_sizes": [42, 43],
+        "sold_out": False,
+    }
+
+
+def test_selling_out_the_stripes_updates_availability(client, db_session):
+    sneaker = create_sneaker_with_sizes(db_session, {44: 2}, name="Drop Sellout")
+    client.put(f"/sneakers/{sneaker.id}/sizes/44/stripes", json={"stripes": 2})
+
+    for _ in range(2):
+        client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 44})
+    assert availability_of(client, sneaker.id)["sold_out"] is True
+
+    resp = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 44})
+    assert resp.status_code == 400
+    # the line already holds both units
+    assert resp.json()["detail"] == "Only 2 items available for size 44"
+
+
+def test_drop_mode_errors(client, db_session):
+    sneaker = create_sneaker_with_sizes(db_session, {40: 3}, name="Drop Errors")
+
+    assert client.put(
+        f"/sneakers/{sneaker.id}/sizes/41/stripes", json={"stripes": 2}
+    ).status_code == 404
+    assert client.put(
+        f"/sneakers/{sneaker.id}/sizes/40/stripes", json={"stripes": 1}
+    ).status_code == 422
+    assert client.post(
+        f"/sneakers/{sneaker.id}/sizes/40/stripes/rebalance"
+    ).status_code == 400
+
+
+def test_concurrent_drop_reservations_never_oversell(client, db_session, session_factory):
+    sneaker = create_sneaker_with_sizes(db_session, {42: STOCK}, name="Drop Contended")
+    sneaker_id = sneaker.id
+    client.put(f"/sneakers/{sneaker_id}/sizes/42/stripes", json={"stripes": 4})
+
+    successes = []
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        for _ in range(ATTEMPTS_PER_THREAD):
+            db = session_factory()
+            try:
+                won = reserve_stock(db, sneaker_id, 42, 1)
+                db.commit()
+                if won:
+                    successes.append(1)
+            except OperationalError:  # SQLite lock timeout, not an oversell
+                db.rollback()
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    left = stripe_stocks(db_session, sneaker_id, 42)
+    main_row = (
+        db_session.query(models.SneakerSize.stock)
+        .filter(models.SneakerSize.sneaker_id == sneaker_id)
+        .scalar()
+    )
+    assert main_row == 0 and min(left) >= 0
+    assert len(successes) == STOCK - sum(left)
+
+
+def test_reservation_bigger_than_any_stripe_is_split(client, db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker = create_sneaker_with_sizes(db_session, {42: 10}, name="Drop Split")
+    client.put(f"/sneakers/{sneaker.id}/sizes/42/stripes", json={"stripes": 4})  # [3, 3, 2, 2]
+
+    resp = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 4, "size": 42})
+    assert resp.status_code == 201
+    assert sum(stripe_stocks(db_session, sneaker.id, 42)) == 6
+
+    # more than all stripes together: nothing is taken
+    assert not reserve_stock(db_session, sneaker.id, 42, 7)
+    db_session.rollback()
+    assert sum(stripe_stocks(db_session, sneaker.id, 42)) == 6
+
+    assert reserve_stock(db_session, sneaker.id, 42, 6)
+    db_session.commit()
+    assert stripe_stocks(db_session, sneaker.id, 42) == [0, 0, 0, 0]
+    assert availability_of(client, sneaker.id)["sold_out"] is True
+
+
+def test_drop_controls_need_a_login(client, db_session, monkeypatch):
+    monkeypatch.delitem(main.app.dependency_overrides, get_current_user)
+    sneaker = create_sneaker_with_sizes(db_session, {42: 4}, name="Drop Locked")
+    assert client.put(f"/sneakers/{sneaker.id}/sizes/42/stripes", json={"stripes": 2}).status_code == 401
+    assert client.delete(f"/sneakers/{sneaker.id}/sizes/42/stripes").status_code == 401
+    assert client.put(f"/sneakers/{sneaker.id}/waiting-room").status_code == 401
+    assert stripe_stocks(db_session, sneaker.id, 42) == []
+
+
+def test_drop_controls_are_admin_only(client, db_session, monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_EMAILS", frozenset({"boss@example.com"}))
+    sneaker = create_sneaker_with_sizes(db_session, {42: 4}, name="Drop Staff Only")
+    assert client.put(f"/sneakers/{sneaker.id}/sizes/42/stripes", json={"stripes": 2}).status_code == 403
+    assert client.get(f"/sneakers/{sneaker.id}/waiting-room").status_code == 403
+    assert client.put(f"/sneakers/{sneaker.id}/waiting-room").status_code == 403
+    assert stripe_stocks(db_session, sneaker.id, 42) == []
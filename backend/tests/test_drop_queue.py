@@ -0,0 +1,75 @@
+# backend/tests/test_drop_queue.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from backend.app import main, models
+from backend.app.drop_queue import WaitingRoom, waiting_room
+from backend.tests.test_inventory import create_sneaker_with_sizes
+
+
+def stock_of(db_session, sneaker_id, eu_size):
+    return (
+        db_session.query(models.SneakerSize.stock)
+        .filter(
+            models.SneakerSize.sneaker_id == sneaker_id,
+            models.SneakerSize.eu_size == eu_size,
+        )
+        .scalar()
+    )
+
+
+def test_queue_grants_in_arrival_order_and_refuses_once_sold_out(db_session, session_factory):
+    sneaker = create_sneaker_with_sizes(db_session, {42: 5}, name="Queued Drop")
+    room = WaitingRoom(session_factory)
+
+    async def drop():
+        await room.open(sneaker.id)
+        # all arrive within one batch window
+        first = await asyncio.gather(
+            *(room.reserve(sneaker.id, 42, quantity) for quantity in (3, 3, 2))
+        )
+        batches = room.stats(sneaker.id).batches
+        late = await room.reserve(sneaker.id, 42, 1)
+        stats = await room.close(sneaker.id)
+        return first, batches, late, stats
+
+    first, batches, late, stats = asyncio.run(drop())
+    # the second ask doesn't fit, the smaller third one still does
+    assert first == [True, False, True]
+    assert batches == 1
+    # sold out: answered without another batch
+    assert late is False
+    assert stats.batches == 1 and stats.granted == 2 and stats.rejected == 2
+    assert stats.open is False
+    assert stock_of(db_session, sneaker.id, 42) == 0
+
+
+def test_cart_requests_go_through_an_open_waiting_room(db_session, session_factory, monkeypatch):
+    monkeypatch.setattr(waiting_room, "session_factory", session_factory)
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker = create_sneaker_with_sizes(db_session, {43: 5}, name="Room Drop")
+
+    # one app event loop for the whole test, so the consumer task survives
+    with TestClient(main.app) as client:
+        assert client.put(f"/sneakers/{sneaker.id}/waiting-room").json()["open"] is True
+        client.get("/cart/")  # the test user gets created once, up front
+
+        def buy(_):
+            return client.post(
+                "/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 43}
+            ).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(buy, range(12)))
+
+        stats = client.delete(f"/sneakers/{sneaker.id}/waiting-room").json()
+        cart = client.get("/cart/").json()
+
+    assert sorted(statuses) == [201] * 5 + [400] * 7
+    assert stats["granted"] == 5 and stats["open"] is False
+    assert stock_of(db_session, sneaker.id, 43) == 0
+    # every granted unit ended up in the (single test user's) cart
+    assert sum(line["quantity"] for line in cart) == 5
@@ -0,0 +1,115 @@
+# backend/tests/test_fields.py
+from backend.app import models, schemas
+from backend.app.fields import parse_fields
+from backend.app.inventory import refresh_availability
+
+
+def create_sneaker_with_size(db_session, name="Sparse Sneaker", price=110.0):
+    sneaker = models.Sneaker(
+        name=name,
+        brand="SparseBrand",
+        price=price,
+        image_url="http://example.com/sparse.jpg",
+        description="x" * 1500,
+    )
+    db_session.add(sneaker)
+    db_session.commit()
+    db_session.add(models.SneakerSize(sneaker_id=sneaker.id, eu_size=42, stock=10))
+    db_session.commit()
+    return sneaker
+
+
+def test_parse_fields_builds_nested_spec():
+    spec = parse_fields("id, quantity,sneaker.name,sneaker.price", schemas.CartItemRead)
+    assert spec == {"id": True, "quantity": True, "sneaker": {"name": True, "price": True}}
+    assert parse_fields(None, schemas.CartItemRead) is None
+    assert parse_fields("items.sneaker.name", schemas.OrderRead) == {
+        "items": {"sneaker": {"name": True}}
+    }
+
+
+def test_unknown_field_returns_400(client):
+    resp = client.get("/sneakers/", params={"fields": "id,nope"})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Unknown field: nope"
+
+
+def test_sneaker_list_fields_narrow_payload_and_columns(client, db_session, count_queries):
+    sneaker = create_sneaker_with_size(db_session)
+
+    with count_queries() as statements:
+        resp = client.get(
+            "/sneakers/",
+            params={"fields": "id,name,price,image_url", "brand": "SparseBrand"},
+        )
+
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {
+            "id": sneaker.id,
+            "name": "Sparse Sneaker",
+            "price": 110.0,
+            "image_url": "http://example.com/sparse.jpg",
+        }
+    ]
+    # a single query, no sizes, no description column
+    assert len(statements) == 1
+    assert "description" not in statements[0]
+
+
+def test_derived_nested_fields_load_in_one_query(client, db_session, count_queries):
+    sneakers = [create_sneaker_with_size(db_session, name=f"Sparse Derived {n}") for n in range(4)]
+    refresh_availability(db_session, [sneaker.id for sneaker in sneakers])
+    db_session.commit()
+    ids = ",".join(str(sneaker.id) for sneaker in sneakers)
+
+    counts = {}
+    for fields in ("availability", "availability.sold_out,availability.in_stock_sizes"):
+        with count_queries() as statements:
+            resp = client.get("/sneakers/batch", params={"ids": ids, "fields": fields})
+        assert resp.status_code == 200
+        assert all(item["availability"]["sold_out"] is False for item in resp.json()["items"])
+        counts[fields] = len(statements)
+    # derived properties don't turn into a lazy load per sneaker
+    assert counts["availability.sold_out,availability.in_stock_sizes"] == counts["availability"]
+
+
+def test_get_sneaker_fields_with_sizes(client, db_session):
+    sneaker = create_sneaker_with_size(db_session)
+
+    resp = client.get(f"/sneakers/{sneaker.id}", params={"fields": "name,sizes"})
+    data = resp.json()
+    assert set(data) == {"name", "sizes"}
+    assert data["sizes"][0]["eu_size"] == 42
+
+
+def test_cart_fields(client, db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker = create_sneaker_with_size(db_session, name="Sparse Cart")
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 2, "size": 42})
+
+    resp = client.get("/cart/", params={"fields": "quantity,sneaker.name,sneaker.price"})
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {"quantity": 2, "sneaker": {"name": "Sparse Cart", "price": 110.0}}
+    ]
+
+
+def test_order_fields(client, db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker = create_sneaker_with_size(db_session, name="Sparse Order", price=30.0)
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+    order_id = client.post("/orders/checkout").json()["id"]
+
+    resp = client.get(
+        "/orders/", params={"fields": "id,total,items.quantity,items.sneaker.name"}
+    )
+    assert resp.status_code == 200
+    order = next(o for o in resp.json() if o["id"] == order_id)
+    assert order == {
+        "id": order_id,
+        "total": 30.0,
+        "items": [{"quantity": 1, "sneaker": {"name": "Sparse Order"}}],
+    }
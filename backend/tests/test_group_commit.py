@@ -0,0 +1,154 @@
+# backend/tests/test_group_commit.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import Header
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from backend.app import main, models
+from backend.app.group_commit import GroupCommitter, checkout_group
+from backend.app.routers.auth import get_current_user
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+
+def add_event(topic):
+    def work(db):
+        db.add(models.OutboxEvent(topic=topic, payload="{}"))
+        db.flush()
+        if topic.startswith("bad"):
+            raise ValueError(topic)
+        return topic
+    return work
+
+
+def topics(db_session):
+    db_session.expire_all()
+    return sorted(topic for (topic,) in db_session.query(models.OutboxEvent.topic))
+
+
+def test_one_failing_unit_does_not_fail_its_group(db_session, session_factory):
+    db_session.query(models.OutboxEvent).delete()
+    db_session.commit()
+    group = GroupCommitter(window_ms=20, session_factory=session_factory)
+
+    async def run():
+        results = await asyncio.gather(
+            *(group.submit(add_event(topic)) for topic in ("good-1", "bad-2", "good-3")),
+            return_exceptions=True,
+        )
+        await group.close()
+        return results
+
+    first, bad, third = asyncio.run(run())
+    assert (first, third) == ("good-1", "good-3")
+    assert isinstance(bad, ValueError)
+    assert group.groups == 1 and group.units == 3
+    # the failed unit's insert went with its savepoint
+    assert topics(db_session) == ["good-1", "good-3"]
+
+
+def failing_first_commit(session_factory, error):
+    sessions = []
+
+    def factory():
+        db = session_factory()
+        if not sessions:
+            def broken_commit():
+                raise error
+            db.commit = broken_commit
+        sessions.append(db)
+        return db
+
+    return factory
+
+
+def test_rolled_back_group_falls_back_to_one_transaction_each(db_session, session_factory):
+    db_session.query(models.OutboxEvent).delete()
+    db_session.commit()
+    deadlock = OperationalError("COMMIT", {}, Exception(1213, "Deadlock found"))
+    group = GroupCommitter(window_ms=20, session_factory=failing_first_commit(session_factory, deadlock))
+
+    async def run():
+        results = await asyncio.gather(
+            *(group.submit(add_event(topic)) for topic in ("alone-1", "bad-2", "alone-3")),
+            return_exceptions=True,
+        )
+        await group.close()
+        return results
+
+    first, bad, third = asyncio.run(run())
+    assert (first, third) == ("alone-1", "alone-3")
+    assert isinstance(bad, ValueError)
+    assert group.fallbacks == 1
+    assert topics(db_session) == ["alone-1", "alone-3"]
+
+
+def test_other_commit_errors_are_not_retried(db_session, session_factory):
+    db_session.query(models.OutboxEvent).delete()
+    db_session.commit()
+    lost = OperationalError("COMMIT", {}, Exception(2013, "Lost connection to MySQL server"))
+    group = GroupCommitter(window_ms=20, session_factory=failing_first_commit(session_factory, lost))
+
+    async def run():
+        results = await asyncio.gather(
+            *(group.submit(add_event(topic)) for topic in ("maybe-1", "bad-2")),
+            return_exceptions=True,
+        )
+        await group.close()
+        return results
+
+    first, bad = asyncio.run(run())
+    # the outcome of the commit is unknown: reported, not re-run
+    assert first is lost
+    assert isinstance(bad, ValueError)
+    assert group.fallbacks == 0
+    assert topics(db_session) == []
+
+
+def test_concurrent_checkouts_share_a_commit(db_session, session_factory, monkeypatch):
+    # the lifespan's jobs are off and on the test DB (conftest)
+    monkeypatch.setattr(checkout_group, "window_ms", 50)
+    monkeypatch.setattr(checkout_group, "session_factory", session_factory)
+    monkeypatch.setattr(checkout_group, "groups", 0)
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+
+    users = {}
+    for n in range(5):
+        user = models.User(email=f"group{n}@example.com", hashed_password="x", full_name=f"Group {n}")
+        db_session.add(user)
+        db_session.commit()
+        db_session.refresh(user)
+        db_session.expunge(user)
+        users[str(n)] = user
+
+    def user_from_header(x_test_user: str = Header(...)):
+        return users[x_test_user]
+
+    monkeypatch.setitem(main.app.dependency_overrides, get_current_user, user_from_header)
+
+    with TestClient(main.app) as client:
+        for n in "0123":  # user 4 checks out an empty cart
+            sneaker, _ = create_sneaker_with_size(db_session, name=f"Group Cart {n}", price=10.0)
+            client.post(
+                "/cart/",
+                json={"sneaker_id": sneaker.id, "quantity": 2, "size": 42},
+                headers={"X-Test-User": n},
+            )
+
+        def checkout(n):
+            return client.post("/orders/checkout", headers={"X-Test-User": n})
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(checkout, "01234"))
+
+    assert [resp.status_code for resp in responses] == [200, 200, 200, 200, 400]
+    assert responses[4].json()["detail"] == "Cart is empty"
+    assert all(resp.json()["total"] == 20.0 for resp in responses[:4])
+    assert checkout_group.groups < 4
+    for n, resp in zip("0123", responses):
+        order = db_session.get(models.Order, resp.json()["id"])
+        assert order.user_id == users[n].id
+    user_ids = [user.id for user in users.values()]
+    assert db_session.query(models.CartItem).filter(models.CartItem.user_id.in_(user_ids)).count() == 0
@@ -0,0 +1,156 @@
+# backend/tests/test_idempotency.py
+import json
+import threading
+
+import pytest
+from fastapi import HTTPException
+import time
+from datetime import datetime, timedelta
+
+from backend.app import idempotency, models
+from backend.app.idempotency import complete_key, purge_expired_keys, replay_or_claim
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+
+def clear_cart(db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.query(models.IdempotencyKey).delete()
+    db_session.commit()
+
+
+def add_to_cart(client, db_session, name, stock=5):
+    sneaker, size_row = create_sneaker_with_size(db_session, name=name, stock=stock)
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+    return sneaker, size_row
+
+
+def test_retry_gets_the_stored_order_without_running_again(client, db_session):
+    clear_cart(db_session)
+    add_to_cart(client, db_session, "Idem First")
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/orders/checkout", headers=headers)
+    assert first.status_code == 200
+
+    # a new cart line must not be picked up by the replay
+    _, size_row = add_to_cart(client, db_session, "Idem Later")
+    replay = client.post("/orders/checkout", headers=headers)
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+    assert db_session.query(models.Order).filter(models.Order.id == first.json()["id"]).count() == 1
+    assert [line["sneaker"]["name"] for line in client.get("/cart/").json()] == ["Idem Later"]
+    db_session.refresh(size_row)
+    assert size_row.stock == 4
+
+
+def test_failed_request_frees_the_key(client, db_session):
+    clear_cart(db_session)
+    headers = {"Idempotency-Key": "retry-after-failure"}
+
+    assert client.post("/orders/checkout", headers=headers).status_code == 400
+    add_to_cart(client, db_session, "Idem Retry")
+    resp = client.post("/orders/checkout", headers=headers)
+    assert resp.status_code == 200
+    assert "Idempotent-Replayed" not in resp.headers
+
+
+def test_duplicate_waits_for_the_in_flight_request(client, db_session, monkeypatch):
+    clear_cart(db_session)
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL_SECONDS", 0.01)
+    client.get("/cart/")  # makes sure the test user exists
+    user = db_session.query(models.User).filter(models.User.email == "test@example.com").first()
+    db_session.add(
+        models.IdempotencyKey(
+            user_id=user.id,
+            key="in-flight",
+            status="pending",
+            expires_at=datetime.utcnow() + timedelta(hours=1),
+        )
+    )
+    db_session.commit()
+
+    stored = {"id": -1, "total": 0.0, "created_at": "2026-01-01T00:00:00", "items": []}
+
+    def finish_first_request():
+        time.sleep(0.2)
+        db_session.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.key == "in-flight"
+        ).update({"status": "done", "status_code": 200, "response_body": json.dumps(stored)})
+        db_session.commit()
+
+    finisher = threading.Thread(target=finish_first_request)
+    finisher.start()
+    resp = client.post("/orders/checkout", headers={"Idempotency-Key": "in-flight"})
+    finisher.join()
+
+    assert resp.status_code == 200
+    assert resp.json() == stored
+
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+    db_session.query(models.IdempotencyKey).update({"status": "pending"})
+    db_session.commit()
+    stuck = client.post("/orders/checkout", headers={"Idempotency-Key": "in-flight"})
+    assert stuck.status_code == 409
+
+
+def test_abandoned_claim_is_taken_over_after_its_lease(client, db_session, monkeypatch):
+    clear_cart(db_session)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+    add_to_cart(client, db_session, "Idem Takeover")
+    user = db_session.query(models.User).filter(models.User.email == "test@example.com").first()
+    # the first request claimed the key and died without finishing or freeing it
+    db_session.add(
+        models.IdempotencyKey(
+            user_id=user.id,
+            key="crashed",
+            status="pending",
+            created_at=datetime.utcnow() - timedelta(seconds=idempotency.IDEMPOTENCY_LEASE_SECONDS + 1),
+            expires_at=datetime.utcnow() + timedelta(hours=1),
+        )
+    )
+    db_session.commit()
+
+    resp = client.post("/orders/checkout", headers={"Idempotency-Key": "crashed"})
+    assert resp.status_code == 200
+    assert "Idempotent-Replayed" not in resp.headers
+    replay = client.post("/orders/checkout", headers={"Idempotency-Key": "crashed"})
+    assert replay.json() == resp.json()
+
+
+def test_late_owner_cannot_complete_a_taken_over_claim(client, db_session, monkeypatch):
+    clear_cart(db_session)
+    client.get("/cart/")  # makes sure the test user exists
+    user = db_session.query(models.User).filter(models.User.email == "test@example.com").first()
+    stale = replay_or_claim(db_session, user.id, "slow")
+
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE_SECONDS", 0)
+    fresh = replay_or_claim(db_session, user.id, "slow")
+    assert fresh.token != stale.token
+
+    with pytest.raises(HTTPException) as raised:
+        complete_key(db_session, stale, {"id": -1})
+    assert raised.value.status_code == 409
+    db_session.rollback()
+
+    complete_key(db_session, fresh, {"id": 1})
+    db_session.commit()
+    row = db_session.query(models.IdempotencyKey).filter(models.IdempotencyKey.key == "slow").one()
+    assert json.loads(row.response_body) == {"id": 1}
+
+
+def test_expired_keys_are_purged(client, db_session):
+    clear_cart(db_session)
+    client.get("/cart/")  # makes sure the test user exists
+    user = db_session.query(models.User).filter(models.User.email == "test@example.com").first()
+    db_session.add(
+        models.IdempotencyKey(
+            user_id=user.id,
+            key="old",
+            status="done",
+            expires_at=datetime.utcnow() - timedelta(seconds=1),
+        )
+    )
+    db_session.commit()
+    assert purge_expired_keys(db_session) == 1
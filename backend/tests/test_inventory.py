@@ -0,0 +1,137 @@
+# backend/tests/test_inventory.py
+from backend.app import models
+from backend.app.inventory import rebuild_availability, refresh_availability, reserve_stock
+from backend.app.seed_sizes import seed_default_sizes
+
+
+def create_sneaker_with_sizes(db_session, stocks: dict[int, int], name="Inventory Sneaker"):
+    sneaker = models.Sneaker(name=name, brand="InvBrand", price=90.0, gender="men")
+    db_session.add(sneaker)
+    db_session.commit()
+    for eu_size, stock in stocks.items():
+        db_session.add(models.SneakerSize(sneaker_id=sneaker.id, eu_size=eu_size, stock=stock))
+    db_session.commit()
+    return sneaker
+
+
+def availability_of(client, sneaker_id):
+    resp = client.get(f"/sneakers/{sneaker_id}")
+    assert resp.status_code == 200
+    return resp.json()["availability"]
+
+
+def test_created_sneaker_starts_sold_out(client):
+    resp = client.post(
+        "/sneakers/", json={"name": "Fresh", "brand": "InvBrand", "price": 10.0}
+    )
+    assert resp.json()["availability"] == {
+        "total_stock": 0,
+        "in_stock_sizes": [],
+        "sold_out": True,
+    }
+
+
+def test_seeded_sizes_show_up_in_availability(client, db_session):
+    sneaker_id = client.post(
+        "/sneakers/", json={"name": "Seeded", "brand": "InvBrand", "price": 10.0, "gender": "men"}
+    ).json()["id"]
+    assert seed_default_sizes(db_session, [sneaker_id]) == 6
+    client.post("/cart/", json={"sneaker_id": sneaker_id, "quantity": 1, "size": 42})
+
+    assert availability_of(client, sneaker_id) == {
+        "total_stock": 59,
+        "in_stock_sizes": [41, 42, 43, 44, 45, 46],
+        "sold_out": False,
+    }
+
+
+def test_cart_changes_keep_availability_in_step(client, db_session):
+    sneaker = create_sneaker_with_sizes(db_session, {41: 1, 42: 2})
+    refresh_availability(db_session, [sneaker.id])
+    db_session.commit()
+    assert availability_of(client, sneaker.id) == {
+        "total_stock": 3,
+        "in_stock_sizes": [41, 42],
+        "sold_out": False,
+    }
+
+    first = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 41})
+    assert first.status_code == 201
+    assert availability_of(client, sneaker.id)["in_stock_sizes"] == [42]
+
+    second = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 2, "size": 42})
+    assert availability_of(client, sneaker.id) == {
+        "total_stock": 0,
+        "in_stock_sizes": [],
+        "sold_out": True,
+    }
+
+    client.patch(f"/cart/{second.json()['id']}", json={"quantity": 1})
+    assert availability_of(client, sneaker.id)["in_stock_sizes"] == [42]
+
+    client.delete(f"/cart/{first.json()['id']}")
+    assert availability_of(client, sneaker.id) == {
+        "total_stock": 2,
+        "in_stock_sizes": [41, 42],
+        "sold_out": False,
+    }
+
+
+def test_summary_is_created_on_first_stock_change(client, db_session):
+    sneaker = create_sneaker_with_sizes(db_session, {43: 2})
+    assert availability_of(client, sneaker.id) is None
+
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 43})
+    assert availability_of(client, sneaker.id)["total_stock"] == 1
+
+
+def test_summary_is_refreshed_after_the_reservation_commits(client, db_session, session_factory, count_queries):
+    sneaker_id = create_sneaker_with_sizes(db_session, {41: 2, 42: 1}).id
+    refresh_availability(db_session, [sneaker_id])
+    db_session.commit()
+
+    db = session_factory()
+    try:
+        with count_queries() as statements:
+            assert reserve_stock(db, sneaker_id, 42, 1)
+        # the reservation transaction leaves the shared summary row alone
+        assert not [statement for statement in statements if "sneaker_availability" in statement]
+        db.commit()
+    finally:
+        db.close()
+    assert availability_of(client, sneaker_id) == {
+        "total_stock": 2,
+        "in_stock_sizes": [41],
+        "sold_out": False,
+    }
+
+
+def test_rolled_back_reservation_leaves_the_summary_alone(client, db_session, session_factory, count_queries):
+    sneaker_id = create_sneaker_with_sizes(db_session, {41: 2}).id
+    refresh_availability(db_session, [sneaker_id])
+    db_session.commit()
+
+    db = session_factory()
+    try:
+        assert reserve_stock(db, sneaker_id, 41, 2)
+        with count_queries() as statements:
+            db.rollback()
+            db.commit()  # nothing left to refresh
+    finally:
+        db.close()
+    assert not [statement for statement in statements if "sneaker_availability" in statement]
+    assert availability_of(client, sneaker_id)["in_stock_sizes"] == [41]
+
+
+def test_in_stock_filter_and_rebuild(client, db_session):
+    in_stock = create_sneaker_with_sizes(db_session, {40: 1}, name="Avail Yes")
+    sold_out = create_sneaker_with_sizes(db_session, {40: 0}, name="Avail No")
+    assert rebuild_availability(db_session, batch_size=2) >= 2
+
+    resp = client.get("/sneakers/", params={"brand": "InvBrand", "in_stock": True, "limit": 500})
+    ids = {item["id"] for item in resp.json()}
+    assert in_stock.id in ids and sold_out.id not in ids
+
+    resp = client.get("/sneakers/", params={"brand": "InvBrand", "in_stock": False, "limit": 500})
+    ids = {item["id"] for item in resp.json()}
+    assert sold_out.id in ids and in_stock.id not in ids
@@ -0,0 +1,56 @@
+# backend/tests/test_inventory_concurrency.py
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from backend.app import models
+from backend.app.inventory import reserve_stock
+
+THREADS = 16
+ATTEMPTS_PER_THREAD = 6
+STOCK = 25
+
+
+def test_concurrent_reservations_never_oversell(db_session, session_factory):
+    sneaker = models.Sneaker(name="Contended", brand="Hype", price=200.0)
+    db_session.add(sneaker)
+    db_session.commit()
+    size_row = models.SneakerSize(sneaker_id=sneaker.id, eu_size=42, stock=STOCK)
+    db_session.add(size_row)
+    db_session.commit()
+    sneaker_id = sneaker.id
+
+    successes = []
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        for _ in range(ATTEMPTS_PER_THREAD):
+            db = session_factory()
+            try:
+                won = reserve_stock(db, sneaker_id, 42, 1)
+                db.commit()
+                if won:
+                    successes.append(1)
+            except OperationalError as exc:  # SQLite lock timeout, not an oversell
+                db.rollback()
+                errors.append(exc)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stock = (
+        db_session.query(models.SneakerSize.stock)
+        .filter(models.SneakerSize.sneaker_id == sneaker_id)
+        .scalar()
+    )
+    assert stock >= 0
+    assert len(successes) == STOCK - stock
+    # enough attempts got through to drain the size completely
+    assert stock == 0
@@ -1,6 +1,54 @@
 # backend/tests/test_main.py
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.app import database, main
 
 def test_read_root(client):
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_cors_exposes_the_pagination_cursor(client):
+    response = client.get("/", headers={"Origin": "http://localhost:5173"})
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+
+def test_background_jobs_with_zero_interval_are_off(monkeypatch):
+    started = []
+
+    def start_periodic(name, *args):
+        started.append(name)
+        return asyncio.create_task(asyncio.sleep(0))
+
+    monkeypatch.setattr(main, "start_periodic", start_periodic)
+    monkeypatch.setattr(main, "warm_search_index", lambda: None)
+    monkeypatch.setattr(main, "CART_SWEEP_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(main, "SALES_ROLLUP_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(main, "PURGE_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(main, "OUTBOX_PURGE_INTERVAL_SECONDS", 0)
+    with TestClient(main.app):
+        pass
+    assert started == []
+
+    monkeypatch.setattr(main, "PURGE_INTERVAL_SECONDS", 60)
+    with TestClient(main.app):
+        pass
+    assert started == ["idempotency-key-purge"]
+
+    started.clear()
+    monkeypatch.setattr(main, "PURGE_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(main, "OUTBOX_PURGE_INTERVAL_SECONDS", 60)
+    with TestClient(main.app):
+        pass
+    assert started == ["outbox-event-purge"]
+
+
+def test_background_sessions_use_the_test_database():
+    db = database.SessionLocal()
+    try:
+        assert db.get_bind().dialect.name == "sqlite"
+    finally:
+        db.close()
@@ -0,0 +1,152 @@
+# backend/tests/test_outbox.py
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from backend.app import models
+from backend.app.outbox import FileSink, OutboxWorker, enqueue, purge_delivered_events
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+
+def clear_outbox(db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.query(models.OutboxEvent).delete()
+    db_session.commit()
+
+
+def test_checkout_writes_an_order_created_event(client, db_session):
+    clear_outbox(db_session)
+    sneaker, _ = create_sneaker_with_size(db_session, name="Outbox Checkout", stock=3)
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+
+    order = client.post("/orders/checkout").json()
+
+    events = db_session.query(models.OutboxEvent).all()
+    assert [event.topic for event in events] == ["order.created"]
+    assert events[0].status == "pending"
+    assert json.loads(events[0].payload)["order"] == order
+
+
+def test_failed_checkout_writes_no_event(client, db_session):
+    clear_outbox(db_session)
+    assert client.post("/orders/checkout").status_code == 400
+    assert db_session.query(models.OutboxEvent).count() == 0
+
+
+def test_worker_delivers_to_the_file_sink(client, db_session, session_factory, tmp_path):
+    clear_outbox(db_session)
+    sneaker, _ = create_sneaker_with_size(db_session, name="Outbox Sink", stock=3)
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42})
+    order = client.post("/orders/checkout").json()
+
+    sink = tmp_path / "events.ndjson"
+    worker = OutboxWorker(session_factory, {"order.created": [FileSink(str(sink))]})
+    assert asyncio.run(worker.run_once()) == 1
+    assert asyncio.run(worker.run_once()) == 0  # nothing left to claim
+
+    delivered = [json.loads(line) for line in sink.read_text().splitlines()]
+    assert [event["payload"]["order"]["id"] for event in delivered] == [order["id"]]
+    event = db_session.query(models.OutboxEvent).one()
+    db_session.refresh(event)
+    assert event.status == "done"
+    assert event.attempts == 1
+
+
+def test_failures_are_retried_with_backoff_then_given_up(db_session, session_factory):
+    clear_outbox(db_session)
+    enqueue(db_session, "flaky", {"n": 1})
+    db_session.commit()
+    calls = []
+
+    def flaky(event):
+        calls.append(event["id"])
+        if len(calls) < 3:
+            raise RuntimeError("downstream unavailable")
+
+    worker = OutboxWorker(session_factory, {"flaky": [flaky]}, max_attempts=3)
+    asyncio.run(worker.run_once())
+    event = db_session.query(models.OutboxEvent).one()
+    assert event.status == "pending"
+    assert event.attempts == 1
+    assert event.available_at > datetime.utcnow()
+    assert "downstream unavailable" in event.last_error
+
+    # not due yet
+    assert asyncio.run(worker.run_once()) == 0
+    later = datetime.utcnow() + timedelta(hours=1)
+    asyncio.run(worker.run_once(now=later))
+    asyncio.run(worker.run_once(now=later + timedelta(hours=1)))
+    db_session.refresh(event)
+    assert event.status == "done"
+    assert event.attempts == 3
+    assert len(calls) == 3
+
+    enqueue(db_session, "broken", {})
+    db_session.commit()
+    worker = OutboxWorker(session_factory, {"broken": [lambda event: 1 / 0]}, max_attempts=1)
+    asyncio.run(worker.run_once())
+    broken = db_session.query(models.OutboxEvent).filter(models.OutboxEvent.topic == "broken").one()
+    assert broken.status == "failed"
+
+
+def test_handlers_run_with_bounded_concurrency(db_session, session_factory):
+    clear_outbox(db_session)
+    for n in range(6):
+        enqueue(db_session, "slow", {"n": n})
+    db_session.commit()
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow(event):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    worker = OutboxWorker(session_factory, {"slow": [slow]}, concurrency=2)
+    assert asyncio.run(worker.run_once()) == 6
+    assert peak == 2
+    assert db_session.query(models.OutboxEvent).filter(models.OutboxEvent.status == "done").count() == 6
+
+
+def test_expired_lease_is_claimed_again(db_session, session_factory):
+    clear_outbox(db_session)
+    db_session.add(models.OutboxEvent(
+        topic="stuck",
+        payload="{}",
+        status="processing",
+        attempts=1,
+        locked_until=datetime.utcnow() - timedelta(seconds=1),
+    ))
+    db_session.commit()
+    delivered = []
+    worker = OutboxWorker(session_factory, {"stuck": [delivered.append]})
+    assert asyncio.run(worker.run_once()) == 1
+    assert len(delivered) == 1
+
+
+def test_delivered_events_are_purged_after_the_retention_period(db_session):
+    clear_outbox(db_session)
+    now = datetime.utcnow()
+    long_ago = now - timedelta(days=30)
+    for topic, status, processed_at in [
+        ("old-1", "done", long_ago),
+        ("old-2", "done", long_ago),
+        ("old-3", "done", long_ago),
+        ("recent", "done", now - timedelta(minutes=5)),
+        ("gave-up", "failed", None),
+        ("waiting", "pending", None),
+    ]:
+        db_session.add(models.OutboxEvent(topic=topic, payload="{}", status=status, processed_at=processed_at))
+    db_session.commit()
+
+    assert purge_delivered_events(db_session, now=now, batch_size=2) == 3
+    assert purge_delivered_events(db_session, now=now) == 0
+    remaining = sorted(topic for (topic,) in db_session.query(models.OutboxEvent.topic))
+    assert remaining == ["gave-up", "recent", "waiting"]
@@ -0,0 +1,105 @@
+# backend/tests/test_reservations.py
+from datetime import datetime, timedelta
+
+from backend.app import models
+from backend.app.inventory import refresh_availability
+from backend.app.reservations import sweep_expired_reservations
+from backend.tests.test_cart_and_orders import create_sneaker_with_size
+
+
+def stock_of(db_session, size_row):
+    db_session.refresh(size_row)
+    return size_row.stock
+
+
+def test_cart_items_get_a_reservation_deadline(client, db_session):
+    sneaker, _ = create_sneaker_with_size(db_session, stock=5, eu_size=40)
+    before = datetime.utcnow()
+
+    resp = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 40})
+    assert resp.status_code == 201
+    expires_at = datetime.fromisoformat(resp.json()["expires_at"])
+    assert before + timedelta(minutes=29) < expires_at < before + timedelta(minutes=31)
+
+
+def test_sweeper_releases_only_expired_items(client, db_session, count_queries):
+    sneaker, size_row = create_sneaker_with_size(db_session, stock=10, eu_size=41)
+    refresh_availability(db_session, [sneaker.id])
+    db_session.commit()
+    first = client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 3, "size": 41})
+    # merges into the same line and refreshes its deadline
+    client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 41})
+    assert stock_of(db_session, size_row) == 6
+
+    # first item expired, the other one has a fresh deadline
+    other = models.CartItem(
+        user_id=db_session.get(models.CartItem, first.json()["id"]).user_id,
+        sneaker_id=sneaker.id,
+        size=41,
+        quantity=2,
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    )
+    db_session.add(other)
+    db_session.query(models.CartItem).filter(models.CartItem.id == first.json()["id"]).update(
+        {"expires_at": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db_session.commit()
+
+    with count_queries() as statements:
+        items, units = sweep_expired_reservations(db_session, batch_size=100)
+    assert (items, units) == (1, 4)
+    # select + delete + restock + re-read, then the empty batch check; after
+    # the commit the availability refresh: lock + aggregate + delete + insert
+    assert len(statements) <= 10
+
+    assert db_session.get(models.CartItem, first.json()["id"]) is None
+    assert db_session.get(models.CartItem, other.id) is not None
+    assert stock_of(db_session, size_row) == 10
+    assert client.get(f"/sneakers/{sneaker.id}").json()["availability"]["total_stock"] == 10
+
+    stats = client.get("/cart/reservations/stats").json()
+    assert stats["runs"] == 1
+    assert stats["items_released"] == items
+    assert stats["units_released"] == units
+
+
+def test_sweeper_works_in_batches(db_session):
+    sneaker, size_row = create_sneaker_with_size(db_session, stock=0, eu_size=44)
+    user = models.User(email="sweep@example.com", hashed_password="x", full_name="Sweep")
+    db_session.add(user)
+    db_session.commit()
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    db_session.add_all(
+        models.CartItem(
+            user_id=user.id, sneaker_id=sneaker.id, size=44, quantity=1, expires_at=expired
+        )
+        for _ in range(5)
+    )
+    db_session.commit()
+
+    items, units = sweep_expired_reservations(db_session, batch_size=2)
+    assert items >= 5 and units >= 5
+    assert stock_of(db_session, size_row) == 5
+    assert sweep_expired_reservations(db_session) == (0, 0)
+
+
+def test_sweeper_skips_lines_whose_size_is_gone(client, db_session):
+    db_session.query(models.CartItem).delete()
+    db_session.commit()
+    sneaker, kept = create_sneaker_with_size(db_session, stock=5, eu_size=38)
+    gone = models.SneakerSize(sneaker_id=sneaker.id, eu_size=39, stock=5)
+    db_session.add(gone)
+    db_session.commit()
+    refresh_availability(db_session, [sneaker.id])
+    db_session.commit()
+    for size in (38, 39):
+        client.post("/cart/", json={"sneaker_id": sneaker.id, "quantity": 2, "size": size})
+    db_session.delete(gone)
+    db_session.query(models.CartItem).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+    db_session.commit()
+    refresh_availability(db_session, [sneaker.id])
+    db_session.commit()
+
+    assert sweep_expired_reservations(db_session) == (2, 2)
+    assert stock_of(db_session, kept) == 5
+    assert client.get(f"/sneakers/{sneaker.id}").json()["availability"]["total_stock"] == 5
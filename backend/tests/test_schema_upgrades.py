@@ -0,0 +1,45 @@
+# backend/tests/test_schema_upgrades.py
+from sqlalchemy import Column, MetaData, Table, create_engine, inspect
+
+from backend.app import models
+from backend.app.schema_upgrades import NEW_COLUMNS, NEW_INDEXES, upgrade_schema
+
+
+def old_shaped_engine(tmp_path):
+    """A database whose tables predate the columns and indexes listed for upgrade."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old = MetaData()
+    for table_name in set(NEW_COLUMNS) | set(NEW_INDEXES):
+        table = models.Base.metadata.tables[table_name]
+        Table(
+            table_name,
+            old,
+            *[
+                Column(column.name, column.type, primary_key=column.primary_key)
+                for column in table.columns
+                if column.name not in NEW_COLUMNS.get(table_name, ())
+            ],
+        )
+    old.create_all(engine)
+    return engine
+
+
+def test_upgrade_adds_missing_columns_and_indexes_once(tmp_path):
+    engine = old_shaped_engine(tmp_path)
+
+    assert upgrade_schema(engine)
+    inspector = inspect(engine)
+    for table_name, column_names in NEW_COLUMNS.items():
+        present = {column["name"] for column in inspector.get_columns(table_name)}
+        assert set(column_names) <= present
+    for table_name, index_names in NEW_INDEXES.items():
+        present = {index["name"] for index in inspector.get_indexes(table_name)}
+        assert set(index_names) <= present
+
+    assert upgrade_schema(engine) == []
+
+
+def test_upgrade_leaves_a_fresh_database_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    models.Base.metadata.create_all(engine)
+    assert upgrade_schema(engine) == []
@@ -0,0 +1,100 @@
+# backend/tests/test_search.py
+from backend.app import models
+from backend.app.search_index import SearchIndex, tokenize
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Air Jordan 1 Retro High OG 'Chicago'") == [
+        "air", "jordan", "1", "retro", "high", "og", "chicago",
+    ]
+    assert tokenize(None) == []
+
+
+def test_index_ranks_name_hits_above_description_hits():
+    index = SearchIndex()
+    index.add(1, {"name": "Runner", "description": "pairs well with a jordan"})
+    index.add(2, {"name": "Jordan 4", "brand": "Nike"})
+    index.add(3, {"name": "Gel Lyte", "brand": "Asics"})
+
+    assert [sneaker_id for sneaker_id, _ in index.search("jordan")] == [2, 1]
+
+
+def test_index_prefix_matching_and_all_words_required():
+    index = SearchIndex()
+    index.add(1, {"name": "Jordan 1 High", "colorway": "Chicago"})
+    index.add(2, {"name": "Jordan 4", "colorway": "Bred"})
+
+    assert [sneaker_id for sneaker_id, _ in index.search("jor chi")] == [1]
+    assert index.search("jordan nothing") == []
+
+
+def test_index_updates_incrementally():
+    index = SearchIndex()
+    index.add(1, {"name": "Samba OG", "brand": "Adidas"})
+    assert index.search("samba")
+
+    # re-indexing replaces the old text
+    index.add(1, {"name": "Gazelle", "brand": "Adidas"})
+    assert index.search("samba") == []
+    assert [sneaker_id for sneaker_id, _ in index.search("gazelle")] == [1]
+
+    index.remove(1)
+    assert index.search("adidas") == []
+    assert len(index) == 0
+
+
+def test_search_endpoint_returns_ranked_sneakers(client, db_session):
+    db_session.add_all(
+        [
+            models.Sneaker(
+                name="Zephyrus Trail", brand="SearchBrand", price=80.0,
+                description="Lightweight trail runner",
+            ),
+            models.Sneaker(
+                name="City Walker", brand="SearchBrand", price=70.0,
+                description="Not a zephyrus at all",
+            ),
+        ]
+    )
+    db_session.commit()
+
+    resp = client.get("/sneakers/search", params={"q": "zephy"})
+    assert resp.status_code == 200
+    names = [item["name"] for item in resp.json()]
+    assert names == ["Zephyrus Trail", "City Walker"]
+
+
+def test_search_endpoint_sees_sneakers_created_through_api(client):
+    client.get("/sneakers/search", params={"q": "warmup"})  # builds the index
+
+    created = client.post(
+        "/sneakers/",
+        json={"name": "Quokka Racer", "brand": "Nike", "price": 130.0},
+    )
+    assert created.status_code == 201
+
+    resp = client.get("/sneakers/search", params={"q": "quokka"})
+    assert [item["id"] for item in resp.json()] == [created.json()["id"]]
+
+
+def test_index_keeps_the_best_scores_with_ties_on_lowest_id():
+    index = SearchIndex()
+    for sneaker_id in range(1, 11):
+        index.add(sneaker_id, {"name": "Runner", "colorway": "Black"})
+    index.add(11, {"name": "Runner Black", "colorway": "Black"})
+    index.add(12, {"name": "Walker", "colorway": "Black"})
+
+    assert [sneaker_id for sneaker_id, _ in index.search("runner black", limit=3)] == [11, 1, 2]
+    assert [sneaker_id for sneaker_id, _ in index.search("black", limit=3)] == [11, 1, 2]
+    assert [sneaker_id for sneaker_id, _ in index.search("runner black")] == [11] + list(range(1, 11))
+
+
+def test_cached_results_follow_index_changes():
+    index = SearchIndex()
+    index.add(1, {"name": "Samba"})
+    assert [sneaker_id for sneaker_id, _ in index.search("samba")] == [1]
+
+    index.add(2, {"name": "Samba Samba"})
+    assert [sneaker_id for sneaker_id, _ in index.search("samba")] == [2, 1]
+    index.remove(2)
+    assert [sneaker_id for sneaker_id, _ in index.search("samba")] == [1]
@@ -1,4 +1,6 @@
 # backend/tests/test_sneakers.py
+import json
+
 from sqlalchemy.orm import Session
 
 # from app import models
@@ -157,3 +159,208 @@ def test_filter_sneakers_by_gender(client, db_session: Session):
     women_list = resp_women.json()
     assert len(women_list) >= 1
     assert all(item["gender"] == "women" for item in women_list)
+
+
+def test_list_sneakers_paginates_with_cursor(client, db_session: Session):
+    brand = "PaginationBrand"
+    for price in (90.0, 110.0, 100.0, 100.0, 80.0):
+        db_session.add(models.Sneaker(**make_sneaker_payload(brand=brand, price=price)))
+    db_session.commit()
+
+    expected = (
+        db_session.query(models.Sneaker)
+        .order_by(models.Sneaker.price, models.Sneaker.id)
+        .all()
+    )
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"sort": "price", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get("/sneakers/", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page) <= 2
+        seen.extend(item["id"] for item in page)
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [s.id for s in expected]
+
+
+def test_list_sneakers_rejects_invalid_cursor(client):
+    resp = client.get("/sneakers/", params={"cursor": "not-a-cursor"})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Invalid cursor"
+
+
+def test_list_sneakers_cursor_is_bound_to_sort(client, db_session: Session):
+    for _ in range(2):
+        db_session.add(models.Sneaker(**make_sneaker_payload()))
+    db_session.commit()
+
+    resp = client.get("/sneakers/", params={"sort": "price", "limit": 1})
+    cursor = resp.headers["X-Next-Cursor"]
+
+    resp = client.get("/sneakers/", params={"sort": "brand", "cursor": cursor})
+    assert resp.status_code == 400
+
+
+def test_list_sneakers_loads_sizes_in_one_query(client, db_session, count_queries):
+    for i in range(5):
+        create_sneaker_with_size(db_session, name=f"Batch Sizes {i}", eu_size=40 + i)
+
+    with count_queries() as statements:
+        resp = client.get("/sneakers/", params={"limit": 50})
+
+    assert resp.status_code == 200
+    assert all("sizes" in item for item in resp.json())
+    # one query for the page, one IN query for all of its sizes
+    assert len(statements) == 2
+
+
+def test_get_sneaker_is_cached_with_etag(client, db_session, count_queries):
+    sneaker, _ = create_sneaker_with_size(db_session, name="Cached Sneaker")
+
+    first = client.get(f"/sneakers/{sneaker.id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    with count_queries() as statements:
+        second = client.get(f"/sneakers/{sneaker.id}")
+        not_modified = client.get(
+            f"/sneakers/{sneaker.id}", headers={"If-None-Match": etag}
+        )
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    # both answered from the in-process cache
+    assert statements == []
+
+
+def test_stock_change_invalidates_cached_catalog(client, db_session):
+    sneaker, _ = create_sneaker_with_size(db_session, name="Invalidated", stock=4)
+
+    first = client.get(f"/sneakers/{sneaker.id}")
+    etag = first.headers["ETag"]
+    assert first.json()["sizes"][0]["stock"] == 4
+
+    resp = client.post(
+        "/cart/", json={"sneaker_id": sneaker.id, "quantity": 1, "size": 42}
+    )
+    assert resp.status_code == 201
+
+    second = client.get(f"/sneakers/{sneaker.id}", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    assert second.json()["sizes"][0]["stock"] == 3
+
+
+def test_list_sneakers_filters_by_brand_price_and_size(client, db_session):
+    cheap, _ = create_sneaker_with_size(
+        db_session, brand="FacetBrandA", price=40.0, eu_size=42, stock=3
+    )
+    sold_out, _ = create_sneaker_with_size(
+        db_session, brand="FacetBrandA", price=120.0, eu_size=42, stock=0
+    )
+    other, _ = create_sneaker_with_size(
+        db_session, brand="FacetBrandB", price=130.0, eu_size=43, stock=1
+    )
+
+    resp = client.get("/sneakers/", params={"brand": ["FacetBrandA", "FacetBrandB"]})
+    assert {item["id"] for item in resp.json()} == {cheap.id, sold_out.id, other.id}
+
+    resp = client.get(
+        "/sneakers/",
+        params={"brand": ["FacetBrandA", "FacetBrandB"], "min_price": 100},
+    )
+    assert {item["id"] for item in resp.json()} == {sold_out.id, other.id}
+
+    resp = client.get("/sneakers/", params={"brand": "FacetBrandA", "size": 42})
+    assert [item["id"] for item in resp.json()] == [cheap.id]
+
+
+def test_sneaker_facets_in_a_single_query(client, db_session, count_queries):
+    create_sneaker_with_size(db_session, brand="FacetC", price=45.0, eu_size=41, stock=2)
+    create_sneaker_with_size(db_session, brand="FacetC", price=160.0, eu_size=42, stock=0)
+    create_sneaker_with_size(db_session, brand="FacetD", price=170.0, eu_size=42, stock=5)
+
+    with count_queries() as statements:
+        resp = client.get("/sneakers/facets", params={"brand": ["FacetC", "FacetD"]})
+
+    assert resp.status_code == 200
+    assert len(statements) == 1
+
+    data = resp.json()
+    assert data["total"] == 3
+    assert data["brands"] == [
+        {"value": "FacetC", "count": 2},
+        {"value": "FacetD", "count": 1},
+    ]
+    # the size-42 row of the FacetC sneaker has no stock
+    assert data["sizes"] == [
+        {"value": "41", "count": 1},
+        {"value": "42", "count": 1},
+    ]
+    assert data["price_buckets"] == [
+        {"value": "0-50", "count": 1},
+        {"value": "150-200", "count": 2},
+    ]
+
+
+def test_export_ndjson_streams_every_sneaker_with_sizes(client, db_session):
+    sneaker, _ = create_sneaker_with_size(db_session, name="Export Me", eu_size=44, stock=6)
+    db_session.add(models.SneakerSize(sneaker_id=sneaker.id, eu_size=45, stock=1))
+    db_session.commit()
+    total = db_session.query(models.Sneaker).count()
+
+    with client.stream("GET", "/sneakers/export.ndjson", params={"chunk_size": 2}) as resp:
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in resp.iter_lines() if line]
+
+    assert len(records) == total
+    assert [r["id"] for r in records] == sorted(r["id"] for r in records)
+    exported = next(r for r in records if r["id"] == sneaker.id)
+    assert exported["name"] == "Export Me"
+    assert [(s["eu_size"], s["stock"]) for s in exported["sizes"]] == [(44, 6), (45, 1)]
+
+
+def test_batch_lookup_preserves_order_and_reports_missing(
+    client, db_session, count_queries
+):
+    first, _ = create_sneaker_with_size(db_session, name="Batch First")
+    second, _ = create_sneaker_with_size(db_session, name="Batch Second")
+
+    ids = f"{second.id},999998,{first.id},{second.id}"
+
+    with count_queries() as statements:
+        resp = client.get("/sneakers/batch", params={"ids": ids})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [item["id"] for item in data["items"]] == [second.id, first.id]
+    assert data["items"][0]["sizes"][0]["eu_size"] == 42
+    assert data["missing"] == [999998]
+    # one IN query for the sneakers, one for their sizes
+    assert len(statements) == 2
+
+
+def test_batch_lookup_validates_ids(client):
+    assert client.get("/sneakers/batch", params={"ids": "1,x"}).status_code == 400
+    too_many = ",".join(str(i) for i in range(1, 400))
+    assert client.get("/sneakers/batch", params={"ids": too_many}).status_code == 400
+
+
+def test_batch_lookup_supports_fields(client, db_session):
+    sneaker, _ = create_sneaker_with_size(db_session, name="Batch Sparse")
+
+    resp = client.get(
+        "/sneakers/batch", params={"ids": str(sneaker.id), "fields": "id,name"}
+    )
+    assert resp.json() == {"items": [{"id": sneaker.id, "name": "Batch Sparse"}], "missing": []}
@@ -161,8 +161,13 @@ export async function createOrder(token) {
 }
 
 
-export async function getMyOrders(token) {
-  const res = await fetch(`${API_BASE}/orders/`, {
+// One page of orders (newest first); the next page's cursor comes in X-Next-Cursor
+export async function getMyOrders(token, cursor = null) {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+
+  const query = params.toString();
+  const res = await fetch(`${API_BASE}/orders/${query ? `?${query}` : ""}`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -172,7 +177,10 @@ export async function getMyOrders(token) {
     throw new Error("Could not load orders");
   }
 
-  return res.json(); // adapt to whatever your backend returns
+  return {
+    orders: await res.json(),
+    nextCursor: res.headers.get("X-Next-Cursor"),
+  };
 }
 
 
@@ -20,9 +20,29 @@ async function handleAddToCart(shoeId) {
   }
 }
 
+// One page of the catalog; the next page's cursor comes in X-Next-Cursor
+async function fetchSneakerPage(gender, cursor) {
+  const params = new URLSearchParams();
+  if (gender) params.set("gender", gender);
+  if (cursor) params.set("cursor", cursor);
+
+  const query = params.toString();
+  const res = await fetch(query ? `${BASE_API_URL}?${query}` : BASE_API_URL);
+  if (!res.ok) {
+    throw new Error(`Request failed with status ${res.status}`);
+  }
+
+  return {
+    sneakers: await res.json(),
+    nextCursor: res.headers.get("X-Next-Cursor"),
+  };
+}
+
 function ProductGrid({ gender }) {
   const [sneakers, setSneakers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
   const navigate = useNavigate();
@@ -33,17 +53,9 @@ function ProductGrid({ gender }) {
         setLoading(true);
         setError(null);
 
-        const url = gender
-          ? `${BASE_API_URL}?gender=${gender}`
-          : BASE_API_URL;
-
-        const res = await fetch(url);
-        if (!res.ok) {
-          throw new Error(`Request failed with status ${res.status}`);
-        }
-
-        const data = await res.json();
-        setSneakers(data);
+        const page = await fetchSneakerPage(gender, null);
+        setSneakers(page.sneakers);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error("Failed to load sneakers:", err);
         setError("Could not load sneakers. Try again later.");
@@ -55,6 +67,20 @@ function ProductGrid({ gender }) {
     fetchSneakers();
   }, [gender]);
 
+  async function loadMore() {
+    try {
+      setLoadingMore(true);
+      const page = await fetchSneakerPage(gender, nextCursor);
+      setSneakers((current) => [...current, ...page.sneakers]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Failed to load more sneakers:", err);
+      alert("Could not load more sneakers. Try again later.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   if (loading) {
     return (
       <div className="product-grid">
@@ -80,6 +106,7 @@ function ProductGrid({ gender }) {
   }
 
   return (
+    <>
     <div className="product-grid" id="featured">
       {sneakers.map((shoe) => {
         const imageUrl = shoe.image_url
@@ -161,6 +188,15 @@ function ProductGrid({ gender }) {
         );
       })}
     </div>
+
+    {nextCursor && (
+      <div style={{ display: "flex", justifyContent: "center", margin: "24px 0" }}>
+        <button className="btn-primary" onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? "Loading..." : "Load more"}
+        </button>
+      </div>
+    )}
+    </>
   );
 }
 
@@ -6,7 +6,9 @@ const BACKEND_BASE_URL = "http://localhost:8000";
 
 function MyOrdersPage() {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
 
   const token = localStorage.getItem("access_token");
@@ -20,8 +22,9 @@ function MyOrdersPage() {
       }
 
       try {
-        const data = await getMyOrders(token);
-        setOrders(data);
+        const page = await getMyOrders(token);
+        setOrders(page.orders);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error(err);
         setError("Could not load your orders.");
@@ -33,6 +36,20 @@ function MyOrdersPage() {
     loadOrders();
   }, [token]);
 
+  async function loadMore() {
+    try {
+      setLoadingMore(true);
+      const page = await getMyOrders(token, nextCursor);
+      setOrders((current) => [...current, ...page.orders]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error(err);
+      setError("Could not load more orders.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   // same idea as CartPage: block visitors
   if (!token) {
     return (
@@ -202,6 +219,14 @@ function MyOrdersPage() {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div style={{ display: "flex", justifyContent: "center", margin: "24px 0" }}>
+          <button className="btn-primary" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
     </main>
   );
 }